@@ -1,7 +1,13 @@
 ﻿# chat_loop.py — streaming CLI with echo-guard + dynamic recall
-import os, sys, json, requests
+import os, sys, json
 from memory_store import MEM
-from prompt_builder import build_system_prompt
+from client_ollama import client_for
+from prompt_builder import build_system_prompt, build_prompt_parts
+from token_count import count_tokens
+from session_store import new_state
+from scheduler import SCHED
+from response_cache import RCACHE
+from residency import keep_alive_for
 
 BASE  = os.getenv("JENNY_BASE",  "http://127.0.0.1:11435")
 MODEL = os.getenv("JENNY_MODEL", "jenny:latest")
@@ -12,62 +18,104 @@ GEN_OPTS = {
     "repeat_penalty": float(os.getenv("JENNY_REPEAT_PENALTY", "1.1")),
     "repeat_last_n": int(os.getenv("JENNY_REPEAT_LAST_N", "128")),
 }
-
-# conversation state + echo guard
-CONVO = []
-LAST_ASSISTANT = ""
+if os.getenv("JENNY_TEMPERATURE"):        # unset = Modelfile default (replies are then never cached)
+    GEN_OPTS["temperature"] = float(os.getenv("JENNY_TEMPERATURE"))
+
+# prompt layout: "stable" = identity system msg first, volatile memory next to the user turn
+# (keeps the evaluated prefix reusable by Ollama's KV cache); "legacy" = one mixed system msg
+PROMPT_LAYOUT = os.getenv("JENNY_PROMPT_LAYOUT", "stable").lower()
+EVAL_LOG = os.getenv("JENNY_EVAL_LOG", "0") == "1"
+
+# pooled keep-alive session shared by every call to BASE
+CLIENT = client_for(BASE)
+
+# conversation state + echo guard for the CLI (the GUI passes its per-session state instead)
+CLI_SESSION = new_state()
+CONVO_BUDGET = int(os.getenv("JENNY_CONVO_BUDGET", "900"))   # history tokens sent per turn
+
+# prompt-eval measurement: last Ollama timing counters + optional callbacks
+LAST_EVAL = {}
+EVAL_HOOKS = []
+_EVAL_KEYS = ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration",
+              "load_duration", "total_duration")
+
+def on_eval_stats(fn):
+    """Register fn(stats: dict) to receive Ollama's timing counters after each reply."""
+    EVAL_HOOKS.append(fn)
+    return fn
+
+def _report_eval(obj, layout):
+    stats = {k: obj[k] for k in _EVAL_KEYS if k in obj}
+    if not stats:
+        return
+    stats["layout"] = layout
+    LAST_EVAL.clear(); LAST_EVAL.update(stats)
+    if EVAL_LOG:
+        ms = stats.get("prompt_eval_duration", 0) / 1e6
+        sys.stderr.write(f"[chat] prompt_eval {stats.get('prompt_eval_count', 0)} tok in {ms:.0f} ms ({layout})\n")
+    for fn in list(EVAL_HOOKS):
+        try:
+            fn(dict(stats))
+        except Exception:
+            pass
+
+def _compose(txt, convo_win):
+    """(messages, fallback prompt) for the configured layout."""
+    if PROMPT_LAYOUT == "legacy":
+        sys_prompt = build_system_prompt(related_query=txt, recent_n=3)
+        return ([{"role": "system", "content": sys_prompt}] + convo_win,
+                f"{sys_prompt}\n\nUser: {txt}\nAssistant:")
+    stable, volatile = build_prompt_parts(related_query=txt, recent_n=3)
+    msgs = [{"role": "system", "content": stable}] + convo_win[:-1]
+    if volatile:
+        msgs.append({"role": "system", "content": volatile})
+    msgs.append(convo_win[-1])
+    return msgs, f"{stable}\n\n{volatile}\n\nUser: {txt}\nAssistant:"
 
 def _health_check():
     try:
-        r = requests.get(f"{BASE}/api/tags", timeout=2)
+        r = CLIENT.tags(timeout=2)
         return r.ok
     except Exception:
         return False
 
 def _tok(s: str) -> int:
-    return max(1, len(s) // 4)
-
-def _trim_convo(msgs, budget=900):
-    used, out = 0, []
-    for m in reversed(msgs):
-        t = _tok(m.get("content", ""))
-        if used + t > budget:
-            break
-        out.append(m)
-        used += t
-    return list(reversed(out))
-
-def ask(user_text: str) -> str:
-    global LAST_ASSISTANT, CONVO
-
-    txt = (user_text or "").strip()
-    if not txt:
-        return ""
-
+    return count_tokens(s)
+
+def _trim_convo(convo, txt, budget=CONVO_BUDGET):
+    # newest turns that fit next to the new user message (convo is a bounded Conversation)
+    return convo.window(max(0, budget - _tok(txt))) + [{"role": "user", "content": txt}]
+
+CTX_RESERVE = int(os.getenv("JENNY_CTX_RESERVE", "64"))   # chat template / role markers
+
+def context_budget(user_text, session=None):
+    """
+    Tokens left for attachments in this turn: num_ctx minus the reply, the system prompt
+    built for user_text, a third of the history budget and the request itself.
+    (_trim_convo then lets the rest of the history yield to the attached context.)
+    """
+    stable, volatile = build_prompt_parts(related_query=user_text, recent_n=3)
+    convo = (session if session is not None else CLI_SESSION)["convo"]
+    used = (_tok(stable) + _tok(volatile) + min(convo.tokens, CONVO_BUDGET // 3) + _tok(user_text)
+            + GEN_OPTS["num_predict"] + CTX_RESERVE)
+    return max(0, GEN_OPTS["num_ctx"] - used)
+
+def _is_echo(txt: str, session=None) -> bool:
     # --- ECHO GUARD: ignore if our last reply bounced back as input
-    if LAST_ASSISTANT and txt == LAST_ASSISTANT.strip():
-        return "(ignored echo)"
-
-    # log user turn
-    MEM.update_from_turn("user", txt)
-
-    # build system prompt with dynamic related recall
-    sys_prompt = build_system_prompt(related_query=txt, recent_n=3)
-
-
-    # compose the message window (small for speed)
-    convo_win = _trim_convo(CONVO + [{"role": "user", "content": txt}], budget=900)
+    last = (session if session is not None else CLI_SESSION).get("last_assistant", "")
+    return bool(last and txt == last.strip())
 
+def _generate(messages, prompt):
+    """Reply deltas for the composed turn (streamed /api/chat, else one-shot /api/generate)."""
     payload = {
         "model": MODEL,
-        "messages": [{"role": "system", "content": sys_prompt}] + convo_win,
+        "messages": messages,
         "options": GEN_OPTS,
         "stream": True,
+        "keep_alive": keep_alive_for(MODEL),     # residency.py keeps the model warm between turns
     }
-
-    buf = []
     try:
-        with requests.post(f"{BASE}/api/chat", json=payload, stream=True, timeout=120) as r:
+        with CLIENT.post("/api/chat", json=payload, stream=True, timeout=120) as r:
             if r.status_code == 404:
                 raise RuntimeError("chat endpoint not available (404)")
             r.raise_for_status()
@@ -80,32 +128,111 @@ def ask(user_text: str) -> str:
                     continue
                 delta = (obj.get("message") or {}).get("content", "")
                 if delta:
-                    sys.stdout.write(delta)
-                    sys.stdout.flush()
-                    buf.append(delta)
+                    yield delta
                 if obj.get("done"):
+                    _report_eval(obj, PROMPT_LAYOUT)
                     break
     except Exception:
         # fallback to non-streaming generate
-        prompt = f"{sys_prompt}\n\nUser: {txt}\nAssistant:"
-        gen_payload = {"model": MODEL, "prompt": prompt, "options": GEN_OPTS, "stream": False}
-        rr = requests.post(f"{BASE}/api/generate", json=gen_payload, timeout=120)
+        gen_payload = {"model": MODEL, "prompt": prompt, "options": GEN_OPTS, "stream": False,
+                       "keep_alive": keep_alive_for(MODEL)}
+        rr = CLIENT.post("/api/generate", json=gen_payload, timeout=120)
         rr.raise_for_status()
-        buf.append((rr.json() or {}).get("response", ""))
+        obj = rr.json() or {}
+        _report_eval(obj, PROMPT_LAYOUT)
+        delta = obj.get("response", "")
+        if delta:
+            yield delta
+
+def _cache_scope(session=None):
+    # same conversation + persona/profile + layout + previous assistant turn => same answer to
+    # the same short prompt ("yes" / "why?" depend on what was said before); never another
+    # session's reply, not even through a near-duplicate match
+    session = session if session is not None else CLI_SESSION
+    last = session.get("last_assistant") or ""
+    return json.dumps([session.get("cid"), PROMPT_LAYOUT, MEM.get_profile(), last], sort_keys=True, default=str)
+
+def cached_reply(user_text: str, session=None):
+    """Cached reply for this prompt in this conversation (exact or near-duplicate), or None."""
+    txt = (user_text or "").strip()
+    if not RCACHE.cacheable(txt, GEN_OPTS):
+        return None
+    return RCACHE.get(txt, MODEL, GEN_OPTS, _cache_scope(session))
+
+def ask_stream(user_text: str, session=None, slot=None, cache=True, key="cli"):
+    """
+    Yield reply deltas as Ollama produces them (for SSE/NDJSON relays).
+    session: per-conversation state from session_store.new_state() (None = CLI_SESSION).
+    slot:    generation slot already granted by scheduler.SCHED (None = acquire one here
+             under `key`, the caller's session id; raises scheduler.Busy when the model
+             queue is full). Released when done.
+    cache:   serve/store short prompts through response_cache.RCACHE (a hit takes no slot).
+    The user turn goes to memory before generation (recall for this prompt sees it);
+    the reply, the convo window and the response cache are updated once the reply
+    completes. If the consumer stops early (client went away) the upstream stream is
+    closed and only that user turn stays recorded.
+    """
+    txt = (user_text or "").strip()
+    if not txt:
+        return
+    if _is_echo(txt, session):
+        yield "(ignored echo)"
+        return
+    if session is None:
+        session = CLI_SESSION
+    convo = session["convo"]
+    scope = _cache_scope(session)            # before last_assistant moves on
+
+    hit = cached_reply(txt, session) if cache else None
+    if hit is not None:
+        MEM.update_from_turn("user", txt)
+        buf = [hit]
+        yield hit
+    else:
+        with slot or SCHED.acquire(key):
+            # log user turn
+            MEM.update_from_turn("user", txt)
+
+            # compose the message window (small for speed)
+            convo_win = _trim_convo(convo, txt)
+
+            # system prompt with dynamic related recall (layout per PROMPT_LAYOUT)
+            messages, prompt = _compose(txt, convo_win)
+
+            buf = []
+            for delta in _generate(messages, prompt):
+                buf.append(delta)
+                yield delta
 
     ans = "".join(buf).strip()
+    if ans and cache and hit is None:
+        RCACHE.put(txt, MODEL, GEN_OPTS, ans, scope)
 
     # update state + memory
     if ans:
         MEM.update_from_turn("assistant", ans)
-        CONVO.append({"role": "user", "content": txt})
-        CONVO.append({"role": "assistant", "content": ans})
-        LAST_ASSISTANT = ans
+        convo.append("user", txt)
+        convo.append("assistant", ans)
+        session["last_assistant"] = ans
 
-    return ans
+def ask(user_text: str, session=None, slot=None, cache=True, key="cli") -> str:
+    txt = (user_text or "").strip()
+    if not txt:
+        return ""
+    if _is_echo(txt, session):
+        return "(ignored echo)"
+
+    buf = []
+    for delta in ask_stream(txt, session, slot, cache, key):
+        sys.stdout.write(delta)
+        sys.stdout.flush()
+        buf.append(delta)
+    return "".join(buf).strip()
 
 if __name__ == "__main__":
     print("Jenny local chat (streaming). Ctrl+C to exit.")
+    import summarizer
+    summarizer.start()
     if not _health_check():
         print(f"⚠️ Ollama server not reachable at {BASE}")
     try:
@@ -1,4 +1,7 @@
-import os, json, requests
+import os, json, time, threading, requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from response_cache import RCACHE
 
 def get_config():
     base  = os.getenv("JENNY_BASE",  "http://127.0.0.1:11435")
@@ -17,4 +20,182 @@ def get_config():
     }
     return base, model, opts
 
-# rest of file unchanged (chat_once, chat_stream, warm)
+# ---- shared, pooled HTTP client for every Ollama call (keep-alive + retries + timing) ----
+POOL_SIZE       = int(os.getenv("JENNY_HTTP_POOL", "8"))
+CONNECT_TIMEOUT = float(os.getenv("JENNY_HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT    = float(os.getenv("JENNY_HTTP_READ_TIMEOUT", "120"))
+RETRIES         = int(os.getenv("JENNY_HTTP_RETRIES", "2"))
+BACKOFF         = float(os.getenv("JENNY_HTTP_BACKOFF", "0.3"))
+
+class OllamaClient:
+    """
+    One requests.Session per Ollama base URL: connections are kept alive and reused.
+    Connect errors are retried with backoff for every call; 502/503/504 only for GETs
+    (a POST may already have started a generation).
+    """
+    def __init__(self, base, pool_size=POOL_SIZE, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                 retries=RETRIES, backoff=BACKOFF):
+        self.base = base.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=retries, connect=retries, read=0, status=retries,
+                      status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET", "HEAD"}),
+                      backoff_factor=backoff, raise_on_status=False)
+        self.adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0, "paths": {}}
+
+    def request(self, method, path, timeout=None, **kw):
+        """Timed request; for stream=True the time is to response headers (TTFB)."""
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            r = self.session.request(method, f"{self.base}{path}", timeout=timeout or self.timeout, **kw)
+            ok = True
+            return r
+        finally:
+            self._record(path, (time.perf_counter() - t0) * 1000, ok)
+
+    def get(self, path, **kw):
+        return self.request("GET", path, **kw)
+
+    def post(self, path, **kw):
+        return self.request("POST", path, **kw)
+
+    def _record(self, path, ms, ok):
+        with self._lock:
+            s = self._stats
+            s["requests"] += 1
+            s["errors"] += 0 if ok else 1
+            s["total_ms"] += ms
+            s["last_ms"] = ms
+            s["max_ms"] = max(s["max_ms"], ms)
+            p = s["paths"].setdefault(path, {"n": 0, "total_ms": 0.0})
+            p["n"] += 1
+            p["total_ms"] += ms
+
+    def stats(self):
+        """Request timing + connection reuse (new TCP connections vs requests served)."""
+        opened = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            opened += getattr(pools.get(key), "num_connections", 0)
+        with self._lock:
+            s = json.loads(json.dumps(self._stats))
+        n = s["requests"] or 1
+        s["avg_ms"] = round(s.pop("total_ms") / n, 2)
+        for p in s["paths"].values():
+            p["avg_ms"] = round(p.pop("total_ms") / (p["n"] or 1), 2)
+        s["connections_opened"] = opened
+        s["connections_reused"] = max(0, s["requests"] - opened)
+        return s
+
+    # --- convenience calls ---
+    def tags(self, timeout=2):
+        return self.get("/api/tags", timeout=timeout)
+
+    def version(self, timeout=2):
+        return self.get("/api/version", timeout=timeout)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def client_for(base=None):
+    """Shared OllamaClient for base (default JENNY_BASE)."""
+    base = (base or get_config()[0]).rstrip("/")
+    with _clients_lock:
+        c = _clients.get(base)
+        if c is None:
+            c = _clients[base] = OllamaClient(base)
+        return c
+
+def client_stats():
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {c.base: c.stats() for c in clients}
+
+# ---- chat helpers (all through the pooled client) ----
+def chat_once(base, model, user_text, sys_prompt, opts, cache=True, scope=None):
+    # short, cool-temperature prompts are answered from response_cache when seen before in the
+    # same conversation (scope, e.g. a session id; None = not cached)
+    cache = cache and scope is not None
+    if cache:
+        hit = RCACHE.get(user_text, model, opts, [scope, sys_prompt])
+        if hit is not None:
+            return hit
+    reply = _chat_once(base, model, user_text, sys_prompt, opts)
+    if cache:
+        RCACHE.put(user_text, model, opts, reply, [scope, sys_prompt])
+    return reply
+
+def _chat_once(base, model, user_text, sys_prompt, opts):
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": sys_prompt},
+            {"role": "user",   "content": user_text},
+        ],
+        "options": opts,
+        "stream": False,
+    }
+    cli = client_for(base)
+    r = cli.post("/api/chat", json=payload, timeout=120)
+    if r.status_code == 404:
+        prompt = f"{sys_prompt}\n\nUser: {user_text}\nAssistant:"
+        gp = {"model": model, "prompt": prompt, "options": opts, "stream": False}
+        rg = cli.post("/api/generate", json=gp, timeout=120)
+        rg.raise_for_status()
+        return rg.json().get("response","")
+    r.raise_for_status()
+    return r.json().get("message",{}).get("content","")
+
+def chat_stream(base, model, user_text, sys_prompt, opts, cache=True, scope=None):
+    cache = cache and scope is not None
+    if cache:
+        hit = RCACHE.get(user_text, model, opts, [scope, sys_prompt])
+        if hit is not None:
+            yield hit
+            return
+    buf = []
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": sys_prompt},
+            {"role": "user",   "content": user_text},
+        ],
+        "options": opts,
+        "stream": True,
+    }
+    with client_for(base).post("/api/chat", json=payload, stream=True, timeout=120) as r:
+        if r.status_code == 404:
+            yield chat_once(base, model, user_text, sys_prompt, opts, cache, scope)
+            return
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            delta = obj.get("message",{}).get("content","")
+            if delta:
+                buf.append(delta)
+                yield delta
+            if obj.get("done"):
+                break
+    if cache:
+        RCACHE.put(user_text, model, opts, "".join(buf), [scope, sys_prompt])
+
+def warm(base, model, opts):
+    try:
+        client_for(base).post("/api/chat", json={
+            "model": model,
+            "messages":[{"role":"user","content":"warm"}],
+            "options": {**opts, "num_predict": 16},
+            "stream": False
+        }, timeout=30)
+    except Exception:
+        pass
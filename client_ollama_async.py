@@ -0,0 +1,224 @@
+# [F024] client_ollama_async.py v1.0 (2026-10-18)
+__FILE_ID__ = "F024"
+__VERSION__ = "1.0"
+
+# asyncio client for Ollama (stdlib only: asyncio streams + a tiny HTTP/1.1 reader).
+# One event loop can serve many sessions without threads:
+#   - chat / generate / tags / version / ps, plus streaming chat/generate
+#   - cancelling a consumer (task.cancel() or leaving `async for`) closes the socket,
+#     so Ollama sees the disconnect and stops generating
+#   - a bounded semaphore caps in-flight generations (JENNY_ASYNC_MAX_INFLIGHT)
+#
+#   async with AsyncOllamaClient() as cli:
+#       async for delta in cli.stream_text("jenny:latest", [{"role": "user", "content": "hi"}]):
+#           print(delta, end="")
+
+# --- imports ---
+import os, ssl, json, asyncio
+from urllib.parse import urlsplit
+from client_ollama import get_config
+
+MAX_INFLIGHT    = int(os.getenv("JENNY_ASYNC_MAX_INFLIGHT", "2"))
+CONNECT_TIMEOUT = float(os.getenv("JENNY_HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT    = float(os.getenv("JENNY_HTTP_READ_TIMEOUT", "120"))
+
+
+class OllamaHTTPError(RuntimeError):
+    def __init__(self, status, body):
+        super().__init__(f"ollama HTTP {status}: {body[:200]!r}")
+        self.status = status
+
+
+class AsyncOllamaClient:
+    def __init__(self, base=None, max_inflight=MAX_INFLIGHT,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        u = urlsplit((base or get_config()[0]).rstrip("/"))
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port or (443 if u.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if u.scheme == "https" else None
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._gen = asyncio.Semaphore(max_inflight)
+        self.stats = {"inflight": 0, "waiting": 0, "completed": 0, "cancelled": 0, "errors": 0}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    # --- raw HTTP ---
+    async def _open(self, method, path, body=None):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.connect_timeout)
+        try:
+            data = json.dumps(body).encode("utf-8") if body is not None else b""
+            head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                    f"Accept: application/json\r\nConnection: close\r\n")
+            if body is not None:
+                head += f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+            writer.write(head.encode("ascii") + b"\r\n" + data)
+            await writer.drain()
+            # Ollama answers only after prompt eval: cancellation usually lands in here
+            status_line = await self._readline(reader)
+            try:
+                status = int(status_line.split()[1])
+            except (IndexError, ValueError):
+                raise OllamaHTTPError(0, status_line)
+            headers = {}
+            while True:
+                line = await self._readline(reader)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                k, _, v = line.decode("latin-1").partition(":")
+                headers[k.strip().lower()] = v.strip()
+        except BaseException:
+            writer.close()                             # cancelled / timed out before the body
+            raise
+        return status, headers, reader, writer
+
+    async def _readline(self, reader):
+        return await asyncio.wait_for(reader.readline(), self.read_timeout)
+
+    async def _chunks(self, reader, headers):
+        """Body bytes as they arrive (chunked, content-length or read-to-EOF)."""
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            while True:
+                size = int((await self._readline(reader)).split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while (await self._readline(reader)) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                yield await asyncio.wait_for(reader.readexactly(size), self.read_timeout)
+                await self._readline(reader)           # CRLF after each chunk
+        elif "content-length" in headers:
+            left = int(headers["content-length"])
+            while left > 0:
+                b = await asyncio.wait_for(reader.read(min(left, 65536)), self.read_timeout)
+                if not b:
+                    return
+                left -= len(b)
+                yield b
+        else:
+            while True:
+                b = await asyncio.wait_for(reader.read(65536), self.read_timeout)
+                if not b:
+                    return
+                yield b
+
+    async def _close(self, writer):
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), 1)
+        except Exception:
+            pass
+
+    async def _json(self, method, path, body=None):
+        status, headers, reader, writer = await self._open(method, path, body)
+        try:
+            data = b"".join([c async for c in self._chunks(reader, headers)])
+        finally:
+            await self._close(writer)
+        if status >= 400:
+            raise OllamaHTTPError(status, data)
+        return json.loads(data or b"{}")
+
+    async def _stream(self, path, body):
+        """Yield NDJSON objects; the socket is closed on exit, error or cancellation."""
+        status, headers, reader, writer = await self._open("POST", path, body)
+        try:
+            if status >= 400:
+                data = b"".join([c async for c in self._chunks(reader, headers)])
+                raise OllamaHTTPError(status, data)
+            buf = b""
+            async for chunk in self._chunks(reader, headers):
+                buf += chunk
+                *lines, buf = buf.split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        try:
+                            obj = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        yield obj
+                        if obj.get("done"):
+                            return
+        finally:
+            await self._close(writer)                  # disconnect → Ollama stops generating
+
+    # --- generation (bounded by the in-flight semaphore) ---
+    async def _guarded(self, agen):
+        self.stats["waiting"] += 1
+        try:
+            await self._gen.acquire()
+        finally:
+            self.stats["waiting"] -= 1
+        self.stats["inflight"] += 1
+        try:
+            async for obj in agen:
+                yield obj
+            self.stats["completed"] += 1
+        except (asyncio.CancelledError, GeneratorExit):
+            self.stats["cancelled"] += 1
+            raise
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            await agen.aclose()
+            self.stats["inflight"] -= 1
+            self._gen.release()
+
+    def stream_chat(self, model, messages, options=None, **extra):
+        body = {"model": model, "messages": messages, "options": options or {}, "stream": True, **extra}
+        return self._guarded(self._stream("/api/chat", body))
+
+    def stream_generate(self, model, prompt, options=None, **extra):
+        body = {"model": model, "prompt": prompt, "options": options or {}, "stream": True, **extra}
+        return self._guarded(self._stream("/api/generate", body))
+
+    async def stream_text(self, model, messages, options=None, **extra):
+        """Just the content deltas of a streamed chat."""
+        async for obj in self.stream_chat(model, messages, options, **extra):
+            delta = (obj.get("message") or {}).get("content", "")
+            if delta:
+                yield delta
+
+    async def chat(self, model, messages, options=None, **extra):
+        last, parts = {}, []
+        async for obj in self.stream_chat(model, messages, options, **extra):
+            parts.append((obj.get("message") or {}).get("content", ""))
+            last = obj
+        last = dict(last)
+        last["message"] = {"role": "assistant", "content": "".join(parts)}
+        return last
+
+    async def generate(self, model, prompt, options=None, **extra):
+        last, parts = {}, []
+        async for obj in self.stream_generate(model, prompt, options, **extra):
+            parts.append(obj.get("response", ""))
+            last = obj
+        last = dict(last)
+        last["response"] = "".join(parts)
+        return last
+
+    # --- cheap metadata calls (not gated) ---
+    async def tags(self):
+        return await self._json("GET", "/api/tags")
+
+    async def version(self):
+        return await self._json("GET", "/api/version")
+
+    async def ps(self):
+        return await self._json("GET", "/api/ps")
+
+
+if __name__ == "__main__":
+    async def _demo():
+        base, model, opts = get_config()
+        cli = AsyncOllamaClient(base)
+        print("version:", (await cli.version()).get("version"))
+        async for delta in cli.stream_text(model, [{"role": "user", "content": "Say hi in five words."}], opts):
+            print(delta, end="", flush=True)
+        print()
+    asyncio.run(_demo())
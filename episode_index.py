@@ -0,0 +1,571 @@
+# [F020] episode_index.py v1.3 (2026-10-18)
+__FILE_ID__ = "F020"
+__VERSION__ = "1.3"
+
+# Persistent inverted index over memory/episodes.jsonl.
+# term -> {episode_id: term frequency}, plus per-episode offset/importance/length/ts.
+# The index only ever tails the JSONL file, so it stays correct no matter who appended.
+# v1.1: compacted segments (episode_log.py) are indexed first, in manifest order; a new
+# manifest generation or a rewritten live file triggers one rebuild.
+# v1.2: the JSON snapshot is only a checkpoint (sync() tails the log from its `end`), so it is written
+# by a background thread every SAVE_INTERVAL seconds while dirty and at exit, never on the
+# query path; it is streamed to disk in pieces, each copied in a short lock hold.
+# v1.3: scores stay exact for every term. Posting lists longer than IMPACT_MIN also get
+# (tf, importance, length) buckets; they are read biggest contribution first and the walk stops
+# once no unseen episode can beat the current k-th score. When the scores are too flat for that
+# to pay off, the lists are read whole, one bucket (one constant) at a time. Query terms are
+# expanded through a trigram map of the vocabulary instead of a scan of every term.
+# After a bulk load the index's millions of objects are gc.freeze()d: full cyclic-GC passes
+# over them (~150 ms at 1M episodes, on whichever thread allocates) were the remaining stalls.
+
+# --- imports ---
+import gc, json, math, os, time, pathlib, re, threading, atexit, heapq, bisect
+from collections import OrderedDict, Counter
+from itertools import repeat
+from operator import add
+
+_WORD = re.compile(r"\w+")
+
+def query_terms(query):
+    """Same term rule retrieve() always used: lowercase \\w+ runs longer than 2 chars."""
+    return [w for w in _WORD.findall((query or "").lower()) if len(w) > 2]
+
+
+class EpisodeIndex:
+    """
+    Incremental inverted index for episode recall.
+
+    scoring="count" reproduces the old full-scan score exactly:
+        sum(text.lower().count(t) for t in terms) + 0.15*importance
+    (a query term is all \\w chars, so every substring hit lives inside one
+    indexed token; we expand each term to the vocab tokens that contain it).
+    scoring="bm25" ranks the same candidates with BM25 + the importance prior.
+    """
+    SAVE_INTERVAL = float(os.getenv("JENNY_INDEX_SAVE_INTERVAL", "300"))   # background checkpoints
+    SAVE_BATCH = 1024             # posting lists copied per lock hold while saving
+    SAVE_ENTRIES = 1 << 18        # ... and at most about this many postings
+    IMPACT_MIN = int(os.getenv("JENNY_INDEX_IMPACT_MIN", "2048"))   # longer lists get impact buckets
+    EXPAND_CACHE = 512            # cached query-term expansions
+    FREEZE_AFTER = 10000          # docs indexed in one go before the heap is frozen
+    K1, B = 1.2, 0.75
+
+    def __init__(self, source: pathlib.Path, snapshot: pathlib.Path, manifest=None):
+        self.source = pathlib.Path(source)
+        self.snapshot = pathlib.Path(snapshot)
+        self.manifest = manifest      # () -> segment manifest (episode_log.read_manifest) or None
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._dirty = 0
+        self._epoch = 0               # bumped by every _reset (doc ids reassigned)
+        self._saver = None
+        self._save_lock = threading.Lock()
+        self.pruned = 0               # queries that stopped before the end of a long list
+        self.walked = 0               # ... that read their long lists whole instead
+        self._reset()
+        atexit.register(self.save)
+
+    def _reset(self):
+        self._epoch = getattr(self, "_epoch", 0) + 1
+        self.end = 0                  # bytes of source covered
+        self.head = ""                # first line signature (detects rewrites)
+        self.gen = 0                  # segment manifest generation indexed
+        self.segs = []                # [[segment path, first doc id]] (docs before live_base)
+        self.live_base = 0            # first doc id that lives in source
+        self.offsets = []             # doc id -> byte offset in its file
+        self.imp = []                 # doc id -> importance
+        self.ts = []                  # doc id -> ts
+        self.dlen = []                # doc id -> token count
+        self.total_len = 0
+        self.tags = {}                # tag -> [doc ids]
+        self.postings = {}            # term -> {doc id: tf}
+        self.by_imp = {}              # importance -> [doc ids] (zero-match fill)
+        self._expand = OrderedDict()  # query term -> [vocab terms containing it]
+        self._grams = {}              # trigram -> [vocab terms containing it]
+        self._impact = {}             # long term -> {(tf, importance, length): [doc ids]} (on first use)
+
+    # --- persistence ---
+    def _head_sig(self):
+        try:
+            with self.source.open("rb") as f:
+                return f.readline(256).decode("utf-8", "replace")
+        except FileNotFoundError:
+            return ""
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        self._start_saver()
+        try:
+            snap = json.loads(self.snapshot.read_text(encoding="utf-8"))
+            if snap.get("version") != 2:
+                raise ValueError("index version mismatch")
+            self.end = int(snap["end"])
+            self.head = snap.get("head", "")
+            self.gen = snap["gen"]
+            self.segs = snap["segs"]
+            self.live_base = snap["live_base"]
+            self.offsets = snap["offsets"]
+            self.imp = snap["imp"]
+            self.ts = snap["ts"]
+            self.dlen = snap["dlen"]
+            self.total_len = sum(self.dlen)
+            self.tags = snap["tags"]
+            self.postings = {t: dict(zip(p[0::2], p[1::2])) for t, p in snap["postings"].items()}
+            for i, imp in enumerate(self.imp):
+                self.by_imp.setdefault(imp, []).append(i)
+            for t in self.postings:
+                self._add_grams(t)
+            gc.freeze()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[memory] index snapshot unreadable, rebuilding: {e}")
+            self._reset()
+
+    def _start_saver(self):
+        if self._saver is not None or self.SAVE_INTERVAL <= 0:
+            return
+        def loop():
+            while True:
+                time.sleep(self.SAVE_INTERVAL)
+                try:
+                    self.save()
+                except Exception as e:
+                    print(f"[memory] index save FAIL: {e}")
+        self._saver = threading.Thread(target=loop, name="episode-index-saver", daemon=True)
+        self._saver.start()
+
+    def _dump_list(self, f, epoch, get, count, step):
+        """Write get()[:count] as a JSON array, copying `step` items per lock hold."""
+        f.write("[")
+        for i in range(0, count, step):
+            with self._lock:
+                if self._epoch != epoch:
+                    return False
+                part = get()[i:min(count, i + step)]
+            f.write(("," if i else "") + json.dumps(part, separators=(",", ":"))[1:-1])
+            time.sleep(0)                     # let query threads run between pieces
+        f.write("]")
+        return True
+
+    def _write_snapshot(self, f):
+        """
+        Stream the version-2 snapshot of the first n docs into f, piece by piece: each piece is
+        copied under the lock and serialized outside it. Docs appended meanwhile (ids >= n) are
+        left for the next save. Returns the dirty count covered, or None (nothing to save or
+        rebuilt under us).
+        """
+        with self._lock:
+            if not self._loaded or not self._dirty:
+                return None
+            epoch, n, dirty = self._epoch, len(self.offsets), self._dirty
+            head = {"version": 2, "end": self.end, "head": self.head, "gen": self.gen,
+                    "segs": [list(s) for s in self.segs], "live_base": self.live_base}
+            terms, tags = list(self.postings), list(self.tags)
+        step = self.SAVE_BATCH * 16
+        f.write(json.dumps(head, separators=(",", ":"))[:-1])
+        for key in ("offsets", "imp", "ts", "dlen"):
+            f.write(f',"{key}":')
+            if not self._dump_list(f, epoch, lambda: getattr(self, key), n, step):
+                return None
+        f.write(',"tags":{')
+        for j, t in enumerate(tags):
+            with self._lock:
+                count = bisect.bisect_left(self.tags[t], n)     # doc ids are ascending
+            f.write(("," if j else "") + json.dumps(t) + ":")
+            if not self._dump_list(f, epoch, lambda: self.tags[t], count, step):
+                return None
+        f.write('},"postings":{')
+        first, i = True, 0
+        while i < len(terms):
+            with self._lock:
+                if self._epoch != epoch:
+                    return None
+                # keys/values copies are plain C loops (no per-entry tuples); a hold copies at
+                # most SAVE_BATCH terms / about SAVE_ENTRIES postings
+                part, size = [], 0
+                while i < len(terms) and len(part) < self.SAVE_BATCH and size < self.SAVE_ENTRIES:
+                    p = self.postings[terms[i]]
+                    part.append((terms[i], list(p), list(p.values())))
+                    size += len(p)
+                    i += 1
+            for t, docs, tfs in part:
+                f.write(("" if first else ",") + json.dumps(t) + ":[")
+                first = False
+                m = bisect.bisect_left(docs, n)                  # ascending ids; >= n came later
+                for k in range(0, m, step):                      # common terms: several pieces
+                    flat = [x for pair in zip(docs[k:min(m, k + step)], tfs[k:min(m, k + step)]) for x in pair]
+                    f.write(("," if k else "") + json.dumps(flat, separators=(",", ":"))[1:-1])
+                    if m > step:
+                        time.sleep(0)
+                f.write("]")
+            time.sleep(0)
+        f.write("}}")
+        return dirty
+
+    def save(self):
+        """Write the checkpoint (background saver / exit / after compaction) without stalling queries."""
+        with self._save_lock:
+            tmp = self.snapshot.with_suffix(f"{self.snapshot.suffix}.tmp.{os.getpid()}")
+            try:
+                with tmp.open("w", encoding="utf-8") as f:
+                    dirty = self._write_snapshot(f)
+                if dirty is None:
+                    tmp.unlink()
+                    return
+                os.replace(tmp, self.snapshot)
+            except Exception as e:
+                print(f"[memory] index save FAIL: {e}")
+                return
+            with self._lock:
+                self._dirty = max(0, self._dirty - dirty)
+
+    @property
+    def signature(self):
+        """Changes whenever doc ids are reassigned (compaction, rewritten log)."""
+        return f"{self.gen}:{self.head}"
+
+    def _index_segments(self, man):
+        """Fresh index over the manifest's segments (the live file is tailed afterwards)."""
+        self._reset()
+        seg_dir = self.source.parent / "segments"
+        for seg in (man or {}).get("segments", []):
+            path = seg_dir / seg["file"]
+            self.segs.append([str(path), len(self.offsets)])
+            try:
+                with path.open("rb") as f:
+                    pos = 0
+                    for raw in f:
+                        if raw.strip():
+                            try:
+                                self.add(json.loads(raw), pos)
+                            except Exception:
+                                pass
+                        pos += len(raw)
+            except FileNotFoundError:
+                print(f"[memory] segment {path.name} missing from index")
+        self.live_base = len(self.offsets)
+        self.gen = (man or {}).get("gen", 0)
+
+    # --- ingest ---
+    def sync(self):
+        """Index whatever was appended to the source since last time (cheap stat when idle)."""
+        with self._lock:
+            self._load()
+            epoch, before = self._epoch, len(self.offsets)
+            try:
+                self._sync()
+            finally:
+                if self._epoch != epoch or len(self.offsets) - before >= self.FREEZE_AFTER:
+                    gc.freeze()              # bulk (re)build: keep it out of full GC passes
+
+    def _sync(self):
+        """sync() body (lock held)."""
+        man = self.manifest() if self.manifest else None
+        if man is not None and man.get("gen", 0) != self.gen:
+            self._index_segments(man)   # compaction produced a new generation → rebuild
+        try:
+            size = self.source.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size == self.end and (size == 0 or self.head):
+            return
+        if size < self.end or (self.end and self._head_sig() != self.head):
+            self._index_segments(man)   # file was rewritten → rebuild
+        with self.source.open("rb") as f:
+            f.seek(self.end)
+            data = f.read(size - self.end)
+        pos = self.end
+        for raw in data.splitlines(keepends=True):
+            if not raw.endswith(b"\n"):
+                break                # partial line from a concurrent writer
+            if raw.strip():
+                try:
+                    self.add(json.loads(raw), pos)
+                except Exception:
+                    pass
+            pos += len(raw)
+        self.end = pos
+        if not self.head:
+            self.head = self._head_sig()
+
+    def add(self, rec, offset):
+        doc = len(self.offsets)
+        words = _WORD.findall((rec.get("text") or "").lower())
+        imp = int(rec.get("importance", 3))
+        self.offsets.append(offset)
+        self.imp.append(imp)
+        self.ts.append(int(rec.get("ts", 0) or 0))
+        self.dlen.append(len(words))
+        self.total_len += len(words)
+        self.by_imp.setdefault(imp, []).append(doc)
+        for tag in rec.get("tags") or []:
+            self.tags.setdefault(tag, []).append(doc)
+        tf = {}
+        for w in words:
+            tf[w] = tf.get(w, 0) + 1
+        for w, n in tf.items():
+            p = self.postings.get(w)
+            if p is None:
+                p = self.postings[w] = {}
+                self._add_grams(w)
+                for q, hits in self._expand.items():   # keep cached expansions exact
+                    if q in w:
+                        hits.append(w)
+            p[doc] = n
+            b = self._impact.get(w)
+            if b is not None:
+                b.setdefault((n, imp, len(words)), []).append(doc)
+        self._dirty += 1
+        return doc
+
+    def _add_grams(self, w):
+        for g in {w[i:i + 3] for i in range(len(w) - 2)}:
+            self._grams.setdefault(g, []).append(w)
+
+    # --- query ---
+    def _expand_term(self, t):
+        hits = self._expand.get(t)
+        if hits is None:
+            # a term containing t contains each of t's trigrams: filter the shortest of those lists
+            pool = min((self._grams.get(t[i:i + 3], ()) for i in range(len(t) - 2)), key=len, default=())
+            hits = [v for v in pool if t in v]
+            self._expand[t] = hits
+            if len(self._expand) > self.EXPAND_CACHE:
+                self._expand.popitem(last=False)
+        else:
+            self._expand.move_to_end(t)
+        return hits
+
+    def _buckets(self, v):
+        """(tf, importance, doc length) -> [doc ids] for one long posting list (add() keeps it current)."""
+        b = self._impact.get(v)
+        if b is None:
+            b = self._impact[v] = {}
+            imp, dlen = self.imp, self.dlen
+            for d, tf in self.postings[v].items():
+                b.setdefault((tf, imp[d], dlen[d]), []).append(d)
+        return b
+
+    def search(self, query, k=4, require_tags=None, scoring="count", extra=None):
+        """
+        Return [(score, doc id)] best first; ties keep file order like the old stable sort.
+        extra: records queued but not yet on disk; they get doc ids after the indexed ones.
+        """
+        with self._lock:
+            self.sync()
+            allowed = None
+            if require_tags:
+                allowed = set()
+                for tag in require_tags:
+                    allowed.update(self.tags.get(tag, ()))
+            n = len(self.offsets)
+            avgdl = (self.total_len / n) if n else 1.0
+            bm25 = scoring == "bm25"
+            K1, B = self.K1, self.B
+
+            def gain(tf, dl):
+                return tf * (K1 + 1) / (tf + K1 * (1 - B + B * dl / avgdl)) if bm25 else tf
+
+            # vocab term -> weight: "count" adds v.count(t)*tf per (query term t, vocab term v),
+            # "bm25" adds idf(v)*gain(tf) per pair
+            units = {}
+            for t in query_terms(query):
+                for v in self._expand_term(t):
+                    if bm25:
+                        df = len(self.postings[v])
+                        w = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                    else:
+                        w = v.count(t)
+                    units[v] = units.get(v, 0) + w
+            cand, long_ = {}, []
+            for v, w in units.items():
+                post = self.postings[v]
+                if len(post) > self.IMPACT_MIN:
+                    long_.append(v)
+                    continue
+                for d, tf in post.items():
+                    cand[d] = cand.get(d, 0) + w * gain(tf, self.dlen[d])
+            if long_:
+                cand = self._score_long(long_, units, gain, cand, k, allowed)
+            if 0 < k < len(cand) and len(cand) > self.IMPACT_MIN and allowed is None:
+                # k docs reach kth + 0.15*min importance: drop docs that cannot catch up
+                kth = heapq.nlargest(k, cand.values())[-1]
+                if kth + 0.15 * min(self.by_imp) > 0:
+                    floor = kth - 0.15 * (max(self.by_imp) - min(self.by_imp))
+                    cand = {d: s for d, s in cand.items() if s >= floor}
+            scored = [(s + 0.15 * self.imp[d], d) for d, s in cand.items()
+                      if allowed is None or d in allowed]
+            # zero-match episodes still score 0.15*importance; pull the best k of them
+            fill = []
+            for imp in sorted((i for i in self.by_imp if i > 0), reverse=True):
+                for d in self.by_imp[imp]:
+                    if d in cand or (allowed is not None and d not in allowed):
+                        continue
+                    fill.append((0.15 * imp, d))
+                    if len(fill) >= k:
+                        break
+                if len(fill) >= k:
+                    break
+            scored = [x for x in scored if x[0] > 0] + fill
+            for i, rec in enumerate(extra or ()):
+                if require_tags and not set(require_tags) & set(rec.get("tags") or ()):
+                    continue
+                s = self._score_text(rec.get("text") or "", query, scoring, n, avgdl)
+                s += 0.15 * int(rec.get("importance", 3))
+                if s > 0:
+                    scored.append((s, n + i))
+            return [(s, d) for s, d in heapq.nsmallest(k, scored, key=lambda x: (-x[0], x[1]))]
+
+    def _score_long(self, long_, units, gain, cand, k, allowed):
+        """
+        Add the long posting lists to cand (short lists' partial scores) and return {doc: score}
+        covering every doc that can still make the top k, with exact scores.
+
+        Each list is read bucket by bucket, biggest contribution first (threshold algorithm);
+        docs met there are scored whole by lookups. The walk stops once no unseen doc can beat
+        the k-th score. If it would touch more postings than reading the lists whole, the
+        lists are read whole instead (flat score distributions), bucket by bucket: a bucket
+        adds one constant to each of its docs.
+        """
+        if k <= 0:
+            return cand
+        imps, dlen = self.imp, self.dlen
+        posts = [(self.postings[v], units[v]) for v in long_]
+        budget = sum(len(p) for p, _ in posts) // 16    # one lookup ~ 16 postings read whole (in C)
+        lists = []
+        for v in long_:
+            w, b = units[v], self._buckets(v)
+            keys = sorted(((w * gain(tf, dl), imp, tf, dl) for tf, imp, dl in b), reverse=True)
+            lower, below = [], 0            # best contribution strictly below keys[i] (0 = absent)
+            for i in range(len(keys) - 1, -1, -1):
+                lower.append(below)
+                if i and keys[i - 1][0] > keys[i][0]:
+                    below = keys[i][0]
+            lists.append((b, keys, lower[::-1]))
+        scores, top = {}, []                # top: k best (score, -doc) allowed docs; top[0] = k-th
+
+        def offer(d, s):
+            if allowed is not None and d not in allowed:
+                return
+            s += 0.15 * imps[d]
+            if s <= 0:
+                return
+            if len(top) < k:
+                heapq.heappush(top, (s, -d))
+            elif (s, -d) > top[0]:
+                heapq.heapreplace(top, (s, -d))
+
+        def score(d):
+            s = cand.get(d, 0)
+            for post, w in posts:
+                tf = post.get(d)
+                if tf:
+                    s += w * gain(tf, dlen[d])
+            scores[d] = s
+            offer(d, s)
+
+        work = len(cand) * len(posts)
+        prior = 0.15 * max(self.by_imp, default=0)
+        pos = [0] * len(lists)
+        if work <= budget:
+            for d in cand:
+                score(d)
+        while work <= budget:
+            live = [j for j in range(len(lists)) if pos[j] < len(lists[j][1])]
+            if not live:
+                return scores
+            # an unseen doc is at or below every list's next bucket (contribution c, importance m):
+            # either it equals c everywhere (so its importance <= each m) or falls below c somewhere
+            head = [lists[j][1][pos[j]] for j in live]
+            total = sum(c for c, _, _, _ in head)
+            bound = max(total + 0.15 * min(m for _, m, _, _ in head),
+                        total + prior - min(lists[j][1][pos[j]][0] - lists[j][2][pos[j]] for j in live),
+                        prior)
+            if len(top) == k and bound < top[0][0]:
+                self.pruned += 1
+                return scores
+            j = max(live, key=lambda j: lists[j][1][pos[j]][:2])
+            b, keys, _ = lists[j]
+            c, imp, tf, dl = keys[pos[j]]
+            pos[j] += 1
+            docs = b[(tf, imp, dl)]
+            work += len(docs) * len(posts)
+            if work > budget:
+                break
+            in_bucket = total + 0.15 * imp   # docs here: exactly c from this list, importance imp
+            for d in docs:
+                if d in scores:
+                    continue
+                if len(top) == k and (in_bucket < top[0][0] or (in_bucket == top[0][0] and d > -top[0][1])):
+                    break               # the rest of this bucket (ascending ids) cannot beat the k-th
+                score(d)
+        # read every long list whole
+        self.walked += 1
+        if all(isinstance(units[v], int) for v in long_):
+            cand = Counter(cand)        # "count": integer contributions, counted in C
+            for b, keys, _ in lists:
+                for c, imp, tf, dl in keys:
+                    for _ in range(c):
+                        cand.update(b[(tf, imp, dl)])
+        else:
+            for b, keys, _ in lists:
+                for c, imp, tf, dl in keys:
+                    docs = b[(tf, imp, dl)]     # distinct ids: each get() precedes its own update
+                    cand.update(zip(docs, map(add, map(cand.get, docs, repeat(0)), repeat(c))))
+        return cand
+
+    def _score_text(self, text, query, scoring, n, avgdl):
+        low = text.lower()
+        if scoring != "bm25":
+            return sum(low.count(t) for t in query_terms(query))
+        words = _WORD.findall(low)
+        s = 0.0
+        for t in query_terms(query):
+            tf = sum(w.count(t) for w in words)
+            if not tf:
+                continue
+            df = sum(len(self.postings[v]) for v in self._expand_term(t))
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            s += idf * tf * (self.K1 + 1) / (tf + self.K1 * (1 - self.B + self.B * len(words) / avgdl))
+        return s
+
+    def _file_of(self, d):
+        if d >= self.live_base:
+            return str(self.source)
+        return self.segs[bisect.bisect_right([s[1] for s in self.segs], d) - 1][0]
+
+    def records(self, docs, extra=None):
+        """Read episodes back by offset (each file opened once for the batch)."""
+        out = []
+        if not docs:
+            return out
+        with self._lock:                # doc id -> (file, offset) from one consistent generation
+            n = len(self.offsets)
+            where = [(None, extra[d - n]) if d >= n else (self._file_of(d), self.offsets[d]) for d in docs]
+        files = {}
+        try:
+            for path, pos in where:
+                if path is None:
+                    out.append(pos)
+                    continue
+                f = files.get(path)
+                if f is None:
+                    f = files[path] = open(path, "rb")
+                f.seek(pos)
+                try:
+                    out.append(json.loads(f.readline()))
+                except ValueError:
+                    continue            # log rewritten under us; next sync rebuilds
+        finally:
+            for f in files.values():
+                f.close()
+        return out
+
+    def stats(self):
+        with self._lock:
+            self._load()
+            return {"episodes": len(self.offsets), "terms": len(self.postings), "bytes": self.end,
+                    "segments": len(self.segs), "gen": self.gen, "dirty": self._dirty,
+                    "pruned_queries": self.pruned, "walked_queries": self.walked}
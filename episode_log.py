@@ -0,0 +1,293 @@
+# [F031] episode_log.py v1.1 (2026-10-18)
+__FILE_ID__ = "F031"
+__VERSION__ = "1.1"
+
+# Segmented episode log: memory/episodes.jsonl stays the live (append) file; older history
+# is compacted into time-bucketed, read-only segment files:
+#   memory/segments/episodes-2025-08.g3.jsonl ...   (bucket + generation in the name)
+#   memory/segments/manifest.json                   {"gen", "bucket", "segments": [{file, bucket,
+#                                                    min_ts, max_ts, count, bytes}], ...}
+# compact() moves live records older than JENNY_LIVE_DAYS (always leaving the newest
+# JENNY_LIVE_KEEP) into segments, merging duplicate copies (max importance, union of tags,
+# earliest ts + ts_last/seen): a remember/milestone copy "<t>" folds into its "user: <t>" turn,
+# identical non-turn records fold together; turns themselves are never merged (the transcript
+# keeps its order and counts). Only the buckets the moved records fall into are rewritten. It
+# holds the episodes file lock for the whole read + rewrite, so appends from a live GUI simply
+# wait; files of the previous generation are kept until the next pass for readers that still
+# hold the old manifest. segments/cut.json records the live-file cut before the manifest goes
+# out; recover() (MemoryStore startup, every compact) replays it after a crash.
+# Readers use the per-segment min/max ts to skip whole files (tail_records, records_between).
+#
+#   python episode_log.py compact [--force]
+#   python episode_log.py stats
+
+# --- imports ---
+import os, re, sys, json, time, hashlib, pathlib, threading, datetime
+from contextlib import nullcontext
+from memory_io import tail_lines, atomic_write_text, file_lock, FILES
+
+ROOT = pathlib.Path(__file__).resolve().parent
+DATA = ROOT / "memory"
+LIVE_FILE = DATA / "episodes.jsonl"
+SEG_DIR = DATA / "segments"
+MANIFEST = SEG_DIR / "manifest.json"
+CUT_FILE = SEG_DIR / "cut.json"                 # pending live-file cut (see compact)
+
+BUCKET    = os.getenv("JENNY_SEGMENT_BUCKET", "month")          # month | week | day
+LIVE_DAYS = float(os.getenv("JENNY_LIVE_DAYS", "7"))
+LIVE_KEEP = int(os.getenv("JENNY_LIVE_KEEP", "256"))
+INTERVAL  = float(os.getenv("JENNY_COMPACT_INTERVAL", str(6 * 3600)))
+
+_EMPTY = {"version": 1, "gen": 0, "bucket": BUCKET, "segments": []}
+
+def _parse(lines):
+    out = []
+    for ln in lines:
+        try:
+            out.append(json.loads(ln))
+        except Exception:
+            continue
+    return out
+
+def bucket_of(ts, bucket=BUCKET):
+    d = datetime.datetime.fromtimestamp(int(ts or 0), datetime.timezone.utc)
+    if bucket == "day":
+        return d.strftime("%Y-%m-%d")
+    if bucket == "week":
+        y, w, _ = d.isocalendar()
+        return f"{y}-W{w:02d}"
+    return d.strftime("%Y-%m")
+
+def read_manifest():
+    """Current manifest (stat-validated cache; empty when nothing was compacted yet)."""
+    return FILES.read_json(MANIFEST, default=_EMPTY)
+
+def segment_path(seg):
+    return SEG_DIR / seg["file"]
+
+def read_segment(seg):
+    with open(segment_path(seg), "rb") as f:
+        return _parse(f.read().splitlines())
+
+# --- reads that skip whole files ---
+def tail_records(n, live=LIVE_FILE):
+    """Newest n episodes, oldest first: live file tail, then segments newest-first as needed."""
+    recs = _parse(tail_lines(live, n))
+    for seg in reversed(read_manifest()["segments"]):
+        if len(recs) >= n:
+            break
+        try:
+            recs = _parse(tail_lines(segment_path(seg), n - len(recs))) + recs
+        except FileNotFoundError:
+            continue
+    return recs[-n:] if n else []
+
+def records_between(ts_from=None, ts_to=None, live=LIVE_FILE):
+    """Episodes with ts_from <= ts <= ts_to (None = open end), oldest first."""
+    lo = float("-inf") if ts_from is None else ts_from
+    hi = float("inf") if ts_to is None else ts_to
+    out = []
+    for seg in read_manifest()["segments"]:
+        if seg["max_ts"] < lo or seg["min_ts"] > hi:
+            continue                                   # whole file out of range
+        out.extend(r for r in read_segment(seg) if lo <= r.get("ts", 0) <= hi)
+    try:
+        with open(live, "rb") as f:
+            out.extend(r for r in _parse(f.read().splitlines()) if lo <= r.get("ts", 0) <= hi)
+    except FileNotFoundError:
+        pass
+    return out
+
+# --- compaction ---
+_ROLE = re.compile(r"^(user|assistant):\s*", re.I)
+
+def _norm(text):
+    """Comparison key: a turn "user: <t>" and its remember/milestone copy "<t>" match."""
+    return _ROLE.sub("", text, count=1).strip()
+
+def dedupe(records):
+    """
+    Duplicate copies -> one record: earliest ts, max importance, merged tags (+ ts_last, seen).
+    Turn records are kept one per line; a non-turn record folds into the latest turn with the
+    same text (role prefix ignored), else into an earlier identical non-turn record.
+    """
+    turns, by_text, out = {}, {}, []
+    for r in records:
+        text = (r.get("text") or "").strip()
+        if not text:
+            continue
+        key = _norm(text)
+        if "turn" in (r.get("tags") or []):
+            cur = dict(r)
+            cur["tags"] = list(r.get("tags") or [])
+            turns[key] = cur
+            out.append(cur)
+            continue
+        cur = turns.get(key) or by_text.get(key)
+        if cur is None:
+            cur = by_text[key] = dict(r)
+            cur["tags"] = list(r.get("tags") or [])
+            out.append(cur)
+            continue
+        _merge(cur, r)
+    return out
+
+def _merge(cur, r):
+    cur["importance"] = max(int(cur.get("importance", 3)), int(r.get("importance", 3)))
+    cur["tags"] += [t for t in r.get("tags") or [] if t not in cur["tags"]]
+    ts = r.get("ts", 0)
+    cur["ts_last"] = max(cur.get("ts_last", cur.get("ts", 0)), r.get("ts_last", ts))
+    if ts < cur.get("ts", ts):
+        cur["ts"] = ts
+    cur["seen"] = cur.get("seen", 1) + r.get("seen", 1)
+
+def _encode(records):
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+
+def compact(live=LIVE_FILE, live_days=LIVE_DAYS, keep=LIVE_KEEP, writer=None, force=False, bucket=BUCKET):
+    """
+    Move old live records into deduplicated segments; returns a stats dict.
+    writer: the in-process EpisodeWriter (its lock is held too, so readers see one snapshot).
+    Only the buckets the moved records fall into are re-read and rewritten.
+    """
+    t0 = time.time()
+    with (writer.lock if writer is not None else nullcontext()), file_lock(live):
+        _replay_cut(live)
+        try:
+            with open(live, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        rows, pos = [], 0                             # (byte offset, record); unparseable lines skipped
+        for ln in data.splitlines(keepends=True):
+            if ln.strip():
+                try:
+                    rows.append((pos, json.loads(ln)))
+                except Exception:
+                    pass
+            pos += len(ln)
+        recs = [r for _, r in rows]
+        cutoff = time.time() - live_days * 86400
+        split = 0
+        while split < len(recs) - keep and recs[split].get("ts", 0) < cutoff:
+            split += 1
+        if force:
+            split = max(split, len(recs) - keep)
+        man = read_manifest()
+        if split <= 0:
+            return {"moved": 0, "segments": len(man["segments"]), "gen": man["gen"]}
+
+        moved = {}
+        for r in recs[:split]:
+            moved.setdefault(bucket_of(r.get("ts"), bucket), []).append(r)
+        SEG_DIR.mkdir(parents=True, exist_ok=True)
+        gen = man["gen"] + 1
+        segs = {s["bucket"]: s for s in man["segments"]}
+        before = after = 0
+        for b in moved:
+            old = []
+            if b in segs:
+                try:
+                    old = read_segment(segs[b])
+                except FileNotFoundError:
+                    print(f"[episodes] segment {segs[b]['file']} missing; skipped")
+            rs = sorted(dedupe(old + moved[b]), key=lambda r: r.get("ts", 0))
+            before, after = before + len(old) + len(moved[b]), after + len(rs)
+            text = _encode(rs)
+            name = f"episodes-{b}.g{gen}.jsonl"
+            atomic_write_text(SEG_DIR / name, text)
+            segs[b] = {"file": name, "bucket": b, "min_ts": rs[0].get("ts", 0),
+                       "max_ts": max(r.get("ts_last", r.get("ts", 0)) for r in rs),
+                       "count": len(rs), "bytes": len(text.encode("utf-8"))}
+        segments = [segs[b] for b in sorted(segs)]
+
+        # crash safety: the cut marker goes down before the manifest; _replay_cut() finishes a
+        # live-file rewrite that a crash interrupted (the moved records are in segments by then)
+        cut = rows[split][0] if split < len(rows) else len(data)
+        atomic_write_text(CUT_FILE, json.dumps({"gen": gen, "bytes": cut,
+                                                "sha1": hashlib.sha1(data[:cut]).hexdigest()}))
+        FILES.write_json(MANIFEST, {"version": 1, "gen": gen, "bucket": bucket, "segments": segments,
+                                    "compacted_at": int(time.time())}, indent=1)
+        _cut_live(live, data, cut)                    # unparseable lines before the cut are dropped
+        os.unlink(CUT_FILE)
+
+        # previous generation stays for readers holding the old manifest; older ones go
+        keep_files = {s["file"] for s in segments} | {s["file"] for s in man["segments"]}
+        for p in SEG_DIR.glob("episodes-*.jsonl"):
+            if p.name not in keep_files:
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+    stats = {"moved": split, "merged": before - after, "live": len(rows) - split,
+             "segments": len(segments), "rewritten": len(moved), "gen": gen,
+             "ms": round((time.time() - t0) * 1000, 1)}
+    print(f"[episodes] compacted {stats}")
+    return stats
+
+def _cut_live(live, data, cut):
+    rest = data[cut:]
+    if rest and not rest.endswith(b"\n"):
+        rest += b"\n"                                # torn last line: keep later appends apart
+    atomic_write_text(live, rest.decode("utf-8", "replace"))
+
+def _replay_cut(live):
+    """Finish a compaction that crashed between publishing its manifest and cutting the live
+    file (caller holds the episodes file lock)."""
+    try:
+        mark = json.loads(CUT_FILE.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return
+    except ValueError:
+        mark = None                                   # torn marker: its manifest never went out
+    if mark is not None and read_manifest()["gen"] == mark["gen"]:
+        try:
+            with open(live, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        if len(data) >= mark["bytes"] and hashlib.sha1(data[:mark["bytes"]]).hexdigest() == mark["sha1"]:
+            _cut_live(live, data, mark["bytes"])
+            print(f"[episodes] finished interrupted compaction g{mark['gen']}")
+    os.unlink(CUT_FILE)
+
+def recover(live=LIVE_FILE):
+    """Startup check: replay a pending live-file cut left by a crashed compaction."""
+    if CUT_FILE.exists():
+        with file_lock(live):
+            _replay_cut(live)
+
+def stats():
+    man = read_manifest()
+    try:
+        live = os.stat(LIVE_FILE).st_size
+    except FileNotFoundError:
+        live = 0
+    return {"gen": man["gen"], "segments": man["segments"], "live_bytes": live}
+
+
+_thread = None
+
+def start_compactor(store, interval=INTERVAL):
+    """Periodic compaction inside the GUI process (JENNY_COMPACT_INTERVAL=0 disables)."""
+    global _thread
+    if interval <= 0 or _thread is not None:
+        return
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                store.compact()
+            except Exception as e:
+                print(f"[episodes] compaction failed: {e}")
+    _thread = threading.Thread(target=loop, name="jenny-compactor", daemon=True)
+    _thread.start()
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if cmd == "compact":
+        from memory_store import MEM
+        print(MEM.compact(force="--force" in sys.argv))
+    else:
+        print(json.dumps(stats(), indent=1))
@@ -1,6 +1,7 @@
-import os, time, requests, re, html
+import os, time, re, html
 from flask import Flask, request, jsonify, render_template_string
 from memory_manager import load_bootstrap_prompt
+from client_ollama import client_for
 
 # -------- config from env (defaults chosen for snappy CPU use) --------
 BASE  = os.getenv('JENNY_BASE',  'http://127.0.0.1:11435')
@@ -23,8 +24,8 @@ print(f"[Jenny GUI] BASE={BASE} MODEL={MODEL} OPTS={OPTS}", flush=True)
 
 def ask_local(user_text: str) -> str:
     msgs = [{"role": "user", "content": user_text}]
-    r = requests.post(
-        f"{BASE}/api/chat",
+    r = client_for(BASE).post(
+        "/api/chat",
         json={"model": MODEL, "messages": msgs, "options": OPTS, "stream": False},
         timeout=60,
     )
@@ -1,30 +1,72 @@
 # [F012] gui_app.py — Jenny GUI (file upload + URL fetch + voice + heartbeat + timestamps + Enter-to-send)
-import datetime, time, re, html, requests
-from flask import Flask, request, jsonify, render_template_string
-from chat_loop import ask, MODEL as CHAT_MODEL, BASE as CHAT_BASE
-
-APP = Flask(__name__)
-
-# ---- server-side small fence to prevent echoes/dupes ----
-_state = {"last_user": None, "t_user": 0.0, "last_reply": None}
-
-def _strip_html(t: str) -> str:
-    t = re.sub(r"<[^>]+>", " ", t)               # drop tags
-    t = html.unescape(t)
-    t = re.sub(r"\s+", " ", t).strip()
-    return t
-
-def _fetch_url_text(url: str, max_chars: int = 15000) -> str:
+import os, datetime, time, json, threading
+from flask import (Flask, Blueprint, current_app, g, request, jsonify, render_template_string,
+                   Response, stream_with_context)
+from chat_loop import ask, ask_stream, cached_reply, context_budget, on_eval_stats, MODEL as CHAT_MODEL, BASE as CHAT_BASE, CLIENT as OLLAMA, LAST_EVAL
+from client_ollama import client_stats
+from prompt_builder import prompt_stats
+from scheduler import SCHED, Busy
+from response_cache import RCACHE
+from url_cache import URLS, MAX_TEXT as URL_MAX_CHARS
+from health import HealthMonitor
+from residency import ResidencyManager
+from upload_store import UPLOADS, UPLOAD_MB, MAX_UPLOAD, TooLarge, valid_sha
+import summarizer, episode_log
+from memory_io import try_lock
+from knowledge import KB, start_ingest, pack_chunks
+from memory_store import MEM
+from session_store import (SessionManager, SESSION_COOKIE, SESSION_HEADER, IDLE_TTL,
+                           new_session_id, valid_session_id)
+
+# routes live on a blueprint; create_app() builds the app (dev server here, WSGI workers via serve.py)
+BP = Blueprint("jenny", __name__)
+
+# ---- per-session state (echo/dup fences + conversation): in-process LRU backed by SQLite ----
+def _session():
+    """State dict for this request's session id (X-Session-Id header or jenny_sid cookie)."""
+    if "session" not in g:
+        sid = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+        if not valid_session_id(sid):
+            sid = new_session_id()
+        g.sid = sid
+        g.session = current_app.config["SESSIONS"].get(sid)
+    return g.session
+
+# Ollama liveness/RTT/loaded models, probed in the background; /api/ping reads the cache
+HEALTH = HealthMonitor(OLLAMA, CHAT_MODEL)
+HEALTH_STREAM_SECS = 300        # SSE connections are recycled (EventSource reconnects)
+# each open stream holds a server thread: past this many per process tabs get 503 and poll instead
+HEALTH_STREAMS = threading.BoundedSemaphore(int(os.getenv("JENNY_HEALTH_STREAMS", "2")))
+# keeps the chat model (and jenny-lite/-fast within JENNY_MODEL_RAM_GB) loaded; fed by every reply
+RESIDENCY = ResidencyManager(OLLAMA, CHAT_MODEL, health=HEALTH)
+on_eval_stats(lambda st: RESIDENCY.touch(CHAT_MODEL, st))
+
+# fence check + mark happen under one lock (concurrent tabs/threads share session state)
+_FENCE = threading.Lock()
+# a resubmit of the turn still in flight waits this long for its reply (then gets "")
+COALESCE_WAIT = float(os.getenv("JENNY_COALESCE_WAIT", "300"))
+
+class _Turn:
+    """The turn in flight for a session (state["_inflight"]); resubmits of its text wait on it."""
+    __slots__ = ("text", "done", "reply")
+
+    def __init__(self, text):
+        self.text, self.done, self.reply = text, threading.Event(), ""
+
+    def wait(self):
+        self.done.wait(COALESCE_WAIT)
+        return self.reply
+
+def _busy(e):
+    resp = jsonify({"reply": "", "busy": True, "error": str(e)})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp
+
+def _fetch_url_text(url: str, max_chars: int = URL_MAX_CHARS) -> str:
+    # on-disk cache + conditional revalidation; usually already warmed by /api/prefetch
     try:
-        r = requests.get(url, timeout=6, headers={"User-Agent": "JennyLocal/1.0"})
-        r.raise_for_status()
-        ct = r.headers.get("content-type", "")
-        if not any(s in ct for s in ("text", "html", "json")):
-            return ""
-        txt = r.text
-        if "html" in ct:
-            txt = _strip_html(txt)
-        return txt[:max_chars]
+        return URLS.get_text(url, max_chars)
     except Exception:
         return ""
 
@@ -79,10 +121,10 @@ PAGE = """
   <div class="row" style="margin-top:10px">
     <input type="text" id="url" placeholder="https://example.com/article…" />
     <label><input type="checkbox" id="useWeb"> include URL content</label>
-    <input type="file" id="files" multiple accept=".txt,.md,.json,.jsonl"/>
+    <input type="file" id="files" multiple accept=".txt,.md,.json,.jsonl,.csv,.pdf,.docx"/>
     <div class="chips" id="fileChips"></div>
   </div>
-  <div class="hint">Uploads supported now: .txt, .md, .json, .jsonl (max 1 MB total). We’ll add PDFs later.</div>
+  <div class="hint" id="hint">Uploads: .txt, .md, .json, .jsonl, .csv, .pdf, .docx (max {{ upload_mb }} MB per file; the same file is only sent once).</div>
 
   <form id="f">
     <textarea id="q" placeholder="Type to Jenny…" autofocus></textarea>
@@ -115,6 +157,8 @@ document.addEventListener('DOMContentLoaded', ()=>{
   const useWeb= document.getElementById('useWeb');
   const files = document.getElementById('files');
   const chips = document.getElementById('fileChips');
+  const hint  = document.getElementById('hint');
+  const UPLOAD_MAX = {{ upload_max }};
   const voiceIn  = document.getElementById('voiceIn');
   const voiceOut = document.getElementById('voiceOut');
   const voiceSel = document.getElementById('voiceSel');
@@ -133,62 +177,168 @@ document.addEventListener('DOMContentLoaded', ()=>{
 
   function ts(){ return new Date().toLocaleTimeString([], {hour:'2-digit', minute:'2-digit'}); }
 
-  function add(role, text){
+  function add(role, text, live=false){
     const div = document.createElement('div');
     div.className = role === 'user' ? 'u' : 'a';
     const who = (role==='user'?'You':'Jenny');
-    div.innerHTML = `<strong>${who}:</strong> ${text} <span class="ts">${ts()}</span>`;
+    div.innerHTML = `<strong>${who}:</strong> <span class="txt">${text}</span> <span class="ts">${ts()}</span>`;
     log.appendChild(div);
     log.scrollTop = log.scrollHeight;
 
-    // TTS (optional)
-    if (role==='assistant' && voiceOut?.checked && 'speechSynthesis' in window){
-      const ut = new SpeechSynthesisUtterance(text);
-      const v = (voices || []).find(v=>v.name === (voiceSel?.value || ''));
-      if (v) ut.voice = v;
-      if (rate)  ut.rate  = parseFloat(rate.value)  || 1.0;
-      if (pitch) ut.pitch = parseFloat(pitch.value) || 1.0;
-      speechSynthesis.cancel(); speechSynthesis.speak(ut);
-    }
+    const finish = (full)=>{
+      // TTS (optional)
+      if (role==='assistant' && voiceOut?.checked && 'speechSynthesis' in window){
+        const ut = new SpeechSynthesisUtterance(full);
+        const v = (voices || []).find(v=>v.name === (voiceSel?.value || ''));
+        if (v) ut.voice = v;
+        if (rate)  ut.rate  = parseFloat(rate.value)  || 1.0;
+        if (pitch) ut.pitch = parseFloat(pitch.value) || 1.0;
+        speechSynthesis.cancel(); speechSynthesis.speak(ut);
+      }
+
+      // heartbeat: the health push channel refreshes the status pill
+      if (stat && dot) { stat.textContent='online'; dot.classList.add('ok'); dot.classList.remove('bad'); }
+    };
+    if (!live) { finish(text); return div; }
+
+    // streamed bubble: push() appends deltas as they arrive, done() finalizes
+    const span = div.querySelector('.txt');
+    return {
+      push(delta){ span.textContent += delta; log.scrollTop = log.scrollHeight; },
+      done(full){ if (!span.textContent) span.textContent = full || '(no reply)'; finish(full); },
+    };
+  }
 
-    // heartbeat refresh
-    ping();
-    if (stat && dot) { stat.textContent='online'; dot.classList.add('ok'); dot.classList.remove('bad'); }
+  // attachments are packed into the model's context window; say what did not fit
+  function showContext(rep){
+    if (!hint || !rep) return;
+    const kept = rep.tokens - rep.dropped_tokens;
+    hint.textContent = rep.dropped_tokens
+      ? `📎 context: kept ${kept} of ${rep.tokens} tokens (${rep.kept}/${rep.chunks} parts most relevant to your request)`
+      : `📎 context: all ${rep.tokens} tokens of the attachments included`;
+  }
+
+  // stream a reply over SSE from /api/chat/stream; falls back to plain /api/chat
+  async function sendChat(body){
+    const r = await fetch('/api/chat/stream', {
+      method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify(body)
+    });
+    if (r.status === 503){
+      const j = await r.json().catch(()=>({}));
+      add('assistant', '⏳ model busy, try again in a moment' + (j.error ? ` (${j.error})` : ''));
+      return '';
+    }
+    if (!r.ok || !r.body || !r.body.getReader){
+      const rr = await fetch('/api/chat', {
+        method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify(body)
+      });
+      const j = await rr.json();
+      showContext(j.context);
+      add('assistant', j.reply || '(no reply)');
+      return j.reply || '';
+    }
+    const live = add('assistant', '', true);
+    const reader = r.body.getReader(), dec = new TextDecoder();
+    let buf = '', reply = '';
+    for(;;){
+      const {value, done} = await reader.read();
+      if (done) break;
+      buf += dec.decode(value, {stream:true});
+      let i;
+      while ((i = buf.indexOf('\\n\\n')) >= 0){
+        const ev = buf.slice(0, i); buf = buf.slice(i + 2);
+        let name = 'message', data = '';
+        for (const ln of ev.split('\\n')){
+          if (ln.startsWith('event:')) name = ln.slice(6).trim();
+          else if (ln.startsWith('data:')) data += ln.slice(5).trim();
+        }
+        if (!data) continue;
+        const j = JSON.parse(data);
+        if (name === 'delta'){ reply += j.delta; live.push(j.delta); }
+        else if (name === 'done'){ reply = (j.reply ?? reply); }
+        else if (name === 'context'){ showContext(j); }
+        else if (name === 'error'){ live.push('⚠️ ' + j.error); }
+      }
+    }
+    live.done(reply);
+    return reply;
   }
 
-  // heartbeat
+  // heartbeat: server pushes health snapshots (SSE); polling /api/ping only as a fallback
+  function showHealth(j){
+    if (model) model.textContent = j.model || '—';
+    if (stat)  stat.textContent  = j.ok ? `online ${j.rtt_ms} ms` : (j.ok === null ? 'checking…' : 'offline');
+    if (dot)  { dot.classList.toggle('ok', !!j.ok); dot.classList.toggle('bad', j.ok === false); }
+  }
   async function ping(){
     try{
-      const r = await fetch('/api/ping'); const j = await r.json();
-      if (model) model.textContent = j.model || '—';
-      if (stat)  stat.textContent  = j.ok ? `online ${j.rtt_ms} ms` : 'offline';
-      if (dot)  { dot.classList.toggle('ok', !!j.ok); dot.classList.toggle('bad', !j.ok); }
+      const r = await fetch('/api/ping'); showHealth(await r.json());
     }catch{
       if (stat) stat.textContent='offline';
       if (dot) { dot.classList.remove('ok'); dot.classList.add('bad'); }
     }
   }
-  setInterval(ping, 8000); ping();
+  let pollTimer = null;
+  function startPolling(){ if (!pollTimer){ pollTimer = setInterval(ping, 8000); ping(); } }
+  if (window.EventSource){
+    const es = new EventSource('/api/health/stream');
+    es.addEventListener('health', ev=>{
+      if (pollTimer){ clearInterval(pollTimer); pollTimer = null; }
+      showHealth(JSON.parse(ev.data));
+    });
+    es.onerror = ()=>{ if (es.readyState === EventSource.CLOSED) startPolling(); };
+  } else {
+    startPolling();
+  }
+
+  // warm the server-side URL cache while the message is being typed
+  let prefetchTimer = null;
+  function prefetchUrl(){
+    clearTimeout(prefetchTimer);
+    const u = (urlEl?.value || '').trim();
+    if (!useWeb?.checked || !/^https?:\/\//.test(u)) return;
+    prefetchTimer = setTimeout(()=>{
+      fetch('/api/prefetch', {method:'POST', headers:{'Content-Type':'application/json'},
+                              body: JSON.stringify({url: u})}).catch(()=>{});
+    }, 400);
+  }
+  urlEl?.addEventListener('input', prefetchUrl);
+  useWeb?.addEventListener('change', prefetchUrl);
 
   // file chips
   files?.addEventListener('change', ()=>{
     if (!chips) return;
     chips.innerHTML = '';
-    let total = 0;
     for (const f of files.files){
-      total += f.size;
       const c = document.createElement('span');
       c.className='chip'; c.textContent = `${f.name} (${Math.round(f.size/1024)} KB)`;
+      if (f.size > UPLOAD_MAX){
+        c.style='background:#3a1e1e;border-color:#442;';
+        c.textContent += ' too large';
+      }
       chips.appendChild(c);
     }
-    if (total > 1024*1024){
-      const warn = document.createElement('span');
-      warn.className='chip'; warn.style='background:#3a1e1e;border-color:#442;';
-      warn.textContent='Too large (>1MB)';
-      chips.appendChild(warn);
-    }
   });
 
+  // attachments go up once as multipart, content-addressed by sha256; chat sends the hash only
+  async function sha256Hex(f){
+    if (!window.crypto?.subtle) return '';
+    const h = await crypto.subtle.digest('SHA-256', await f.arrayBuffer());
+    return [...new Uint8Array(h)].map(b=>b.toString(16).padStart(2,'0')).join('');
+  }
+  async function uploadFile(f){
+    const sha = await sha256Hex(f);
+    if (sha){
+      const r = await fetch('/api/upload/' + sha);
+      if (r.ok) return {sha256: sha, name: f.name};      // already on the server
+    }
+    const fd = new FormData(); fd.append('file', f, f.name);
+    const r = await fetch('/api/upload', {method:'POST', body: fd});
+    const j = await r.json().catch(()=>({}));
+    if (!r.ok) throw new Error(`${f.name}: ${j.error || 'upload failed (' + r.status + ')'}`);
+    return {sha256: j.sha256, name: f.name};
+  }
+
   // submit (Enter=send; Shift+Enter=newline) + echo/dup guards
   form.addEventListener('submit', async (e)=>{
     e.preventDefault();
@@ -203,30 +353,22 @@ document.addEventListener('DOMContentLoaded', ()=>{
     busy = true; btn.disabled = true; q.disabled = true;
 
     if(files?.files?.length){
-      let total=0; for(const f of files.files) total += f.size;
-      if(total > 1024*1024){ add('assistant','⚠️ upload too large (>1MB total)'); busy=false; btn.disabled=false; q.disabled=false; return; }
+      const big = [...files.files].find(f=>f.size > UPLOAD_MAX);
+      if(big){ add('assistant',`⚠️ ${big.name} is too large (max ${Math.round(UPLOAD_MAX/1048576)} MB)`); busy=false; btn.disabled=false; q.disabled=false; return; }
     }
 
     add('user', text);
-    const readFile = f => new Promise((res, rej)=>{ const r=new FileReader(); r.onload=()=>res({name:f.name, content:r.result}); r.onerror=rej; r.readAsText(f); });
-    const filePayload = [];
-    if (files) for(const f of files.files){ filePayload.push(await readFile(f)); }
-
     try{
-      const r = await fetch('/api/chat', {
-        method:'POST',
-        headers:{'Content-Type':'application/json'},
-        body: JSON.stringify({
-          text,
-          url: (urlEl?.value || '').trim(),
-          use_web: !!(useWeb?.checked),
-          files: filePayload
-        })
+      const filePayload = [];
+      if (files) for(const f of files.files){ filePayload.push(await uploadFile(f)); }
+      const reply = await sendChat({
+        text,
+        url: (urlEl?.value || '').trim(),
+        use_web: !!(useWeb?.checked),
+        files: filePayload
       });
-      const j = await r.json();
-      add('assistant', j.reply || '(no reply)');
       lastUser = text;
-      lastAssistant = (j.reply || '');
+      lastAssistant = (reply || '');
     }catch(err){
       add('assistant', '⚠️ ' + err);
     }finally{
@@ -291,74 +433,324 @@ document.addEventListener('DOMContentLoaded', ()=>{
 </html>
 """
 
-@APP.get("/")
+@BP.get("/")
 def home():
-    return render_template_string(PAGE)
+    return render_template_string(PAGE, upload_mb=f"{UPLOAD_MB:g}", upload_max=MAX_UPLOAD)
 
-@APP.get("/api/ping")
+@BP.get("/api/ping")
 def api_ping():
-    t0 = time.time()
-    ok = False
+    # answered from the monitor's cache; probes inline only when it has nothing recent
+    snap = HEALTH.snapshot()
+    if snap["age_ms"] is None or snap["age_ms"] > max(30_000, HEALTH.interval * 3000):
+        HEALTH.probe()
+        snap = HEALTH.snapshot()
+    return jsonify(snap)
+
+@BP.get("/api/health/stream")
+def api_health_stream():
+    """Health snapshots as Server-Sent Events (one per probe), so tabs need not poll /api/ping."""
+    if not HEALTH_STREAMS.acquire(blocking=False):
+        # keep threads for /api/chat; EventSource gives up on a non-200 and the page polls
+        resp = jsonify({"ok": False, "error": "too many health streams; poll /api/ping"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "30"
+        return resp
+    released = []
+    def release():
+        if not released:
+            released.append(True)
+            HEALTH_STREAMS.release()
+    def events():
+        try:
+            snap = HEALTH.snapshot()
+            seq, until = snap["seq"], time.time() + HEALTH_STREAM_SECS
+            yield "retry: 3000\n" + _sse("health", snap)
+            while time.time() < until:
+                s = HEALTH.wait(seq, 15)
+                if s is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                seq = s["seq"]
+                yield _sse("health", s)
+        finally:
+            release()
+    resp = Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    resp.call_on_close(release)         # client gone before the stream started
+    return resp
+
+@BP.get("/api/stats")
+def api_stats():
+    # pooled HTTP timing/reuse + prompt block memo + last Ollama eval counters
+    return jsonify({"http": client_stats(), "prompt": prompt_stats(), "eval": LAST_EVAL,
+                    "sessions": current_app.config["SESSIONS"].stats(), "scheduler": SCHED.stats(),
+                    "response_cache": RCACHE.stats(), "knowledge": KB.stats(), "url_cache": URLS.stats(),
+                    "uploads": UPLOADS.stats(), "health": HEALTH.snapshot(),
+                    "residency": RESIDENCY.stats()})
+
+# attachments/URL text are chunked and ranked against the request, then packed into what is
+# left of num_ctx (context_budget); ATTACH_MIN keeps the best part even when that is ~nothing
+ATTACH_MAX_CHARS = 200_000     # per file, before chunking
+ATTACH_MIN_TOKENS = 128
+
+@BP.post("/api/upload")
+def api_upload():
+    """Multipart `file` -> {sha256, name, size, chars, error}; stored once per unique content."""
+    if (request.content_length or 0) > MAX_UPLOAD + 64 * 1024:
+        return jsonify({"error": f"file larger than {UPLOAD_MB:g} MB"}), 413
+    f = request.files.get("file")
+    if f is None:
+        return jsonify({"error": "no file"}), 400
     try:
-        r = requests.get(f"{CHAT_BASE}/api/tags", timeout=2)
-        r.raise_for_status()
-        ok = True
-    except Exception:
-        ok = False
-    rtt = int((time.time()-t0)*1000)
-    return jsonify({"ok": ok, "rtt_ms": rtt, "model": CHAT_MODEL})
-
-@APP.post("/api/chat")
-def api_chat():
+        meta = UPLOADS.save(f.stream, f.filename)
+    except TooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    return jsonify(meta)
+
+@BP.get("/api/upload/<sha>")
+def api_upload_info(sha):
+    meta = UPLOADS.info(sha)
+    if meta is None:
+        return jsonify({"error": "unknown upload"}), 404
+    return jsonify(meta)
+
+@BP.post("/api/prefetch")
+def api_prefetch():
+    """Start fetching {url} in the background so the next chat finds its text ready."""
+    url = ((request.get_json(silent=True) or {}).get("url") or "").strip()
+    if not (url.startswith("http://") or url.startswith("https://")):
+        return jsonify({"ok": False, "error": "not an http(s) URL"}), 400
+    return jsonify({"ok": True, "state": URLS.prefetch(url)})
+
+def _prepare_turn(data):
+    """
+    (text, now, text_for_model, context report | None) for a chat request, None when
+    fenced/empty, or the in-flight _Turn when this is a resubmit of it (wait() for its reply).
+    """
     import time as _t
-    data = request.get_json(silent=True) or {}
     text = (data.get("text") or "").strip()
     if not text:
-        return jsonify({"reply": ""})
+        return None
 
-    # server-side echo/dup fences
+    # server-side echo/dup fences (+ coalesce a resubmit of the turn still in flight)
+    state = _session()
     now = _t.time()
-    if text == _state["last_user"] and (now - _state["t_user"]) < 1.5:
-        return jsonify({"reply": ""})
-    if _state["last_reply"] and text == _state["last_reply"]:
-        return jsonify({"reply": ""})
-
-    # Build optional context from URL + files
-    ctx_chunks = []
+    with _FENCE:
+        if text == state["last_user"] and (now - state["t_user"]) < 1.5:
+            return None
+        if state["last_reply"] and text == state["last_reply"]:
+            return None
+        cur = state.get("_inflight")
+        if cur is not None and cur.text == text:
+            return cur
+        state["_inflight"] = _Turn(text)
+    try:
+        return _build_turn(data, state, text, now)
+    except BaseException:
+        _end_turn(state, text)
+        raise
+
+def _end_turn(state, text, reply=""):
+    """Drop the in-flight fence of text and hand reply to waiting resubmits (every exit path
+    of a turn: done, error, disconnect)."""
+    with _FENCE:
+        cur = state.get("_inflight")
+        if cur is None or cur.text != text:
+            return
+        state.pop("_inflight", None)
+    cur.reply = reply
+    cur.done.set()
+
+def _build_turn(data, state, text, now):
+    # Build optional context from URL + files: (label, text) sources
+    sources = []
 
     if data.get("use_web") and data.get("url"):
         url = data["url"].strip()
         if url.startswith("http://") or url.startswith("https://"):
             url_text = _fetch_url_text(url)
-            if url_text:
-                ctx_chunks.append(f"### URL: {url}\n{url_text}")
-            else:
-                ctx_chunks.append(f"### URL: {url}\n(unable to fetch or not text/html)")
+            sources.append((f"URL: {url}", url_text or "(unable to fetch or not text/html)"))
         else:
-            ctx_chunks.append(f"### URL provided was not http(s): {url}")
+            sources.append(("URL", f"(provided URL was not http(s): {url})"))
 
-    files = data.get("files") or []
-    total_chars = 0
-    for f in files:
+    for f in data.get("files") or []:
         name = (f.get("name") or "upload.txt")[:80]
-        content = (f.get("content") or "")[:20000]
-        total_chars += len(content)
-        if total_chars > 60000:   # cap total
-            break
-        ctx_chunks.append(f"### FILE: {name}\n{content}")
-
-    combined_ctx = ("\n\n".join(ctx_chunks)).strip()
-    text_for_model = (f"### EXTRA CONTEXT\n{combined_ctx}\n\n### USER REQUEST\n{text}"
-                      if combined_ctx else text)
-
-    reply = ask(text_for_model)
-
+        if valid_sha(f.get("sha256")):                 # uploaded via /api/upload, text extracted there
+            content = UPLOADS.text(f["sha256"])
+            if content is None:
+                content = "(upload expired; attach the file again)"
+            elif not content.strip():
+                content = "(no text could be extracted from this file)"
+        else:                                          # older clients: text inline in the JSON body
+            content = f.get("content") or ""
+        content = content[:ATTACH_MAX_CHARS]
+        if content.strip():
+            sources.append((f"FILE: {name}", content))
+
+    if not sources:
+        return text, now, text, None
+    budget = max(ATTACH_MIN_TOKENS, context_budget(text, state))
+    combined_ctx, report = pack_chunks(sources, text, budget)
+    note = ("" if not report["dropped_tokens"] else
+            f" (most relevant parts: kept {report['tokens'] - report['dropped_tokens']} of {report['tokens']} tokens)")
+    text_for_model = f"### EXTRA CONTEXT{note}\n{combined_ctx}\n\n### USER REQUEST\n{text}"
+    if report["dropped_tokens"]:
+        print(f"[context] packed {report['kept']}/{report['chunks']} chunks into {budget} tokens, "
+              f"dropped {report['dropped_tokens']} tokens")
+    return text, now, text_for_model, report
+
+def _remember_turn(state, text, now, reply):
     # remember for fences
-    _state["last_user"]  = text
-    _state["t_user"]     = now
-    _state["last_reply"] = reply
+    with _FENCE:
+        state["last_user"]  = text
+        state["t_user"]     = now
+        state["last_reply"] = reply
+
+def _admit(state, text_for_model, use_cache):
+    """Generation slot for this session (None for a cache hit)."""
+    if use_cache and cached_reply(text_for_model, state) is not None:
+        return None
+    return SCHED.acquire(g.sid)
+
+@BP.post("/api/chat")
+def api_chat():
+    data = request.get_json(silent=True) or {}
+    turn = _prepare_turn(data)
+    if turn is None:
+        return jsonify({"reply": ""})
+    if isinstance(turn, _Turn):                     # resubmit: same answer as the original
+        return jsonify({"reply": turn.wait(), "coalesced": True})
+    text, now, text_for_model, report = turn
 
-    return jsonify({"reply": reply})
+    state = _session()
+    use_cache = not data.get("no_cache")
+    reply = ""
+    try:
+        try:
+            slot = _admit(state, text_for_model, use_cache)
+            try:
+                # a cache entry gone since _admit makes ask() queue under this session's key
+                reply = ask(text_for_model, state, slot, use_cache, key=g.sid)
+            finally:
+                if slot is not None:
+                    slot.release()
+        except Busy as e:
+            return _busy(e)
+        _remember_turn(state, text, now, reply)
+        current_app.config["SESSIONS"].put(g.sid, state)
+    finally:
+        _end_turn(state, text, reply)
+
+    out = {"reply": reply}
+    if report is not None:
+        out["context"] = report
+    return jsonify(out)
+
+def _sse(event, obj):
+    return f"event: {event}\ndata: {json.dumps(obj, ensure_ascii=False)}\n\n"
+
+@BP.post("/api/chat/stream")
+def api_chat_stream():
+    """Same request body as /api/chat; reply relayed as Server-Sent Events (delta…, done)."""
+    data = request.get_json(silent=True) or {}
+    turn = _prepare_turn(data)
+    state, sid, sessions = _session(), g.sid, current_app.config["SESSIONS"]
+    slot, use_cache = None, not data.get("no_cache")
+    if isinstance(turn, tuple):
+        try:
+            slot = _admit(state, turn[2], use_cache)   # shed before any SSE headers go out
+        except BaseException as e:
+            _end_turn(state, turn[0])
+            if isinstance(e, Busy):
+                return _busy(e)
+            raise
+
+    def events():
+        if turn is None:
+            yield _sse("done", {"reply": ""})
+            return
+        if isinstance(turn, _Turn):
+            yield _sse("done", {"reply": turn.wait(), "coalesced": True})
+            return
+        text, now, text_for_model, report = turn
+        if report is not None:
+            yield _sse("context", report)
+        buf, reply = [], ""
+        try:
+            try:
+                for delta in ask_stream(text_for_model, state, slot, use_cache, key=sid):
+                    buf.append(delta)
+                    yield _sse("delta", {"delta": delta})
+            except Busy as e:               # headers are out: report it in-band (no 503 possible)
+                yield _sse("error", {"error": str(e), "busy": True, "retry_after": e.retry_after})
+            except Exception as e:
+                yield _sse("error", {"error": str(e)})
+            reply = "".join(buf).strip()
+            _remember_turn(state, text, now, reply)
+            sessions.put(sid, state)
+            yield _sse("done", {"reply": reply})
+        finally:                            # also on GeneratorExit (client went away)
+            _end_turn(state, text, reply)
+
+    resp = Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    if slot is not None:
+        resp.call_on_close(slot.release)    # client gone before the stream started
+    if isinstance(turn, tuple):
+        resp.call_on_close(lambda: _end_turn(state, turn[0]))
+    return resp
+
+@BP.after_app_request
+def _set_session_cookie(resp):
+    sid = g.get("sid")
+    if sid and request.cookies.get(SESSION_COOKIE) != sid:
+        resp.set_cookie(SESSION_COOKIE, sid, max_age=IDLE_TTL, httponly=True, samesite="Lax")
+    return resp
+
+def create_app(sessions=None):
+    """Flask app with the GUI routes; sessions defaults to a SessionManager on memory/sessions.db."""
+    app = Flask(__name__)
+    app.config["SESSIONS"] = sessions or SessionManager()
+    app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD + 1024 * 1024   # one upload (+ form overhead)
+    app.register_blueprint(BP)
+    leader = _elect()
+    # the other workers read the leader's health snapshot (/api/ping, /api/health/stream)
+    HEALTH.start(BACKGROUND / "health.json", leader)
+    if not leader:
+        print("[gui] background jobs run in another worker")
+        return app
+    summarizer.start()              # rolling summaries of old turns (JENNY_SUMMARIZE=0 to skip)
+    episode_log.start_compactor(MEM)  # dedupe + rotate old episodes (JENNY_COMPACT_INTERVAL=0 to skip)
+    start_ingest()                  # index new/changed Jennyprimefiles (JENNY_KNOWLEDGE_AUTO=0 to skip)
+    RESIDENCY.start()               # pre-load + keep the chat model warm (JENNY_PRELOAD=0 to skip)
+    return app
+
+# one worker per memory/ folder runs the background jobs: whoever holds memory/background.lock
+# (released when that process exits; a restarted worker picks it up)
+BACKGROUND = episode_log.DATA
+_LEADER = None
+
+def _elect():
+    global _LEADER
+    if _LEADER is None:
+        _LEADER = try_lock(BACKGROUND / "background") or False
+    return _LEADER is not False
+
+_APP = None
+
+def get_app():
+    """The process-wide app, created (and its background threads started) on first use."""
+    global _APP
+    if _APP is None:
+        _APP = create_app()
+    return _APP
+
+def __getattr__(name):
+    # APP stays importable for WSGI servers, but importing this module starts nothing:
+    # spawned helper processes (knowledge ingest) re-import it as __mp_main__
+    if name == "APP":
+        return get_app()
+    raise AttributeError(name)
 
 if __name__ == "__main__":
-    APP.run(host="127.0.0.1", port=7860, debug=False)
+    get_app().run(host="127.0.0.1", port=7860, debug=False, threaded=True)
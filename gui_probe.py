@@ -1,5 +1,6 @@
-import os, time, requests
+import os, time
 from flask import Flask, request, jsonify
+from client_ollama import client_for
 
 BASE  = os.getenv('JENNY_BASE',  'http://127.0.0.1:11435')
 MODEL = os.getenv('JENNY_MODEL', 'fast')
@@ -12,7 +13,7 @@ OPTS  = {
 def ask_local(text: str) -> str:
     sys_prompt = "You are Jenny. Be concise and warm."
     try:
-        r = requests.post(f"{BASE}/api/chat", json={
+        r = client_for(BASE).post("/api/chat", json={
             "model": MODEL,
             "messages": [
                 {"role":"system","content":sys_prompt},
@@ -26,7 +27,7 @@ def ask_local(text: str) -> str:
         r.raise_for_status()
         return r.json().get("message",{}).get("content","")
     except Exception:
-        r = requests.post(f"{BASE}/api/generate", json={
+        r = client_for(BASE).post("/api/generate", json={
             "model": MODEL,
             "prompt": f"{sys_prompt}\n\n{text}\n",
             "options": OPTS,
@@ -41,7 +42,7 @@ app = Flask(__name__)
 def ping():
     t=time.time(); err=""
     try:
-        v=requests.get(f"{BASE}/api/version", timeout=2)
+        v=client_for(BASE).version(timeout=2)
         v.raise_for_status()
     except Exception as e:
         err=str(e)
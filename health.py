@@ -0,0 +1,144 @@
+# [F035] health.py v1.1 (2026-10-18)
+__FILE_ID__ = "F035"
+__VERSION__ = "1.1"
+
+# Server-side Ollama health monitor.
+# One background prober per process calls /api/ps every JENNY_HEALTH_INTERVAL seconds
+# (/api/version on servers without it) and caches: liveness, last RTT, rolling RTT
+# percentiles and the models currently loaded. /api/ping answers from snapshot() without
+# touching Ollama; /api/health/stream pushes every new snapshot to open tabs (SSE), so they
+# do not poll at all (wait(seq) blocks until a newer snapshot is published).
+# With several GUI workers only the elected one probes (start(shared, leader=True)) and writes
+# each snapshot to the shared file; the others follow that file instead of hitting Ollama.
+
+# --- imports ---
+import os, json, time, threading
+from collections import deque
+from memory_io import atomic_write_text
+
+INTERVAL  = float(os.getenv("JENNY_HEALTH_INTERVAL", "5"))
+TIMEOUT   = float(os.getenv("JENNY_HEALTH_TIMEOUT", "2"))
+SAMPLES   = 240                 # RTTs kept for the percentiles (~20 min at 5 s)
+
+
+def _pct(sorted_vals, p):
+    if not sorted_vals:
+        return None
+    return round(sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * p))], 1)
+
+
+class HealthMonitor:
+    """Caches Ollama liveness/RTT/loaded models; snapshot() is a dict copy, never a request."""
+
+    def __init__(self, client, model="", interval=INTERVAL, timeout=TIMEOUT):
+        self.client = client
+        self.model = model
+        self.interval = interval
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._rtts = deque(maxlen=SAMPLES)
+        self._seq = 0
+        self._snap = {"ok": None, "rtt_ms": None, "model": model, "models": [], "seq": 0,
+                      "checked": 0, "probes": 0, "failures": 0}
+        self._has_ps = True
+        self._thread = None
+        self._shared = None         # snapshot file the leader writes (see start)
+
+    def start(self, shared=None, leader=True):
+        """
+        Start the prober once per process (JENNY_HEALTH_INTERVAL=0 disables it).
+        shared: snapshot file for multi-worker setups; leader=False follows it instead of probing.
+        """
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._shared = shared if leader else None
+        if leader:
+            self._thread = threading.Thread(target=self._run, name="jenny-health", daemon=True)
+        else:
+            self._thread = threading.Thread(target=self._follow, args=(shared,),
+                                            name="jenny-health-follow", daemon=True)
+        self._thread.start()
+
+    def _follow(self, path):
+        seen = None
+        while True:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    s = json.load(f)
+                if s.get("seq") != seen:
+                    seen = s["seq"]
+                    self._publish(s)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"[health] shared snapshot unreadable: {e}")
+            time.sleep(self.interval)
+
+    def _publish(self, s):
+        with self._cond:
+            self._seq += 1
+            self._snap = dict(s, seq=self._seq)
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            try:
+                self.probe()
+            except Exception as e:
+                print(f"[health] probe failed: {e}")
+            time.sleep(self.interval)
+
+    def probe(self):
+        """One round trip to Ollama; publishes a new snapshot."""
+        t0 = time.perf_counter()
+        ok, models = False, None
+        try:
+            if self._has_ps:
+                r = self.client.get("/api/ps", timeout=self.timeout)
+                if r.status_code == 404:
+                    self._has_ps = False             # older Ollama: liveness only
+            if not self._has_ps:
+                r = self.client.version(timeout=self.timeout)
+            r.raise_for_status()
+            ok = True
+            if self._has_ps:
+                models = [{"name": m.get("name") or m.get("model"), "size": m.get("size"),
+                           "size_vram": m.get("size_vram"), "expires_at": m.get("expires_at")}
+                          for m in (r.json() or {}).get("models") or []]
+        except Exception:
+            ok = False
+        rtt = (time.perf_counter() - t0) * 1000
+        with self._cond:
+            if ok:
+                self._rtts.append(rtt)
+            vals = sorted(self._rtts)
+            s = dict(self._snap)
+            s.update(ok=ok, rtt_ms=int(rtt) if ok else None, checked=time.time(), probes=s["probes"] + 1,
+                     failures=s["failures"] + (0 if ok else 1),
+                     p50_ms=_pct(vals, 0.5), p95_ms=_pct(vals, 0.95), p99_ms=_pct(vals, 0.99))
+            if models is not None:
+                s["models"] = models
+                s["loaded"] = any(m["name"] == self.model for m in models)
+            self._seq += 1
+            s["seq"] = self._seq
+            self._snap = s
+            self._cond.notify_all()
+        if self._shared is not None:
+            try:
+                atomic_write_text(self._shared, json.dumps(s))
+            except OSError as e:
+                print(f"[health] could not share snapshot: {e}")
+        return s
+
+    def snapshot(self):
+        with self._cond:
+            s = dict(self._snap)
+        s["age_ms"] = int((time.time() - s["checked"]) * 1000) if s["checked"] else None
+        return s
+
+    def wait(self, seq, timeout=15.0):
+        """Snapshot newer than seq, or None after timeout (SSE keep-alive)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > seq, timeout):
+                return None
+        return self.snapshot()
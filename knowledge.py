@@ -0,0 +1,492 @@
+# [F032] knowledge.py v1.0 (2026-10-18)
+__FILE_ID__ = "F032"
+__VERSION__ = "1.0"
+
+# Knowledge store over Jennyprimefiles/ (workout days, meal plans, supplement guides, chapters).
+# ingest() walks the folder, extracts text in a process pool (PDF via pypdf when installed,
+# DOCX via zipfile + XML, plain text as is), cuts it into overlapping chunks and indexes them:
+#   memory/knowledge/knowledge.db   SQLite: files, chunks, FTS5 keyword index (bm25)
+#   memory/knowledge/index.json     manifest [{path, size, modified, sha256, chunks}] (like ./index.json)
+#   memory/knowledge/chunks.vec.*   optional embeddings (JENNY_KNOWLEDGE_VECTORS=1, vector_index.py)
+# Incremental: unchanged size+mtime is skipped without reading, unchanged sha256 without
+# extracting; removed files drop their chunks. Results are committed file by file as workers finish.
+# KB.block(query) puts only the best few chunks into the prompt (prompt_builder, volatile part).
+# pack_chunks() does the same for one request's attachments / fetched pages: chunk, rank against
+# the user's request (BM25), keep what fits a token budget, report what was dropped.
+#
+#   python knowledge.py ingest [folder] [--rebuild]
+#   python knowledge.py search "leg day warm up"
+#   python knowledge.py stats
+
+# --- imports ---
+import os, re, sys, json, math, time, hashlib, pathlib, sqlite3, zipfile, threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xml.etree import ElementTree
+from memory_io import file_lock, FILES
+from token_count import count_tokens
+
+try:
+    from pypdf import PdfReader
+except ImportError:          # optional; PDFs are skipped (and retried later) without it
+    PdfReader = None
+
+ROOT = pathlib.Path(__file__).resolve().parent
+SRC_DIR = pathlib.Path(os.getenv("JENNY_KNOWLEDGE_DIR", ROOT / "Jennyprimefiles"))
+KB_DIR = ROOT / "memory" / "knowledge"
+KB_DB = KB_DIR / "knowledge.db"
+MANIFEST = KB_DIR / "index.json"
+
+ENABLED      = os.getenv("JENNY_KNOWLEDGE", "1") == "1"
+AUTO_INGEST  = os.getenv("JENNY_KNOWLEDGE_AUTO", "1") == "1"
+VECTORS      = os.getenv("JENNY_KNOWLEDGE_VECTORS", os.getenv("JENNY_SEMANTIC", "0")) == "1"
+WORKERS      = int(os.getenv("JENNY_INGEST_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+CHUNK_CHARS  = int(os.getenv("JENNY_CHUNK_CHARS", "1200"))
+CHUNK_OVERLAP = int(os.getenv("JENNY_CHUNK_OVERLAP", "200"))
+TOP_K        = int(os.getenv("JENNY_KNOWLEDGE_TOP_K", "3"))
+BLOCK_TOKENS = int(os.getenv("JENNY_KNOWLEDGE_TOKENS", "450"))
+PACK_CHUNK_CHARS = int(os.getenv("JENNY_PACK_CHUNK_CHARS", "600"))   # attachment chunks (pack_chunks)
+MIN_SCORE    = float(os.getenv("JENNY_KNOWLEDGE_MIN_SCORE", "3.0"))   # bm25; weaker keyword hits stay out
+
+TEXT_EXT = {".txt", ".md", ".json", ".jsonl", ".csv"}
+SUPPORTED = TEXT_EXT | {".pdf", ".docx"}
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# --- extraction ---
+def extract_pdf(path):
+    if PdfReader is None:
+        raise RuntimeError("pypdf not installed")
+    pages = []
+    for p in PdfReader(str(path)).pages:
+        try:
+            pages.append(p.extract_text() or "")
+        except Exception:
+            pages.append("")
+    return "\n\n".join(pages)
+
+def extract_docx(path):
+    """Paragraph text of word/document.xml (tables come through cell by cell)."""
+    out, cur = [], []
+    with zipfile.ZipFile(path) as z, z.open("word/document.xml") as f:
+        for ev, el in ElementTree.iterparse(f, events=("end",)):
+            tag = el.tag
+            if tag == _W + "t":
+                cur.append(el.text or "")
+            elif tag == _W + "tab":
+                cur.append("\t")
+            elif tag in (_W + "br", _W + "cr"):
+                cur.append("\n")
+            elif tag == _W + "p":
+                line = "".join(cur).strip()
+                if line:
+                    out.append(line)
+                cur = []
+                el.clear()
+    return "\n".join(out)
+
+def extract_text(path):
+    path = pathlib.Path(path)
+    ext = path.suffix.lower()
+    if ext == ".pdf":
+        return extract_pdf(path)
+    if ext == ".docx":
+        return extract_docx(path)
+    if ext in TEXT_EXT:
+        return path.read_text(encoding="utf-8", errors="replace")
+    raise ValueError(f"unsupported file type {ext}")
+
+# --- chunking ---
+_WS = re.compile(r"[ \t\r\f\v]+")
+
+def _tail(text, n):
+    """Last ~n chars of text, starting on a word boundary."""
+    if n <= 0 or len(text) <= n:
+        return text if n > 0 else ""
+    cut = text[-n:]
+    sp = cut.find(" ")
+    return cut[sp + 1:] if 0 <= sp < n // 2 else cut
+
+def chunk_text(text, size=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """
+    Overlapping chunks of about `size` chars, cut at line, then word boundaries; each chunk
+    after the first starts with the last ~`overlap` chars of the previous one.
+    """
+    lines = [_WS.sub(" ", ln).strip() for ln in (text or "").splitlines()]
+    units = []
+    for ln in lines:
+        if not ln:
+            continue
+        while len(ln) > size:                          # very long line → word-sized pieces
+            cut = ln.rfind(" ", 0, size)
+            cut = cut if cut > size // 2 else size
+            units.append(ln[:cut].strip())
+            ln = ln[cut:].strip()
+        if ln:
+            units.append(ln)
+    chunks, cur = [], ""
+    for u in units:
+        if cur and len(cur) + 1 + len(u) > size:
+            chunks.append(cur)
+            cur = _tail(cur, overlap)
+        cur = f"{cur}\n{u}" if cur else u
+    if cur and (not chunks or cur != _tail(chunks[-1], overlap)):
+        chunks.append(cur)
+    return chunks
+
+def _work(path, size, overlap):
+    """Process-pool job: (path, chunks, error)."""
+    try:
+        return path, chunk_text(extract_text(path), size, overlap), None
+    except Exception as e:
+        return path, [], f"{type(e).__name__}: {e}"
+
+def _retry(error):
+    # a PDF that failed only for want of pypdf is read again once pypdf is installed
+    return bool(error) and "pypdf not installed" in error and PdfReader is not None
+
+def sha256_file(path, block=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for b in iter(lambda: f.read(block), b""):
+            h.update(b)
+    return h.hexdigest()
+
+# --- query helpers ---
+_STOP = frozenset("a an and are as at be but by can do for from have how i in is it me my of on or "
+                  "so that the this to was what when where which who why will with you your "
+                  "hey hello thanks thank yes okay love jenny magdy prime".split())
+
+def query_terms(query, limit=16):
+    seen, out = set(), []
+    for t in re.findall(r"\w+", (query or "").lower()):
+        if (len(t) > 2 or t.isdigit()) and t not in _STOP and t not in seen:
+            seen.add(t); out.append(t)
+    return out[:limit]
+
+# --- in-request packing (attachments / fetched pages), no index needed ---
+def _stem(t):
+    return t[:-1] if len(t) > 3 and t.endswith("s") else t
+
+def rank_chunks(chunks, query, k1=1.2, b=0.75):
+    """BM25 score of each chunk against the query terms (0.0 = no term in common)."""
+    terms = [_stem(t) for t in query_terms(query)]
+    docs = [[_stem(t) for t in re.findall(r"\w+", c.lower())] for c in chunks]
+    if not terms or not docs:
+        return [0.0] * len(chunks)
+    avg = (sum(map(len, docs)) / len(docs)) or 1.0
+    sets = [set(d) for d in docs]
+    df = {t: sum(1 for d in sets if t in d) for t in terms}
+    scores = []
+    for d in docs:
+        tf, s = {}, 0.0
+        for t in d:
+            tf[t] = tf.get(t, 0) + 1
+        for t in terms:
+            f = tf.get(t, 0)
+            if f:
+                idf = math.log(1 + (len(docs) - df[t] + 0.5) / (df[t] + 0.5))
+                s += idf * f * (k1 + 1) / (f + k1 * (1 - b + b * len(d) / avg))
+        scores.append(s)
+    return scores
+
+def pack_chunks(sources, query, budget, size=PACK_CHUNK_CHARS):
+    """
+    Fit [(label, text), ...] into `budget` tokens: chunk every source, keep the chunks that
+    score best against query (ties: earlier chunks first), emit them in document order.
+    Returns (text, report); report says how much of each source was kept and dropped.
+    """
+    pieces = []                                       # (source, seq, text, tokens)
+    for si, (label, text) in enumerate(sources):
+        for j, c in enumerate(chunk_text(text, size, 0)):
+            pieces.append((si, j, c, count_tokens(c)))
+    scores = rank_chunks([p[2] for p in pieces], query)
+    heads = [count_tokens(f"### {label}\n") + 8 for label, _ in sources]
+    kept, used, opened = set(), 0, set()
+    for i in sorted(range(len(pieces)), key=lambda i: (-scores[i], pieces[i][1], pieces[i][0])):
+        si, _, _, t = pieces[i]
+        cost = t + (0 if si in opened else heads[si])
+        if used + cost <= budget:
+            kept.add(i); used += cost; opened.add(si)
+
+    parts, rep = [], []
+    for si, (label, _) in enumerate(sources):
+        mine = [i for i, p in enumerate(pieces) if p[0] == si]
+        keep = [i for i in mine if i in kept]
+        rep.append({"label": label, "chunks": len(mine), "kept": len(keep),
+                    "tokens": sum(pieces[i][3] for i in mine), "kept_tokens": sum(pieces[i][3] for i in keep)})
+        if not keep:
+            continue
+        head = f"### {label}" + ("" if len(keep) == len(mine) else
+                                 f" (parts {', '.join(str(pieces[i][1] + 1) for i in keep)} of {len(mine)})")
+        body, prev = [], None
+        for i in keep:
+            if prev is not None and pieces[i][1] != pieces[prev][1] + 1:
+                body.append("[…]")
+            body.append(pieces[i][2]); prev = i
+        parts.append(head + "\n" + "\n".join(body))
+    total = sum(p[3] for p in pieces)
+    report = {"budget": budget, "used": used, "chunks": len(pieces), "kept": len(kept),
+              "tokens": total, "dropped_tokens": total - sum(pieces[i][3] for i in kept), "sources": rep}
+    return "\n\n".join(parts), report
+
+
+class KnowledgeStore:
+    """ingest(folder) keeps the index in step with the folder; search(query) -> best chunks."""
+
+    def __init__(self, path=KB_DB, manifest=MANIFEST, src=SRC_DIR):
+        self.path = str(path)
+        self.manifest = pathlib.Path(manifest)
+        self.src = pathlib.Path(src)
+        self._local = threading.local()
+        self._vs = None
+        self._stats = {"searches": 0, "ingests": 0}
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA busy_timeout=5000")
+            with db:
+                db.execute("CREATE TABLE IF NOT EXISTS files(path TEXT PRIMARY KEY, sha256 TEXT, "
+                           "size INTEGER, mtime REAL, chunks INTEGER, error TEXT)")
+                db.execute("CREATE TABLE IF NOT EXISTS chunks(id INTEGER PRIMARY KEY, path TEXT, "
+                           "seq INTEGER, text TEXT, vec INTEGER)")
+                db.execute("CREATE INDEX IF NOT EXISTS chunks_path ON chunks(path)")
+                db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(text, tokenize='porter unicode61')")
+            self._local.db = db
+        return db
+
+    @property
+    def vectors(self):
+        if self._vs is None and VECTORS:
+            from vector_index import VectorStore
+            self._vs = VectorStore(KB_DIR / "chunks.vec.f32", KB_DIR / "chunks.vec.json")
+        return self._vs
+
+    def version(self):
+        """Changes whenever an ingest changed the index (manifest rewrite)."""
+        try:
+            st = self.manifest.stat()
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return (0, 0)
+
+    # --- ingest ---
+    def _candidates(self, folder):
+        for p in sorted(folder.rglob("*")):
+            if p.is_file() and p.suffix.lower() in SUPPORTED and not p.name.startswith(("~$", ".")):
+                yield p
+
+    def ingest(self, folder=None, workers=WORKERS, rebuild=False):
+        """Bring the index in line with folder; returns counts. Safe to run from several processes."""
+        folder = pathlib.Path(folder or self.src)
+        t0 = time.time()
+        st = {"scanned": 0, "unchanged": 0, "indexed": 0, "chunks": 0, "removed": 0, "failed": 0}
+        KB_DIR.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.path):
+            db = self._db()
+            if rebuild:
+                with db:
+                    db.execute("DELETE FROM files"); db.execute("DELETE FROM chunks"); db.execute("DELETE FROM chunks_fts")
+            known = {r[0]: r[1:] for r in db.execute("SELECT path, sha256, size, mtime, error FROM files")}
+            todo, seen = {}, set()
+            for p in self._candidates(folder):
+                rel = p.relative_to(folder).as_posix()
+                seen.add(rel)
+                st["scanned"] += 1
+                s = p.stat()
+                old = known.get(rel)
+                if old and old[1] == s.st_size and old[2] == s.st_mtime and not _retry(old[3]):
+                    st["unchanged"] += 1
+                    continue
+                sha = sha256_file(p)
+                if old and old[0] == sha and not old[3]:
+                    with db:
+                        db.execute("UPDATE files SET size=?, mtime=? WHERE path=?", (s.st_size, s.st_mtime, rel))
+                    st["unchanged"] += 1
+                    continue
+                todo[str(p)] = (rel, sha, s.st_size, s.st_mtime)
+            for rel in set(known) - seen:
+                with db:
+                    self._drop(db, rel)
+                st["removed"] += 1
+
+            for path, chunks, err in self._extract(todo, workers):
+                rel, sha, size, mtime = todo[path]
+                with db:
+                    self._drop(db, rel)
+                    db.execute("INSERT INTO files(path, sha256, size, mtime, chunks, error) VALUES(?,?,?,?,?,?)",
+                               (rel, sha, size, mtime, len(chunks), err))
+                    for i, c in enumerate(chunks):
+                        cid = db.execute("INSERT INTO chunks(path, seq, text) VALUES(?,?,?)", (rel, i, c)).lastrowid
+                        db.execute("INSERT INTO chunks_fts(rowid, text) VALUES(?,?)", (cid, c))
+                if err:
+                    st["failed"] += 1
+                    if "pypdf not installed" not in err:
+                        print(f"[knowledge] {rel}: {err}")
+                else:
+                    st["indexed"] += 1
+                    st["chunks"] += len(chunks)
+            if PdfReader is None and any(p.lower().endswith(".pdf") for p in todo):
+                print("[knowledge] PDFs skipped: pip install pypdf to index them")
+            if VECTORS:
+                st["embedded"] = self.embed_missing()
+            if todo or st["removed"] or rebuild or not self.manifest.exists():
+                self._write_manifest(db)
+        st["ms"] = round((time.time() - t0) * 1000, 1)
+        self._stats["ingests"] += 1
+        return st
+
+    def _extract(self, todo, workers):
+        """(path, chunks, error) in completion order; a process pool when there is real work."""
+        if not todo:
+            return
+        if workers <= 1 or len(todo) == 1:
+            for path in todo:
+                yield _work(path, CHUNK_CHARS, CHUNK_OVERLAP)
+            return
+        # spawn: the GUI process has threads, forking it is not safe
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo)), mp_context=ctx) as pool:
+            futs = [pool.submit(_work, path, CHUNK_CHARS, CHUNK_OVERLAP) for path in todo]
+            for fut in as_completed(futs):
+                yield fut.result()
+
+    def _drop(self, db, rel):
+        db.execute("DELETE FROM chunks_fts WHERE rowid IN (SELECT id FROM chunks WHERE path=?)", (rel,))
+        db.execute("DELETE FROM chunks WHERE path=?", (rel,))
+        db.execute("DELETE FROM files WHERE path=?", (rel,))
+
+    def _write_manifest(self, db):
+        rows = db.execute("SELECT path, size, mtime, sha256, chunks, error FROM files ORDER BY path").fetchall()
+        items = []
+        for path, size, mtime, sha, n, err in rows:
+            it = {"path": f"./{path}", "size": size,
+                  "modified": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(mtime)), "sha256": sha, "chunks": n}
+            if err:
+                it["error"] = err
+            items.append(it)
+        FILES.write_json(self.manifest, items, indent=1)
+
+    # --- embeddings (optional) ---
+    def embed_missing(self, batch=32):
+        """Embed chunks without a vector row; resets the rows when the model changed or most are stale."""
+        from vector_index import embed_texts, EMBED_MODEL
+        vs, db = self.vectors, self._db()
+        live = db.execute("SELECT COUNT(*) FROM chunks WHERE vec IS NOT NULL").fetchone()[0]
+        if vs.meta["model"] != EMBED_MODEL or vs.count > 2 * max(live, 16) or live > vs.count:
+            vs.reset(EMBED_MODEL, "knowledge")
+            with db:
+                db.execute("UPDATE chunks SET vec=NULL")
+        done = 0
+        while True:
+            rows = db.execute("SELECT id, text FROM chunks WHERE vec IS NULL ORDER BY id LIMIT ?", (batch,)).fetchall()
+            if not rows:
+                return done
+            first = vs.count
+            vs.append(embed_texts([t[:4000] for _, t in rows]))
+            with db:
+                db.executemany("UPDATE chunks SET vec=? WHERE id=?", [(first + i, cid) for i, (cid, _) in enumerate(rows)])
+            done += len(rows)
+
+    # --- retrieval ---
+    def search(self, query, k=TOP_K):
+        """Best chunks for query: [{"path", "seq", "text", "score"}], bm25 (+ vectors via RRF)."""
+        if not ENABLED or not os.path.exists(self.path):
+            return []
+        terms = query_terms(query)
+        if not terms:
+            return []
+        self._stats["searches"] += 1
+        db = self._db()
+        match = " OR ".join(f'"{t}"' for t in terms)
+        try:
+            hits = db.execute("SELECT rowid, bm25(chunks_fts) FROM chunks_fts WHERE chunks_fts MATCH ? "
+                              "ORDER BY bm25(chunks_fts) LIMIT ?", (match, k * 4)).fetchall()
+        except sqlite3.Error as e:
+            print(f"[knowledge] search failed: {e}")
+            return []
+        hits = [r for r in hits if -r[1] >= MIN_SCORE]
+        ids = [r[0] for r in hits]
+        score = {r[0]: -r[1] for r in hits}
+        if VECTORS and self.vectors.count:
+            try:
+                from vector_index import embed_texts, blend
+                rows = [r for _, r in self.vectors.search(embed_texts([query]), k * 4)[0]]
+                by_row = dict(db.execute(f"SELECT vec, id FROM chunks WHERE vec IN ({','.join('?' * len(rows))})",
+                                         rows).fetchall()) if rows else {}
+                ids = blend(ids, [by_row[r] for r in rows if r in by_row], k * 4)
+            except Exception as e:
+                print(f"[knowledge] vector search skipped: {e}")
+        if not ids:
+            return []
+        got = {r[0]: r[1:] for r in db.execute(
+            f"SELECT id, path, seq, text FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids)}
+        out = []
+        for cid in ids:
+            if cid in got:
+                path, seq, text = got[cid]
+                out.append({"path": path, "seq": seq, "text": text, "score": round(score.get(cid, 0.0), 3)})
+            if len(out) >= k:
+                break
+        return out
+
+    def block(self, query, k=TOP_K, max_tokens=BLOCK_TOKENS):
+        """'### KNOWLEDGE' prompt block with the top chunks under a token cap ('' when nothing hits)."""
+        out, used = [], 0
+        for h in self.search(query, k):
+            part = f"[{h['path']} #{h['seq'] + 1}]\n{h['text']}"
+            t = count_tokens(part)
+            if used + t > max_tokens:
+                if out:
+                    break
+                part = part[:max_tokens * 4]
+                t = max_tokens
+            out.append(part); used += t
+        return ("### KNOWLEDGE\n" + "\n\n".join(out) + "\n") if out else ""
+
+    def stats(self):
+        if not os.path.exists(self.path):
+            return {**self._stats, "files": 0, "chunks": 0}
+        db = self._db()
+        files, failed = db.execute("SELECT COUNT(*), COUNT(error) FROM files").fetchone()
+        chunks = db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        s = {**self._stats, "files": files, "failed": failed, "chunks": chunks, "pypdf": PdfReader is not None}
+        if VECTORS:
+            s["vectors"] = self.vectors.stats()
+        return s
+
+
+KB = KnowledgeStore()
+
+_thread = None
+
+def start_ingest():
+    """Incremental ingest in a background thread, once per process (JENNY_KNOWLEDGE_AUTO=0 skips)."""
+    global _thread
+    if not (ENABLED and AUTO_INGEST) or _thread is not None or not SRC_DIR.is_dir():
+        return
+    def run():
+        try:
+            st = KB.ingest()
+            if st["indexed"] or st["removed"] or st["failed"]:
+                print(f"[knowledge] ingest {st}")
+        except Exception as e:
+            print(f"[knowledge] ingest failed: {e}")
+    _thread = threading.Thread(target=run, name="jenny-ingest", daemon=True)
+    _thread.start()
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    args = [a for a in sys.argv[2:] if not a.startswith("--")]
+    if cmd == "ingest":
+        print(KB.ingest(args[0] if args else None, rebuild="--rebuild" in sys.argv))
+    elif cmd == "search":
+        for h in KB.search(" ".join(args), k=5):
+            print(f"{h['score']:7.3f}  {h['path']} #{h['seq'] + 1}: {h['text'][:160]!r}")
+    else:
+        print(json.dumps(KB.stats(), indent=1))
@@ -0,0 +1,319 @@
+# [F022] memory_io.py v1.2 (2026-10-18)
+__FILE_ID__ = "F022"
+__VERSION__ = "1.2"
+
+# Small file helpers for the memory layer (no full-file reads or sync writes on the hot path).
+
+# --- imports ---
+import os, mmap, json, copy, time, atexit, threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:          # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+TAIL_CHUNK = 8192
+
+@contextmanager
+def file_lock(path):
+    """
+    Exclusive advisory lock on `path`.lock shared by every process (and thread) touching path:
+    episode appends take it for each write, compaction for its read + rewrite.
+    """
+    f = open(f"{path}.lock", "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        yield
+    finally:
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            f.close()
+
+def try_lock(path):
+    """
+    Non-blocking exclusive lock on `path`.lock: the open lock file (keep it; the lock lasts
+    until it is closed or the process exits), or None while another process holds it.
+    Elects the one GUI worker that runs the background jobs.
+    """
+    f = open(f"{path}.lock", "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif msvcrt is not None:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+def tail_lines(path, n):
+    """
+    Last n non-empty lines of path (oldest first) as bytes.
+    Walks back from EOF: mmap when the platform allows it, reverse chunked seeks otherwise.
+    Cost is O(bytes in those n lines), not O(file size).
+    """
+    if n <= 0:
+        return []
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return []
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return _tail_mmap(mm, size, n)
+            except (ValueError, OSError):
+                return _tail_seek(f, size, n)
+    except FileNotFoundError:
+        return []
+
+def _tail_mmap(mm, size, n):
+    out, end = [], size
+    while end > 0 and len(out) < n:
+        start = mm.rfind(b"\n", 0, end - 1) + 1 if end > 1 else 0
+        line = mm[start:end].strip()
+        if line:
+            out.append(line)
+        end = start
+    out.reverse()
+    return out
+
+def _tail_seek(f, size, n):
+    out, pos, rest = [], size, b""
+    while pos > 0 and len(out) < n:
+        step = min(TAIL_CHUNK, pos)
+        pos -= step
+        f.seek(pos)
+        buf = f.read(step) + rest
+        parts = buf.split(b"\n")
+        rest = parts[0]                      # may continue in the previous chunk
+        for line in reversed(parts[1:]):
+            if line.strip():
+                out.append(line.strip())
+                if len(out) >= n:
+                    break
+    if pos == 0 and len(out) < n and rest.strip():
+        out.append(rest.strip())
+    out.reverse()
+    return out[-n:]
+
+
+class EpisodeWriter:
+    """
+    Write-behind appender for episodes.jsonl (group commit).
+    append() only queues; a background thread joins everything queued during
+    `interval` seconds into ONE write (+ optional fsync) and flushes at exit.
+    Readers take `lock` to see a consistent (file, pending) pair.
+    Single-process by design — multi-worker setups use the SQLite backend.
+    A failing disk is retried with exponential backoff (up to MAX_BACKOFF seconds) and
+    logged on the 1st, 2nd, 4th, 8th ... consecutive failure.
+    """
+    MAX_BACKOFF = 30.0
+
+    def __init__(self, path, interval=0.25, fsync=False, max_pending=1024, block_timeout=10.0):
+        self.path = path
+        self.interval = interval
+        self.fsync = fsync
+        self.max_pending = max_pending
+        self.block_timeout = block_timeout
+        self.lock = threading.Condition()
+        self._pending = []            # [(line bytes, rec)]
+        self._pending_bytes = 0
+        self._closed = False
+        self._last_error = None
+        self._failures = 0            # consecutive failed flushes
+        self.stats = {"batches": 0, "records": 0, "bytes": 0, "fsyncs": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._run, name="episode-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, line, rec, on_queued=None):
+        """
+        Queue one record. A full queue blocks the caller (backpressure) until the flusher
+        drains it; if it stays full for block_timeout (disk writes failing) OSError is raised.
+        on_queued(start) runs under `lock` once the record is queued, with the logical offset
+        it was queued at. Never call append() holding a lock the flusher may need.
+        """
+        with self.lock:
+            deadline = time.monotonic() + self.block_timeout
+            while len(self._pending) >= self.max_pending and not self._closed:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise OSError(f"episode queue full ({len(self._pending)} pending): {self._last_error}")
+                self.lock.wait(min(0.5, left))   # bounded queue → backpressure, never unbounded RAM
+            start = self.size()
+            self._pending.append((line, rec))
+            self._pending_bytes += len(line)
+            if on_queued is not None:
+                on_queued(start)
+            self.lock.notify_all()
+        if self._closed:
+            self.flush()
+        return start
+
+    def size(self):
+        """Logical size: bytes on disk + bytes still queued (call with lock held for consistency)."""
+        try:
+            disk = os.stat(self.path).st_size
+        except FileNotFoundError:
+            disk = 0
+        return disk + self._pending_bytes
+
+    def pending_records(self):
+        return [rec for _, rec in self._pending]
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self._pending and not self._closed:
+                    self.lock.wait()
+                if self._closed:
+                    return
+            # group-commit window; doubled per consecutive failure
+            time.sleep(min(self.MAX_BACKOFF, self.interval * 2 ** min(self._failures, 16)))
+            self.flush()
+
+    def flush(self):
+        fd = None
+        with self.lock:
+            if not self._pending:
+                return
+            batch, data = self._pending, b"".join(line for line, _ in self._pending)
+            try:
+                with file_lock(self.path), open(self.path, "ab") as f:
+                    f.write(data)
+                    if self.fsync:
+                        f.flush()
+                        fd = os.dup(f.fileno())
+            except Exception as e:
+                self.stats["errors"] += 1
+                self._failures += 1
+                self._last_error = e
+                if self._failures & (self._failures - 1) == 0:
+                    print(f"[memory] episode write FAIL x{self._failures} (kept {len(batch)} queued, "
+                          f"retrying with backoff): {e}")
+                return
+            if self._failures:
+                print(f"[memory] episode writes recovered after {self._failures} failure(s)")
+            self._pending, self._pending_bytes = [], 0
+            self._last_error = None
+            self._failures = 0
+            self.stats["batches"] += 1
+            self.stats["records"] += len(batch)
+            self.stats["bytes"] += len(data)
+            self.lock.notify_all()
+        if fd is not None:                 # fsync outside the lock; page cache already has it
+            try:
+                os.fsync(fd)
+                self.stats["fsyncs"] += 1
+            finally:
+                os.close(fd)
+
+    def close(self):
+        with self.lock:
+            self._closed = True
+            self.lock.notify_all()
+        self._thread.join(timeout=2)
+        self.flush()
+
+
+def atomic_write_text(path, text, encoding="utf-8"):
+    """Write to a temp file in the same folder, fsync, then rename over path."""
+    path = str(path)
+    tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, "w", encoding=encoding) as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class FileCache:
+    """
+    Shared read cache for small text files (profile, system prompt, Modelfiles).
+    An entry is reused while (st_mtime_ns, st_size) is unchanged, so edits made
+    by hand or by another process are picked up on the next read.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}       # (path, parser) -> (mtime_ns, size, value)
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, path, parse=None, encoding="utf-8"):
+        """Contents of path (run through parse once per file version). Raises like open()."""
+        path = str(path)
+        st = os.stat(path)
+        key = (path, parse)
+        with self._lock:
+            ent = self._entries.get(key)
+            if ent and ent[0] == st.st_mtime_ns and ent[1] == st.st_size:
+                self.stats["hits"] += 1
+                return ent[2]
+        with open(path, "r", encoding=encoding) as f:
+            text = f.read()
+        value = parse(text) if parse else text
+        with self._lock:
+            self.stats["misses"] += 1
+            self._entries[key] = (st.st_mtime_ns, st.st_size, value)
+        return value
+
+    def read_text(self, path, default=None):
+        try:
+            return self.get(path)
+        except (FileNotFoundError, UnicodeDecodeError):
+            if default is None:
+                raise
+            return default
+
+    def read_json(self, path, default=None):
+        """Parsed JSON (a private copy — callers may mutate it)."""
+        try:
+            return copy.deepcopy(self.get(path, parse=_json_or_empty))
+        except FileNotFoundError:
+            if default is None:
+                raise
+            return copy.deepcopy(default)
+
+    def write_text(self, path, text):
+        """Atomic write, then refresh the cached text in place (parsed views re-parse lazily)."""
+        atomic_write_text(path, text)
+        st = os.stat(str(path))
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == str(path)]:
+                del self._entries[key]
+            self._entries[(str(path), None)] = (st.st_mtime_ns, st.st_size, text)
+
+    def write_json(self, path, obj, **dump_kw):
+        text = json.dumps(obj, **dump_kw)
+        self.write_text(path, text)
+        st = os.stat(str(path))
+        with self._lock:
+            self._entries[(str(path), _json_or_empty)] = (st.st_mtime_ns, st.st_size, copy.deepcopy(obj))
+
+
+def _json_or_empty(text):
+    return json.loads(text or "{}")
+
+
+# process-wide cache instance
+FILES = FileCache()
@@ -1,19 +1,33 @@
-import json, pathlib
+import pathlib, re
+from memory_io import FILES
 BASE = pathlib.Path(__file__).resolve().parent
 SYSTEM_PROMPT_TXT = BASE / "system_prompt.txt"
 PROFILE_JSON      = BASE / "memory" / "profile.json"
+MODELS_DIR        = BASE / "models"
 
 def load_bootstrap_prompt():
+    # all reads go through the shared stat-validated cache (no re-read per turn)
     try:
-        core = SYSTEM_PROMPT_TXT.read_text(encoding="utf-8").strip()
+        core = FILES.read_text(SYSTEM_PROMPT_TXT).strip()
     except Exception:
         core = "You are Jenny Prime. Stay aligned, concise, kind."
     facts = []
     try:
-        p = json.loads(PROFILE_JSON.read_text(encoding="utf-8"))
+        p = FILES.read_json(PROFILE_JSON)
         for k, v in p.items():
             facts.append(f"- {k}: {v}")
     except Exception:
         pass
     facts_block = "Persistent facts:\n" + ("\n".join(facts) if facts else "- (no facts yet)")
     return core + "\n\n" + facts_block
+
+def _modelfile_system(text):
+    m = re.search(r'(?im)^system\s+"""(.*?)"""', text, flags=re.S)
+    return m.group(1).strip() if m else ""
+
+def load_modelfile_system(name="Modelfile"):
+    """SYSTEM block baked into models/<name> (cached until the Modelfile changes)."""
+    try:
+        return FILES.get(MODELS_DIR / name, parse=_modelfile_system)
+    except Exception:
+        return ""
@@ -0,0 +1,236 @@
+# [F021] memory_sqlite.py v1.0 (2026-10-18)
+__FILE_ID__ = "F021"
+__VERSION__ = "1.0"
+
+# SQLite backend for MemoryStore: WAL journal + FTS5 full-text table.
+# Same API as the JSONL store (add_episode / retrieve / recent_block / profile),
+# but several GUI workers can share memory/memory.db safely.
+#
+#   JENNY_MEMORY_BACKEND=sqlite python3 gui_app.safe.py
+#   python3 memory_sqlite.py migrate        # one-shot import of episodes.jsonl + profile.json
+
+# --- imports ---
+import sys, json, sqlite3, threading
+from memory_store import MemoryStore, DATA, PROFILE_JSON, EPISODES_JSONL, _now
+from episode_index import query_terms
+import episode_log
+from memory_io import file_lock
+
+DB_PATH = DATA / "memory.db"
+MIGRATE_TIMEOUT = 300          # seconds a worker waits while another one imports
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes(
+    id INTEGER PRIMARY KEY,
+    ts INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    tags TEXT NOT NULL DEFAULT '[]',
+    importance INTEGER NOT NULL DEFAULT 3
+);
+CREATE TABLE IF NOT EXISTS episode_tags(
+    episode_id INTEGER NOT NULL REFERENCES episodes(id),
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS episode_tags_tag ON episode_tags(tag, episode_id);
+CREATE INDEX IF NOT EXISTS episodes_importance ON episodes(importance DESC, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS episodes_fts USING fts5(
+    text, content='episodes', content_rowid='id', tokenize='unicode61'
+);
+CREATE TABLE IF NOT EXISTS profile(key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+class SQLiteMemoryStore(MemoryStore):
+    """MemoryStore with episodes/profile in SQLite (one connection per thread)."""
+
+    def __init__(self, db_path=DB_PATH, **kw):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        with self._db() as db:
+            db.executescript(SCHEMA)
+            seeded = db.execute("SELECT 1 FROM meta WHERE key='migrated'").fetchone()
+        if not seeded:
+            migrate(self.db_path)
+        super().__init__(**kw)
+
+    def _open_files(self):
+        pass                            # no episodes.jsonl index / vector rows for this backend
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA busy_timeout=5000")
+            self._local.db = db
+        return db
+
+    def data_version(self, kind):
+        # data_version moves when another connection commits; _versions covers our own writes
+        if kind in ("episodes", "profile"):
+            dv = self._db().execute("PRAGMA data_version").fetchone()[0]
+            return (self._versions[kind], dv)
+        return super().data_version(kind)
+
+    # --- profile ---
+    def get_profile(self):
+        rows = self._db().execute("SELECT key, value FROM profile").fetchall()
+        return {r["key"]: json.loads(r["value"]) for r in rows}
+
+    def set_profile(self, **fields):
+        with self._db() as db:
+            db.executemany(
+                "INSERT INTO profile(key, value) VALUES(?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                [(k, json.dumps(v, ensure_ascii=False)) for k, v in fields.items()],
+            )
+        self._versions["profile"] += 1
+
+    # --- episodes ---
+    def add_episode(self, text, tags=None, importance=3):
+        rec = {"ts": _now(), "text": (text or "").strip(), "tags": tags or [], "importance": int(importance)}
+        with self._db() as db:
+            _insert(db, rec)
+        self._versions["episodes"] += 1
+
+    def _top_records(self, query, k, require_tags=None, scoring="count"):
+        # FTS5 prefix match per term, ranked by bm25 with the same importance prior
+        terms = query_terms(query)
+        tag_sql, tag_args = "", []
+        if require_tags:
+            tag_sql = " AND e.id IN (SELECT episode_id FROM episode_tags WHERE tag IN (%s))" % \
+                      ",".join("?" * len(require_tags))
+            tag_args = list(require_tags)
+        db = self._db()
+        rows = []
+        if terms:
+            match = " OR ".join('"%s"*' % t.replace('"', '') for t in terms)
+            rows = db.execute(
+                "SELECT e.id, e.ts, e.text, e.tags, e.importance FROM episodes_fts f "
+                "JOIN episodes e ON e.id = f.rowid WHERE episodes_fts MATCH ?" + tag_sql +
+                " ORDER BY bm25(episodes_fts) - 0.15*e.importance, e.id LIMIT ?",
+                [match] + tag_args + [k],
+            ).fetchall()
+        if len(rows) < k:
+            # zero-match episodes still rank by importance, like the JSONL store
+            seen = [r["id"] for r in rows]
+            not_seen = (" AND e.id NOT IN (%s)" % ",".join("?" * len(seen))) if seen else ""
+            rows += db.execute(
+                "SELECT e.id, e.ts, e.text, e.tags, e.importance FROM episodes e "
+                "WHERE e.importance > 0" + tag_sql + not_seen +
+                " ORDER BY e.importance DESC, e.id LIMIT ?",
+                tag_args + seen + [k - len(rows)],
+            ).fetchall()
+        return [_rec(r) for r in rows]
+
+    def _recent_records(self, n):
+        rows = self._db().execute(
+            "SELECT id, ts, text, tags, importance FROM episodes ORDER BY id DESC LIMIT ?", (n,)
+        ).fetchall()
+        return [_rec(r) for r in rows]
+
+    def turns_since(self, ts, limit, keep_recent=0):
+        db = self._db()
+        cap = 1 << 62
+        if keep_recent > 0:                     # id of the oldest turn we must not touch
+            row = db.execute("SELECT episode_id FROM episode_tags WHERE tag = 'turn' "
+                             "ORDER BY episode_id DESC LIMIT 1 OFFSET ?", (keep_recent - 1,)).fetchone()
+            if row is None:
+                return []
+            cap = row[0]
+        rows = db.execute(
+            "SELECT e.id, e.ts, e.text, e.tags, e.importance FROM episode_tags t "
+            "JOIN episodes e ON e.id = t.episode_id WHERE t.tag = 'turn' AND e.ts > ? AND e.id < ? "
+            "ORDER BY e.id LIMIT ?", (ts, cap, limit),
+        ).fetchall()
+        return [(r["id"], _rec(r)) for r in rows]
+
+    def episodes_between(self, ts_from=None, ts_to=None):
+        rows = self._db().execute(
+            "SELECT id, ts, text, tags, importance FROM episodes WHERE ts >= ? AND ts <= ? ORDER BY id",
+            (ts_from if ts_from is not None else -(1 << 62), ts_to if ts_to is not None else 1 << 62),
+        ).fetchall()
+        return [_rec(r) for r in rows]
+
+    def compact(self, force=False):
+        return {"moved": 0, "note": "SQLite backend: nothing to rotate"}
+
+    def episodes_by_tag(self, tag, limit=50):
+        """Newest episodes carrying tag."""
+        rows = self._db().execute(
+            "SELECT e.id, e.ts, e.text, e.tags, e.importance FROM episode_tags t "
+            "JOIN episodes e ON e.id = t.episode_id WHERE t.tag = ? ORDER BY e.id DESC LIMIT ?",
+            (tag, limit),
+        ).fetchall()
+        return [_rec(r) for r in rows]
+
+
+def _rec(row):
+    return {"ts": row["ts"], "text": row["text"], "tags": json.loads(row["tags"]),
+            "importance": row["importance"]}
+
+def _insert(db, rec):
+    cur = db.execute(
+        "INSERT INTO episodes(ts, text, tags, importance) VALUES(?, ?, ?, ?)",
+        (int(rec.get("ts") or _now()), rec.get("text") or "",
+         json.dumps(rec.get("tags") or [], ensure_ascii=False), int(rec.get("importance", 3))),
+    )
+    eid = cur.lastrowid
+    db.execute("INSERT INTO episodes_fts(rowid, text) VALUES(?, ?)", (eid, rec.get("text") or ""))
+    db.executemany("INSERT INTO episode_tags(episode_id, tag) VALUES(?, ?)",
+                   [(eid, t) for t in rec.get("tags") or []])
+    return eid
+
+
+def migrate(db_path=DB_PATH, episodes=EPISODES_JSONL, profile=PROFILE_JSON):
+    """
+    One-shot import of all episodes (segments + episodes.jsonl) and profile.json (skipped once
+    meta.migrated is set). Check and import share one write transaction, so of several workers
+    starting together exactly one imports; the others wait on the lock and then skip.
+    """
+    db = sqlite3.connect(str(db_path), timeout=MIGRATE_TIMEOUT, isolation_level=None)
+    try:
+        db.executescript(SCHEMA)
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if db.execute("SELECT 1 FROM meta WHERE key='migrated'").fetchone():
+                db.execute("ROLLBACK")
+                return 0
+            try:
+                prof = json.loads(profile.read_text(encoding="utf-8") or "{}")
+            except FileNotFoundError:
+                prof = {}
+            db.executemany("INSERT OR REPLACE INTO profile(key, value) VALUES(?, ?)",
+                           [(k, json.dumps(v, ensure_ascii=False)) for k, v in prof.items()])
+            # compacted segments + the live file (the episodes lock keeps compaction out meanwhile)
+            with file_lock(episodes):
+                recs = episode_log.records_between(None, None, episodes)
+            n = 0
+            for rec in recs:
+                try:
+                    _insert(db, rec)
+                    n += 1
+                except Exception:
+                    continue
+            db.execute("INSERT INTO meta(key, value) VALUES('migrated', ?)",
+                       (json.dumps({"ts": _now(), "episodes": n}),))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        print(f"[memory] migrated {n} episodes + profile into {db_path}")
+        return n
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        migrate()
+    else:
+        store = SQLiteMemoryStore()
+        print("SQLite MEM ready. Identity:", store.get_profile().get("identity", "")[:80])
+        print(store.recent_block(n=3))
@@ -1,5 +1,6 @@
 # prompt_builder.py
 from memory_store import MEM
+from knowledge import KB
 
 # Small, reusable style block (kept lean for speed)
 STYLE = (
@@ -8,35 +9,52 @@ STYLE = (
     "- Accuracy first. Never lose warmth.\n"
 )
 
+def _facts_block():
+    # Tiny, always-on truths (if your memory_store has facts_block)
+    return getattr(MEM, "facts_block", lambda: "")()
+
 def build_system_prompt(
     focus="Reinforce identity + bond; memory is sacred.",
     related_query=None,          # pass the current user message here
     recent_n=5,                  # how many recent turns to include (small = fast)
     include_related=True,        # toggle related recall if needed
 ):
-    parts = []
+    # same blocks, same order as the split layout — just one message
+    stable, volatile = build_prompt_parts(focus, related_query, recent_n, include_related)
+    return "\n\n".join(p for p in (stable, volatile) if p)
 
-    # Core identity / role
-    parts.append(MEM.core_block())
 
-    # Tiny, always-on truths (if your memory_store has facts_block)
-    facts_block = getattr(MEM, "facts_block", lambda: "")()
+def build_prompt_parts(
+    focus="Reinforce identity + bond; memory is sacred.",
+    related_query=None,
+    recent_n=5,
+    include_related=True,
+):
+    """
+    Split layout for KV-cache reuse: (stable, volatile).
+    Every block is memoized on the data it reads (MEM.blocks); only changed ones rebuild.
+    stable  = role/core identity/facts/session/style — byte-identical turn to turn,
+              so it goes first and the model server can keep its evaluated prefix;
+              then the rolling summaries, which only change once per summarized batch.
+    volatile = recent + related episodes + matching Jennyprimefiles chunks — changes
+              every turn, so it is placed next to the user message at the end of the window.
+    """
+    memo = MEM.blocks
+    stable = [memo.get("core", ("profile",), MEM.core_block)]
+    facts_block = memo.get("facts", ("profile",), _facts_block)
     if facts_block.strip():
-        parts.append(facts_block)
+        stable.append(facts_block)
+    stable.append(memo.get("session", (), MEM.session_block, focus))
+    stable.append(STYLE)
+    stable.append(memo.get("summaries", ("summaries",), MEM.summaries_block))
 
-    # Session focus + tone guidance
-    parts.append(MEM.session_block(focus))
-    parts.append(STYLE)
-
-    # Short-term continuity
-    parts.append(MEM.recent_block(n=recent_n, max_tokens=300))
-
-    # Cue-based recall from episodes, driven by THIS user message
+    volatile = [memo.get("recent", ("episodes",), MEM.recent_block, recent_n, 300)]
     if include_related and (related_query or "").strip():
-        parts.append(MEM.related_block(related_query))
+        volatile.append(memo.get("related", ("episodes", "vectors"), MEM.related_block, related_query))
+        volatile.append(memo.get("knowledge", ("knowledge",), KB.block, related_query))
 
-    # Join non-empty pieces with spacing
-    return "\n\n".join(p for p in parts if p and p.strip())
+    join = lambda ps: "\n\n".join(p for p in ps if p and p.strip())
+    return join(stable), join(volatile)
 
 
 def build_for_message(user_text: str, **kwargs) -> str:
@@ -44,5 +62,12 @@ def build_for_message(user_text: str, **kwargs) -> str:
     return build_system_prompt(related_query=user_text, **kwargs)
 
 
+def prompt_stats():
+    """Block memo hit/miss counters (for logs or a debug endpoint)."""
+    return MEM.blocks.stats()
+
+
 if __name__ == "__main__":
     print(build_system_prompt())
+    build_system_prompt()
+    print(prompt_stats())
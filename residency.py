@@ -0,0 +1,222 @@
+# [F036] residency.py v1.0 (2026-10-18)
+__FILE_ID__ = "F036"
+__VERSION__ = "1.0"
+
+# Model residency manager: keeps the chat model(s) loaded in Ollama so the first message
+# after idle does not pay the multi-second GGUF load.
+#   - start(): pre-loads the resident set with a zero-token /api/generate (no prompt) and
+#     the model's keep_alive; later checks re-load a resident model Ollama dropped before its
+#     keep_alive ran out (evicted); one that expired after keep_alive idle stays unloaded until
+#     the next use, so the keep_alive map also applies to the GUI model
+#   - keep_alive per model: JENNY_KEEP_ALIVE (default 30m), JENNY_KEEP_ALIVE_MAP="jenny-lite=5m,..."
+#     chat_loop sends keep_alive_for(model) with every generation
+#   - resident set: the GUI model first, then the other JENNY_MODELS (jenny, jenny-lite,
+#     jenny-fast) used within JENNY_RESIDENT_IDLE, most recent first, while their sizes fit
+#     JENNY_MODEL_RAM_GB (never-used models are not pre-loaded); with a budget set, loaded
+#     models outside the set are unloaded (keep_alive 0)
+#   - stats(): size, loaded/resident, last use, load timings (pre-loads and cold chats)
+#
+#   python residency.py            # pre-load now and print the timings
+
+# --- imports ---
+import os, re, json, time, threading
+
+def _full(name):
+    name = (name or "").strip()
+    return name if not name or ":" in name else f"{name}:latest"
+
+def _parse_map(s):
+    out = {}
+    for part in (s or "").split(","):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            out[_full(k)] = v.strip()
+    return out
+
+MODELS      = [_full(m) for m in os.getenv("JENNY_MODELS", "jenny,jenny-lite,jenny-fast").split(",") if m.strip()]
+KEEP_ALIVE  = os.getenv("JENNY_KEEP_ALIVE", "30m")
+KEEP_MAP    = _parse_map(os.getenv("JENNY_KEEP_ALIVE_MAP", ""))
+RAM_BUDGET  = float(os.getenv("JENNY_MODEL_RAM_GB", "0")) * 1024 ** 3      # 0 = only the GUI model
+IDLE        = float(os.getenv("JENNY_RESIDENT_IDLE", str(2 * 3600)))
+INTERVAL    = float(os.getenv("JENNY_RESIDENCY_INTERVAL", "60"))           # 0 = pre-load once, no checks
+ENABLED     = os.getenv("JENNY_PRELOAD", "1") == "1"
+COLD_MS     = 500            # a chat whose load_duration exceeds this paid a (re)load
+
+def keep_alive_for(model):
+    return KEEP_MAP.get(_full(model), KEEP_ALIVE)
+
+_DUR = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def keep_alive_seconds(value):
+    """Seconds of an Ollama keep_alive ("30m", "1h30m", "300"); None = forever (negative)."""
+    v = str(value).strip()
+    try:
+        n = float(v)
+        return None if n < 0 else n
+    except ValueError:
+        pass
+    if v.startswith("-"):
+        return None
+    parts = _DUR.findall(v)
+    return sum(float(n) * _UNIT[u] for n, u in parts) if parts else 300.0   # Ollama default 5m
+
+
+class ResidencyManager:
+    """Decides which models stay loaded and keeps them warm; touch() records every use."""
+
+    def __init__(self, client, primary, models=MODELS, ram_budget=RAM_BUDGET, health=None):
+        self.client = client
+        self.primary = _full(primary)
+        self.models = [self.primary] + [m for m in models if m != self.primary]
+        self.ram_budget = ram_budget
+        self.health = health                # HealthMonitor: loaded models without an extra call
+        self._lock = threading.Lock()
+        self._info = {m: self._blank() for m in self.models}
+        self._thread = None
+
+    # --- bookkeeping ---
+    @staticmethod
+    def _blank():
+        return {"size": None, "last_used": 0.0, "last_loaded": 0.0, "loads": 0, "load_ms": [],
+                "cold_chats": 0, "last_load_ms": None, "error": None}
+
+    def touch(self, model, eval_stats=None):
+        """Record a generation on model (eval_stats: Ollama timing counters, for cold loads)."""
+        m = _full(model)
+        with self._lock:
+            info = self._info.setdefault(m, self._blank())
+            info["last_used"] = time.time()
+            ms = (eval_stats or {}).get("load_duration", 0) / 1e6
+            if ms > COLD_MS:
+                info["cold_chats"] += 1
+                info["last_load_ms"] = round(ms, 1)
+
+    def _sizes(self):
+        """Model sizes from /api/tags (bytes on disk ~ resident size); once, then kept."""
+        if all(i["size"] for m, i in self._info.items() if m in self.models):
+            return
+        try:
+            r = self.client.tags(timeout=5)
+            r.raise_for_status()
+            for t in (r.json() or {}).get("models") or []:
+                name = _full(t.get("name") or t.get("model"))
+                if name in self._info and t.get("size"):
+                    self._info[name]["size"] = t["size"]
+        except Exception as e:
+            print(f"[residency] model sizes unavailable: {e}")
+
+    def _loaded(self):
+        if self.health is not None and self.health.snapshot().get("checked"):
+            return {_full(m["name"]) for m in self.health.snapshot().get("models") or []}
+        try:
+            r = self.client.get("/api/ps", timeout=3)
+            r.raise_for_status()
+            return {_full(m.get("name") or m.get("model")) for m in (r.json() or {}).get("models") or []}
+        except Exception:
+            return None
+
+    def plan(self, now=None):
+        """Models that should stay loaded: primary first, then most recently used within budget."""
+        now = now or time.time()
+        with self._lock:
+            others = [m for m in self.models[1:]
+                      if self._info[m]["last_used"] and now - self._info[m]["last_used"] < IDLE]
+            others.sort(key=lambda m: -self._info[m]["last_used"])
+            keep, used = [self.primary], self._info[self.primary]["size"] or 0
+            for m in others:
+                size = self._info[m]["size"]
+                if self.ram_budget and size and used + size <= self.ram_budget:
+                    keep.append(m); used += size
+        return keep
+
+    # --- actions ---
+    def preload(self, model):
+        """Zero-token generate: Ollama loads the model (if needed) and applies keep_alive."""
+        t0 = time.perf_counter()
+        try:
+            r = self.client.post("/api/generate", json={"model": model, "keep_alive": keep_alive_for(model),
+                                                          "stream": False}, timeout=300)
+            r.raise_for_status()
+            body = r.json() if r.content else {}
+            ms = (body.get("load_duration") or 0) / 1e6 or (time.perf_counter() - t0) * 1000
+            with self._lock:
+                info = self._info[model]
+                info["loads"] += 1
+                info["last_loaded"] = time.time()
+                info["last_load_ms"] = round(ms, 1)
+                info["load_ms"] = (info["load_ms"] + [round(ms, 1)])[-20:]
+                info["error"] = None
+            return ms
+        except Exception as e:
+            with self._lock:
+                self._info[model]["error"] = str(e)
+            print(f"[residency] preload {model} failed: {e}")
+            return None
+
+    def unload(self, model):
+        try:
+            self.client.post("/api/generate", json={"model": model, "keep_alive": 0, "stream": False},
+                             timeout=30)
+            print(f"[residency] unloaded {model} (over the RAM budget)")
+        except Exception as e:
+            print(f"[residency] unload {model} failed: {e}")
+
+    def _within_keep_alive(self, m, now):
+        """Not loaded yet, or dropped by Ollama before its keep_alive since last use/load ran out."""
+        ka = keep_alive_seconds(keep_alive_for(m))
+        with self._lock:
+            ref = max(self._info[m]["last_used"], self._info[m]["last_loaded"])
+        return ka is None or not ref or now - ref < ka
+
+    def check(self):
+        """Load what the plan keeps and is not loaded; unload managed models outside the plan."""
+        self._sizes()
+        now = time.time()
+        keep = self.plan(now)
+        loaded = self._loaded()
+        for m in keep:
+            if (loaded is None or m not in loaded) and self._within_keep_alive(m, now):
+                ms = self.preload(m)
+                if ms is not None:
+                    print(f"[residency] {m} ready ({ms:.0f} ms)")
+        if loaded and self.ram_budget:             # without a budget other models are left alone
+            for m in self.models:
+                if m in loaded and m not in keep:
+                    self.unload(m)
+        return keep
+
+    def start(self):
+        """Pre-load in the background now, then re-check every INTERVAL (JENNY_PRELOAD=0 skips)."""
+        if not ENABLED or self._thread is not None:
+            return
+        def loop():
+            while True:
+                try:
+                    self.check()
+                except Exception as e:
+                    print(f"[residency] check failed: {e}")
+                if INTERVAL <= 0:
+                    return
+                time.sleep(INTERVAL)
+        self._thread = threading.Thread(target=loop, name="jenny-residency", daemon=True)
+        self._thread.start()
+
+    def stats(self):
+        keep = set(self.plan())
+        out = {}
+        with self._lock:
+            for m, i in self._info.items():
+                lm = i["load_ms"]
+                out[m] = {"size": i["size"], "resident": m in keep, "keep_alive": keep_alive_for(m),
+                          "last_used": int(i["last_used"]) or None, "loads": i["loads"],
+                          "last_load_ms": i["last_load_ms"], "avg_load_ms": round(sum(lm) / len(lm), 1) if lm else None,
+                          "cold_chats": i["cold_chats"], "error": i["error"]}
+        return {"ram_budget_gb": round(self.ram_budget / 1024 ** 3, 2), "models": out}
+
+
+if __name__ == "__main__":
+    from client_ollama import client_for
+    res = ResidencyManager(client_for(), os.getenv("JENNY_MODEL", "jenny:latest"))
+    print("resident:", res.check())
+    print(json.dumps(res.stats(), indent=1))
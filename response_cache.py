@@ -0,0 +1,230 @@
+# [F028] response_cache.py v1.1 (2026-10-18)
+__FILE_ID__ = "F028"
+__VERSION__ = "1.1"
+
+# Reply cache for repeated short prompts ("hi", "who are you", ...).
+# key = normalized prompt + model + generation options + caller scope (conversation id,
+# profile version, ...), so a hit is only served where the model would have been asked the
+# very same thing; near-duplicate lookups stay inside the same scope.
+#   - exact hit: sha1 of the key
+#   - near hit (optional): MinHash over character 3-grams, banded LSH; Jaccard >= JENNY_RCACHE_NEAR
+#   - TTL + LRU eviction under a byte cap; JSON snapshot in memory/response_cache.json
+#   - bypass: prompts longer than JENNY_RCACHE_MAX_PROMPT chars, and sampling hotter than
+#     JENNY_RCACHE_MAX_TEMP (default 0: only greedy requests are cached). A request without
+#     "temperature" samples at the model default (Modelfile: 0.7), so it is never cached.
+
+# --- imports ---
+import os, re, json, time, zlib, atexit, hashlib, pathlib, threading
+from collections import OrderedDict
+from memory_io import atomic_write_text
+
+ROOT = pathlib.Path(__file__).resolve().parent
+CACHE_FILE = ROOT / "memory" / "response_cache.json"
+
+ENABLED    = os.getenv("JENNY_RCACHE", "1") == "1"
+TTL        = float(os.getenv("JENNY_RCACHE_TTL", str(7 * 24 * 3600)))
+MAX_BYTES  = int(float(os.getenv("JENNY_RCACHE_MB", "4")) * 1024 * 1024)
+MAX_PROMPT = int(os.getenv("JENNY_RCACHE_MAX_PROMPT", "200"))
+MAX_TEMP   = float(os.getenv("JENNY_RCACHE_MAX_TEMP", "0"))
+NEAR       = float(os.getenv("JENNY_RCACHE_NEAR", "0.85"))      # 0 = exact matches only
+
+_SPACE = re.compile(r"\s+")
+_TRAIL = re.compile(r"[\s.!?,;:~]+$")
+_IGNORED_OPTS = ("num_thread",)           # do not change the reply
+
+def normalize(prompt):
+    return _TRAIL.sub("", _SPACE.sub(" ", (prompt or "").lower()).strip())
+
+# --- MinHash (char 3-grams) + LSH bands ---
+NUM_HASHES, BANDS = 32, 8
+ROWS = NUM_HASHES // BANDS
+
+def _shingles(text, n=3):
+    t = f" {text} "
+    return {t[i:i + n] for i in range(max(1, len(t) - n + 1))}
+
+def minhash(text):
+    sh = [s.encode("utf-8") for s in _shingles(text)]
+    return [min(zlib.crc32(s, seed) for s in sh) for seed in range(1, NUM_HASHES + 1)]
+
+def _bands(scope, sig):
+    return [f"{scope}:{b}:" + ",".join(map(str, sig[b * ROWS:(b + 1) * ROWS])) for b in range(BANDS)]
+
+def _similarity(a, b):
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
+
+
+class ResponseCache:
+    """get(prompt, model, opts, scope) -> reply | None; put(...) stores a finished reply."""
+    SAVE_EVERY = 30.0                      # seconds between snapshot writes while busy
+
+    def __init__(self, path=CACHE_FILE, ttl=TTL, max_bytes=MAX_BYTES, near=NEAR):
+        self.path = pathlib.Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.near = near
+        self._lock = threading.RLock()
+        self._items = OrderedDict()        # key -> {"scope", "prompt", "reply", "ts", "sig"}
+        self._lsh = {}                     # band -> set(keys)
+        self._bytes = 0
+        self._dirty = False
+        self._saved = time.time()
+        self._stats = {"hits": 0, "near_hits": 0, "misses": 0, "bypass": 0, "stores": 0, "evicted": 0}
+        self._load()
+        atexit.register(self.save)
+
+    # --- keys ---
+    @staticmethod
+    def scope_of(model, opts, scope=""):
+        o = {k: v for k, v in (opts or {}).items() if k not in _IGNORED_OPTS}
+        raw = json.dumps([model, o, scope], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def cacheable(prompt, opts=None):
+        if not ENABLED or not prompt or len(prompt) > MAX_PROMPT:
+            return False
+        temp = (opts or {}).get("temperature")
+        if temp is None:                   # model default (Modelfile), not known to be greedy
+            return False
+        try:
+            return float(temp) <= MAX_TEMP
+        except (TypeError, ValueError):
+            return False
+
+    # --- lookup / store ---
+    def get(self, prompt, model, opts=None, scope=""):
+        if not self.cacheable(prompt, opts):
+            with self._lock:
+                self._stats["bypass"] += 1
+            return None
+        sc = self.scope_of(model, opts, scope)
+        norm = normalize(prompt)
+        key = f"{sc}:{hashlib.sha1(norm.encode('utf-8')).hexdigest()}"
+        sig = minhash(norm) if self.near > 0 else None
+        with self._lock:
+            hit = self._live(key)
+            if hit is None and sig is not None:
+                hit = self._near(sc, sig)
+                if hit is not None:
+                    self._stats["near_hits"] += 1
+            elif hit is not None:
+                self._stats["hits"] += 1
+            if hit is None:
+                self._stats["misses"] += 1
+                return None
+            return hit["reply"]
+
+    def put(self, prompt, model, opts, reply, scope=""):
+        reply = (reply or "").strip()
+        if not reply or not self.cacheable(prompt, opts):
+            return
+        sc = self.scope_of(model, opts, scope)
+        norm = normalize(prompt)
+        key = f"{sc}:{hashlib.sha1(norm.encode('utf-8')).hexdigest()}"
+        with self._lock:
+            self._remove(key)
+            self._insert(key, {"scope": sc, "prompt": norm, "reply": reply, "ts": time.time(),
+                               "sig": minhash(norm) if self.near > 0 else None})
+            self._stats["stores"] += 1
+            self._evict()
+            self._dirty = True
+            if time.time() - self._saved > self.SAVE_EVERY:
+                self.save()
+
+    def _live(self, key):
+        it = self._items.get(key)
+        if it is None:
+            return None
+        if time.time() - it["ts"] > self.ttl:
+            self._remove(key)
+            return None
+        self._items.move_to_end(key)
+        return it
+
+    def _near(self, scope, sig):
+        cands = set()
+        for b in _bands(scope, sig):
+            cands |= self._lsh.get(b, set())
+        best, best_sim = None, self.near
+        for k in cands:
+            it = self._items.get(k)
+            if it is None or not it.get("sig"):
+                continue
+            sim = _similarity(sig, it["sig"])
+            if sim >= best_sim:
+                best, best_sim = k, sim
+        return self._live(best) if best else None
+
+    def _size(self, it):
+        return 200 + len(it["prompt"]) + len(it["reply"])
+
+    def _insert(self, key, it):
+        self._items[key] = it
+        self._bytes += self._size(it)
+        if it.get("sig"):
+            for b in _bands(it["scope"], it["sig"]):
+                self._lsh.setdefault(b, set()).add(key)
+
+    def _remove(self, key):
+        it = self._items.pop(key, None)
+        if it is None:
+            return
+        self._bytes -= self._size(it)
+        if it.get("sig"):
+            for b in _bands(it["scope"], it["sig"]):
+                s = self._lsh.get(b)
+                if s:
+                    s.discard(key)
+                    if not s:
+                        del self._lsh[b]
+        self._dirty = True
+
+    def _evict(self):
+        while self._items and self._bytes > self.max_bytes:
+            self._remove(next(iter(self._items)))
+            self._stats["evicted"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear(); self._lsh.clear()
+            self._bytes = 0
+            self._dirty = True
+
+    # --- persistence ---
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"[rcache] ignoring unreadable {self.path.name}: {e}")
+            return
+        now = time.time()
+        for key, it in data.get("items", []):
+            if now - it.get("ts", 0) <= self.ttl:
+                if self.near > 0 and not it.get("sig"):
+                    it["sig"] = minhash(it["prompt"])
+                self._insert(key, it)
+        self._evict()
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            items = list(self._items.items())
+            self._dirty = False
+            self._saved = time.time()
+        try:
+            self.path.parent.mkdir(exist_ok=True)
+            atomic_write_text(self.path, json.dumps({"v": 1, "items": items}, ensure_ascii=False))
+        except Exception as e:
+            print(f"[rcache] save failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entries": len(self._items), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes, "enabled": ENABLED}
+
+
+RCACHE = ResponseCache()
@@ -0,0 +1,152 @@
+# [F027] scheduler.py v1.0 (2026-10-18)
+__FILE_ID__ = "F027"
+__VERSION__ = "1.0"
+
+# Admission control in front of Ollama generations.
+# Ollama only runs OLLAMA_NUM_PARALLEL generations at once; extra requests used to pile up
+# on 120 s timeouts. Every chat goes through SCHED.acquire(key) instead:
+#   - at most `limit` slots in flight (JENNY_MAX_PARALLEL, default OLLAMA_NUM_PARALLEL or 1)
+#   - bounded wait queue (JENNY_QUEUE_MAX); a full queue or a wait past JENNY_QUEUE_WAIT
+#     raises Busy right away so the GUI can answer 503 instead of hanging
+#   - priority first (lower = sooner), then per-key fairness: a session's 2nd queued request
+#     goes behind every other session's 1st
+# Limits are per process; with several GUI workers give each worker its share.
+#
+#   with SCHED.acquire(session_id):
+#       ... one generation ...
+
+# --- imports ---
+import os, time, heapq, threading, itertools
+from collections import deque
+
+LIMIT     = int(os.getenv("JENNY_MAX_PARALLEL", os.getenv("OLLAMA_NUM_PARALLEL", "1")))
+QUEUE_MAX = int(os.getenv("JENNY_QUEUE_MAX", "16"))
+MAX_WAIT  = float(os.getenv("JENNY_QUEUE_WAIT", "20"))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND  = 10
+
+
+class Busy(RuntimeError):
+    def __init__(self, reason, retry_after=2):
+        super().__init__(f"model busy ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Slot:
+    """A granted generation slot; release() is idempotent, also usable as a context manager."""
+    __slots__ = ("_sched", "key", "wait_ms", "_released")
+
+    def __init__(self, sched, key, wait_ms):
+        self._sched, self.key, self.wait_ms, self._released = sched, key, wait_ms, False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._sched._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class _Ticket:
+    __slots__ = ("key", "event", "granted", "cancelled")
+
+    def __init__(self, key):
+        self.key, self.event, self.granted, self.cancelled = key, threading.Event(), False, False
+
+
+class Scheduler:
+    def __init__(self, limit=LIMIT, queue_max=QUEUE_MAX, max_wait=MAX_WAIT):
+        self.limit = max(1, limit)
+        self.queue_max = queue_max
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._heap = []                      # (priority, nth pending for key, seq, ticket)
+        self._seq = itertools.count()
+        self._pending = {}                   # key -> queued tickets
+        self._depth = 0                      # live (not cancelled) queued tickets
+        self._inflight = 0
+        self._waits = deque(maxlen=512)      # recent admission waits (ms)
+        self._stats = {"admitted": 0, "queued": 0, "shed_full": 0, "shed_timeout": 0}
+
+    def acquire(self, key="default", priority=PRIORITY_INTERACTIVE, timeout=None):
+        """Slot for one generation; raises Busy when the queue is full or the wait times out."""
+        t0 = time.perf_counter()
+        with self._lock:
+            if self._inflight < self.limit and not self._depth:
+                return self._grant(key, t0)
+            if self._depth >= self.queue_max:
+                self._stats["shed_full"] += 1
+                raise Busy("queue full")
+            t = _Ticket(key)
+            n = self._pending.get(key, 0)
+            self._pending[key] = n + 1
+            heapq.heappush(self._heap, (priority, n, next(self._seq), t))
+            self._depth += 1
+            self._stats["queued"] += 1
+        t.event.wait(self.max_wait if timeout is None else timeout)
+        with self._lock:
+            if t.granted:
+                return self._grant(key, t0, counted=True)
+            t.cancelled = True                # left in the heap, skipped by _dispatch
+            self._unqueue(key)
+            self._stats["shed_timeout"] += 1
+        raise Busy("queue wait timed out")
+
+    def try_acquire(self, key="background"):
+        """Slot only if one is free and nobody is waiting (background work), else None."""
+        with self._lock:
+            if self._inflight < self.limit and not self._depth:
+                return self._grant(key, time.perf_counter())
+        return None
+
+    def _grant(self, key, t0, counted=False):
+        if not counted:
+            self._inflight += 1
+        ms = (time.perf_counter() - t0) * 1000
+        self._waits.append(ms)
+        self._stats["admitted"] += 1
+        return Slot(self, key, ms)
+
+    def _unqueue(self, key):
+        self._depth -= 1
+        n = self._pending.get(key, 1) - 1
+        if n > 0:
+            self._pending[key] = n
+        else:
+            self._pending.pop(key, None)
+
+    def _release(self, slot):
+        with self._lock:
+            self._inflight -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        while self._heap and self._inflight < self.limit:
+            t = heapq.heappop(self._heap)[-1]
+            if t.cancelled:
+                continue
+            self._unqueue(t.key)
+            t.granted = True
+            self._inflight += 1
+            t.event.set()
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            s = dict(self._stats, limit=self.limit, inflight=self._inflight, depth=self._depth,
+                     queue_max=self.queue_max, sessions_waiting=len(self._pending))
+        if waits:
+            s["wait_ms_avg"] = round(sum(waits) / len(waits), 2)
+            s["wait_ms_p95"] = round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2)
+            s["wait_ms_max"] = round(waits[-1], 2)
+        return s
+
+
+SCHED = Scheduler()
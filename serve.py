@@ -0,0 +1,90 @@
+# [F026] serve.py v1.0 (2026-10-18)
+__FILE_ID__ = "F026"
+__VERSION__ = "1.0"
+
+# Production serving for the Jenny GUI (WSGI; replaces Flask's development server).
+#
+#   python serve.py --workers 4            # gunicorn if installed, else waitress, else Flask threaded
+#   gunicorn -w 4 -b 127.0.0.1:7860 serve:app
+#   python serve.py --app probe --port 7861
+#
+# Per-session chat state lives in memory/sessions.db (session_store.py), so any worker can
+# serve any request. With more than one worker the memory backend is forced to SQLite
+# (JENNY_MEMORY_BACKEND=sqlite): the JSONL files assume a single writer process; session
+# writes go straight through to the store (JENNY_SESSION_WRITE_THROUGH=1).
+# Background jobs (summarizer, compactor, knowledge ingest, model residency, the Ollama
+# prober) run in one elected worker, the holder of memory/background.lock; the others read
+# its health snapshot from memory/health.json.
+
+# --- imports ---
+import os, sys, argparse, pathlib, importlib.util
+
+ROOT = pathlib.Path(__file__).resolve().parent
+APPS = {"gui": ROOT / "gui_app.safe.py", "probe": ROOT / "gui_probe.py"}
+WORKERS = int(os.getenv("JENNY_WORKERS", "1"))
+THREADS = int(os.getenv("JENNY_THREADS_PER_WORKER", "8"))
+
+_loaded = {}
+
+def load_app(name="gui"):
+    """The Flask app object of gui_app.safe.py ("gui") or gui_probe.py ("probe")."""
+    if name not in _loaded:
+        path = APPS[name]
+        spec = importlib.util.spec_from_file_location(f"jenny_{name}", path)
+        mod = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = mod
+        spec.loader.exec_module(mod)
+        _loaded[name] = getattr(mod, "APP", None) or mod.app
+    return _loaded[name]
+
+def __getattr__(attr):
+    # lazy `serve:app` / `serve:probe` for WSGI servers (env is set before the first import)
+    if attr == "app":
+        return load_app("gui")
+    if attr == "probe":
+        return load_app("probe")
+    raise AttributeError(attr)
+
+def _serve_gunicorn(args, target):
+    argv = ["gunicorn", "--chdir", str(ROOT), "-w", str(args.workers), "--threads", str(args.threads),
+            "-k", "gthread", "-b", f"{args.host}:{args.port}", "--timeout", "300", f"serve:{target}"]
+    print(f"[serve] gunicorn {args.workers} worker(s) x {args.threads} thread(s) on {args.host}:{args.port}")
+    os.execvp(argv[0], argv)
+
+def _serve_waitress(args, app):
+    import waitress
+    threads = args.workers * args.threads
+    if args.workers > 1:
+        print(f"[serve] waitress is single-process; using {threads} threads instead of {args.workers} workers")
+    waitress.serve(app, host=args.host, port=args.port, threads=threads)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve the Jenny GUI with a production WSGI server.")
+    ap.add_argument("--app", choices=sorted(APPS), default="gui")
+    ap.add_argument("--host", default=os.getenv("JENNY_HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=None)
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument("--threads", type=int, default=THREADS)
+    args = ap.parse_args(argv)
+    args.port = args.port or (7861 if args.app == "probe" else 7860)
+    args.workers = max(1, args.workers)
+
+    if args.workers > 1 and os.getenv("JENNY_MEMORY_BACKEND", "jsonl").lower() != "sqlite":
+        print("[serve] multiple workers: using JENNY_MEMORY_BACKEND=sqlite")
+        os.environ["JENNY_MEMORY_BACKEND"] = "sqlite"
+    if args.workers > 1:
+        os.environ.setdefault("JENNY_SESSION_WRITE_THROUGH", "1")   # sessions move between workers
+
+    target = "app" if args.app == "gui" else "probe"
+    if importlib.util.find_spec("gunicorn") and os.name != "nt":
+        _serve_gunicorn(args, target)
+        return
+    app = load_app(args.app)
+    if importlib.util.find_spec("waitress"):
+        _serve_waitress(args, app)
+        return
+    print("[serve] neither gunicorn nor waitress installed; falling back to Flask's threaded server")
+    app.run(host=args.host, port=args.port, debug=False, threaded=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# [F025] session_store.py v1.1 (2026-10-18)
+__FILE_ID__ = "F025"
+__VERSION__ = "1.1"
+
+# Per-session chat state shared by every GUI worker process.
+# One row per session id in memory/sessions.db (SQLite, WAL): the echo/dup fences,
+# the conversation window and the last assistant reply. Nothing lives in module
+# globals, so any worker can serve any request without mixing conversations.
+#
+# v1.1: Conversation (bounded deque of turns + running token total) and SessionManager
+# (in-process LRU of live sessions under a count/byte cap; idle or evicted sessions are
+# written back to SQLite and reloaded on their next request).
+
+# --- imports ---
+import os, json, time, sqlite3, threading, pathlib, uuid, atexit
+from collections import deque, OrderedDict
+from token_count import count_tokens
+
+ROOT = pathlib.Path(__file__).resolve().parent
+SESSIONS_DB = ROOT / "memory" / "sessions.db"
+SESSION_COOKIE = "jenny_sid"
+SESSION_HEADER = "X-Session-Id"
+IDLE_TTL = int(os.getenv("JENNY_SESSION_TTL", str(7 * 24 * 3600)))
+
+CONVO_TURNS   = int(os.getenv("JENNY_CONVO_TURNS", "64"))        # messages kept per session
+CONVO_TOKENS  = int(os.getenv("JENNY_CONVO_TOKENS", "4096"))     # token cap per session
+MAX_SESSIONS  = int(os.getenv("JENNY_MAX_SESSIONS", "256"))      # live sessions per process
+SESSION_MEM   = int(float(os.getenv("JENNY_SESSION_MEM_MB", "32")) * 1024 * 1024)
+SESSION_IDLE  = int(os.getenv("JENNY_SESSION_IDLE", "1800"))     # seconds before write-back + drop
+WRITE_THROUGH = os.getenv("JENNY_SESSION_WRITE_THROUGH", "0") == "1"
+
+
+class Conversation:
+    """
+    Bounded chat history: messages in a deque with their token counts and running totals.
+    append() drops the oldest turns once over max_turns/max_tokens (O(1) amortized);
+    window(budget) walks back only as far as the budget reaches.
+    """
+    __slots__ = ("turns", "tokens", "nbytes", "max_turns", "max_tokens")
+
+    def __init__(self, messages=(), max_turns=CONVO_TURNS, max_tokens=CONVO_TOKENS):
+        self.turns = deque()
+        self.tokens = 0
+        self.nbytes = 0
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        for m in messages:
+            self.append(m.get("role", "user"), m.get("content", ""))
+
+    def append(self, role, content):
+        n = count_tokens(content)
+        self.turns.append(({"role": role, "content": content}, n))
+        self.tokens += n
+        self.nbytes += len(content)
+        while len(self.turns) > 1 and (len(self.turns) > self.max_turns or self.tokens > self.max_tokens):
+            m, k = self.turns.popleft()
+            self.tokens -= k
+            self.nbytes -= len(m["content"])
+
+    def window(self, budget):
+        """Newest messages whose tokens fit in budget, oldest first."""
+        used, out = 0, []
+        for m, n in reversed(self.turns):
+            if used + n > budget:
+                break
+            out.append(m)
+            used += n
+        out.reverse()
+        return out
+
+    def messages(self):
+        return [m for m, _ in self.turns]
+
+    def __len__(self):
+        return len(self.turns)
+
+
+def new_state():
+    # cid: conversation id; cached replies are only reused within one conversation
+    return {"last_user": None, "t_user": 0.0, "last_reply": None,
+            "convo": Conversation(), "last_assistant": "", "cid": uuid.uuid4().hex[:16]}
+
+def _dump_state(state):
+    d = {k: v for k, v in state.items() if not k.startswith("_")}   # "_x" = in-process only
+    c = d.get("convo")
+    d["convo"] = c.messages() if isinstance(c, Conversation) else list(c or [])
+    return json.dumps(d, ensure_ascii=False)
+
+def _state_bytes(state):
+    c = state.get("convo")
+    return 512 + (c.nbytes if isinstance(c, Conversation) else 0) + \
+        len(state.get("last_reply") or "") + len(state.get("last_assistant") or "")
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+def valid_session_id(sid):
+    return bool(sid) and len(sid) <= 64 and all(c.isalnum() or c in "-_" for c in sid)
+
+
+class SQLiteSessionStore:
+    """load(sid) -> state dict (fresh if unknown); save(sid, state); purge idle rows."""
+
+    def __init__(self, path=SESSIONS_DB):
+        self.path = str(path)
+        pathlib.Path(self.path).parent.mkdir(exist_ok=True)
+        self._local = threading.local()
+        with self._db() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS sessions("
+                       "sid TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated)")
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA busy_timeout=5000")
+            self._local.db = db
+        return db
+
+    def load(self, sid):
+        row = self._db().execute("SELECT state FROM sessions WHERE sid=?", (sid,)).fetchone()
+        state = new_state()
+        if row:
+            try:
+                d = json.loads(row[0])
+                d["convo"] = Conversation(d.get("convo") or [])
+                state.update(d)
+            except Exception:
+                pass
+        return state
+
+    def save(self, sid, state):
+        now = time.time()
+        with self._db() as db:
+            db.execute("INSERT INTO sessions(sid, state, updated) VALUES(?, ?, ?) "
+                       "ON CONFLICT(sid) DO UPDATE SET state=excluded.state, updated=excluded.updated",
+                       (sid, _dump_state(state), now))
+        return now
+
+    def updated(self, sid):
+        row = self._db().execute("SELECT updated FROM sessions WHERE sid=?", (sid,)).fetchone()
+        return row[0] if row else 0.0
+
+    def delete(self, sid):
+        with self._db() as db:
+            db.execute("DELETE FROM sessions WHERE sid=?", (sid,))
+
+    def purge(self, max_idle=IDLE_TTL):
+        with self._db() as db:
+            return db.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - max_idle,)).rowcount
+
+    def count(self):
+        return self._db().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class SessionManager:
+    """
+    Live sessions for this process, most recently used last.
+    get(sid) loads from the store on a miss; put(sid) marks it dirty. With write_through
+    (several workers sharing the store) puts are saved at once and a cached session is
+    reloaded when another worker saved it later. Sessions idle for `idle` seconds, or least
+    recently used beyond max_sessions / max_bytes, are saved and dropped.
+    """
+
+    def __init__(self, store=None, max_sessions=MAX_SESSIONS, max_bytes=SESSION_MEM,
+                 idle=SESSION_IDLE, write_through=WRITE_THROUGH):
+        self.store = store or SQLiteSessionStore()
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle = idle
+        self.write_through = write_through
+        self._live = OrderedDict()          # sid -> [state, last_used, dirty, saved_at]
+        self._bytes = {}
+        self._total = 0                     # running sum of _bytes
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "loads": 0, "evicted": 0, "saved": 0}
+        atexit.register(self.flush)
+
+    def get(self, sid):
+        with self._lock:
+            ent = self._live.get(sid)
+            if ent is not None and self.write_through and self.store.updated(sid) > ent[3]:
+                self._size(sid, None)
+                del self._live[sid]
+                ent = None
+            if ent is not None:
+                self._stats["hits"] += 1
+                ent[1] = time.time()
+                self._live.move_to_end(sid)
+                return ent[0]
+        stamp = self.store.updated(sid)
+        state = self.store.load(sid)
+        with self._lock:
+            ent = self._live.get(sid)              # another thread may have loaded it meanwhile
+            if ent is None:
+                ent = self._live[sid] = [state, time.time(), False, stamp]
+                self._size(sid, state)
+                self._stats["loads"] += 1
+            self._evict()
+            return ent[0]
+
+    def put(self, sid, state):
+        with self._lock:
+            ent = self._live.get(sid)
+            if ent is None:
+                ent = self._live[sid] = [state, time.time(), True, 0.0]
+            ent[0], ent[1], ent[2] = state, time.time(), True
+            self._live.move_to_end(sid)
+            self._size(sid, state)
+            if self.write_through:
+                self._save(sid, ent)
+            self._evict()
+
+    def _size(self, sid, state):
+        n = _state_bytes(state) if state is not None else 0
+        self._total += n - self._bytes.pop(sid, 0)
+        if state is not None:
+            self._bytes[sid] = n
+
+    def _save(self, sid, ent):
+        try:
+            ent[3] = self.store.save(sid, ent[0])
+            ent[2] = False
+            self._stats["saved"] += 1
+        except Exception as e:
+            print(f"[sessions] save failed for {sid[:8]}: {e}")
+
+    def _drop(self, sid):
+        ent = self._live.pop(sid)
+        self._size(sid, None)
+        if ent[2]:
+            self._save(sid, ent)
+        self._stats["evicted"] += 1
+
+    def _evict(self):
+        now = time.time()
+        while self._live:
+            sid, ent = next(iter(self._live.items()))
+            if (len(self._live) > self.max_sessions or self._total > self.max_bytes
+                    or now - ent[1] > self.idle) and len(self._live) > 1:
+                self._drop(sid)
+            else:
+                break
+
+    def flush(self):
+        """Write every dirty live session to the store."""
+        with self._lock:
+            for sid, ent in self._live.items():
+                if ent[2]:
+                    self._save(sid, ent)
+
+    def count(self):
+        return self.store.count()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "live": len(self._live), "live_bytes": self._total,
+                    "stored": self.store.count()}
@@ -0,0 +1,140 @@
+# [F030] summarizer.py v1.1 (2026-10-18)
+__FILE_ID__ = "F030"
+__VERSION__ = "1.1"
+
+# Rolling summarization of old chat turns into memory/summaries.jsonl.
+# A background job wakes every JENNY_SUMMARY_INTERVAL seconds; when at least
+# JENNY_SUMMARY_BATCH "turn" episodes older than the newest JENNY_SUMMARY_KEEP are not yet
+# covered, it asks the local model for a few dense bullets and appends one record:
+#   {"ts", "ts_from", "ts_to", "ts_to_n", "from"/"to": episode ids at the time, "n", "model", "text"}
+# Progress follows (ts_to, ts_to_n): turns up to ts_to are covered, ts_to_n of them stamped
+# exactly ts_to (episode ids move when episode_log.py compacts the log; the order of turns
+# within one second does not), so any number of turns sharing a ts gets through.
+# MEM.summaries_block() puts the newest summaries into the stable part of the prompt.
+# The job only runs when the scheduler has a free slot and no chat is waiting, and an flock on
+# memory/summaries.lock (released when its holder exits) keeps a CLI pass and the GUI apart.
+#
+#   python summarizer.py            # one pass now (as many batches as are due)
+
+# --- imports ---
+import os, sys, json, time, threading
+from memory_store import MEM, SUMMARIES_JSONL, DATA, _now
+from memory_io import try_lock
+from client_ollama import client_for
+from scheduler import SCHED
+from residency import keep_alive_for
+
+ENABLED  = os.getenv("JENNY_SUMMARIZE", "1") == "1"
+BASE     = os.getenv("JENNY_BASE", "http://127.0.0.1:11435")
+MODEL    = os.getenv("JENNY_SUMMARY_MODEL", os.getenv("JENNY_MODEL", "jenny:latest"))
+BATCH    = int(os.getenv("JENNY_SUMMARY_BATCH", "40"))
+KEEP     = int(os.getenv("JENNY_SUMMARY_KEEP", "60"))       # newest turns stay raw
+INTERVAL = float(os.getenv("JENNY_SUMMARY_INTERVAL", "300"))
+MAX_CHARS_PER_TURN = 600
+LOCK_FILE = DATA / "summaries"             # flock on summaries.lock
+
+PROMPT = (
+    "Summarize the conversation excerpt below for long-term memory.\n"
+    "Write 3-6 short bullet points: facts about Magdy, events, plans, preferences, decisions,\n"
+    "and open threads. No greetings, no commentary, no quotes. Past tense.\n\n"
+    "### EXCERPT\n{excerpt}\n\n### SUMMARY\n"
+)
+GEN_OPTS = {"temperature": 0.2, "num_predict": 220, "num_ctx": 4096}
+
+
+def _last_covered():
+    """(ts, n): turns up to ts are summarized, n of them stamped ts (None = all of those)."""
+    last = MEM.summaries(1)
+    if not last:
+        return -1, None
+    return int(last[-1].get("ts_to") or 0), last[-1].get("ts_to_n")
+
+def _due(batch, keep):
+    """(ts, n) of the last summary and the uncovered turns after it (at most batch)."""
+    ts, n = _last_covered()
+    if n is None:                              # older records: all turns at ts_to are covered
+        return ts, 0, MEM.turns_since(ts, batch, keep)
+    pairs = MEM.turns_since(ts - 1, n + batch, keep)
+    skip = 0
+    while skip < min(n, len(pairs)) and pairs[skip][1].get("ts") == ts:
+        skip += 1
+    return ts, n, pairs[skip:skip + batch]
+
+def _excerpt(recs):
+    lines = []
+    for r in recs:
+        t = " ".join((r.get("text") or "").split())
+        lines.append(t[:MAX_CHARS_PER_TURN])
+    return "\n".join(lines)
+
+def _clean(text):
+    out = []
+    for ln in (text or "").splitlines():
+        ln = ln.strip().lstrip("-*• ").strip()
+        if ln:
+            out.append(ln)
+    return "; ".join(out)
+
+def summarize_batch(batch=BATCH, keep=KEEP, wait=False):
+    """Summarize the next due batch; returns the record written or None (nothing due / busy)."""
+    ts, n, pairs = _due(batch, keep)
+    if len(pairs) < batch:
+        return None
+    slot = SCHED.acquire("summarizer") if wait else SCHED.try_acquire("summarizer")
+    if slot is None:
+        return None
+    with slot:
+        r = client_for(BASE).post("/api/generate", json={
+            "model": MODEL, "prompt": PROMPT.format(excerpt=_excerpt([p[1] for p in pairs])),
+            "options": GEN_OPTS, "stream": False, "keep_alive": keep_alive_for(MODEL)}, timeout=300)
+        r.raise_for_status()
+        text = _clean((r.json() or {}).get("response", ""))
+    if not text:
+        return None
+    ts_to = pairs[-1][1].get("ts")
+    at_end = sum(1 for p in pairs if p[1].get("ts") == ts_to) + (n if ts_to == ts else 0)
+    rec = {"ts": _now(), "from": pairs[0][0], "to": pairs[-1][0],
+           "ts_from": pairs[0][1].get("ts"), "ts_to": ts_to, "ts_to_n": at_end,
+           "n": len(pairs), "model": MODEL, "text": text}
+    with SUMMARIES_JSONL.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    return rec
+
+def run_once(max_batches=8, wait=False):
+    """Summarize every due batch (up to max_batches); returns how many were written."""
+    done = 0
+    lock = try_lock(LOCK_FILE)
+    if lock is None:
+        return 0
+    with lock:
+        MEM.flush()
+        while done < max_batches:
+            rec = summarize_batch(wait=wait)
+            if rec is None:
+                break
+            done += 1
+            print(f"[summaries] episodes {rec['from']}..{rec['to']} -> {len(rec['text'])} chars")
+    return done
+
+
+_thread = None
+
+def start(interval=INTERVAL):
+    """Start the background job once per process (no-op when JENNY_SUMMARIZE=0)."""
+    global _thread
+    if not ENABLED or _thread is not None:
+        return
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                run_once()
+            except Exception as e:
+                print(f"[summaries] pass failed: {e}")
+    _thread = threading.Thread(target=loop, name="jenny-summarizer", daemon=True)
+    _thread.start()
+
+
+if __name__ == "__main__":
+    n = run_once(max_batches=int(sys.argv[1]) if len(sys.argv) > 1 else 1000, wait=True)
+    print(f"[summaries] wrote {n} summaries")
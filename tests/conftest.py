@@ -0,0 +1,31 @@
+# modules live flat at the repo root
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def mem_paths(tmp_path, monkeypatch):
+    """Point memory_store / episode_log at an empty memory/ folder under tmp_path."""
+    import memory_store, episode_log
+    from episode_index import EpisodeIndex
+    seg = tmp_path / "segments"
+    monkeypatch.setattr(episode_log, "SEG_DIR", seg)
+    monkeypatch.setattr(episode_log, "MANIFEST", seg / "manifest.json")
+    monkeypatch.setattr(episode_log, "CUT_FILE", seg / "cut.json")
+    monkeypatch.setattr(episode_log, "LIVE_FILE", tmp_path / "episodes.jsonl")
+    for name in ("PROFILE_JSON", "EPISODES_JSONL", "SUMMARIES_JSONL", "EPISODES_INDEX"):
+        monkeypatch.setattr(memory_store, name, tmp_path / getattr(memory_store, name).name)
+    monkeypatch.setattr(EpisodeIndex, "SAVE_INTERVAL", 0)     # no background saver thread
+    return tmp_path
+
+
+@pytest.fixture
+def store(mem_paths, monkeypatch):
+    """MemoryStore with direct appends (no writer thread) over mem_paths."""
+    import memory_store
+    monkeypatch.setattr(memory_store, "WRITE_BEHIND", False)
+    s = memory_store.MemoryStore()
+    yield s
+    s.flush()
@@ -0,0 +1,81 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import client_ollama
+from client_ollama import OllamaClient, client_for
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"                     # keep-alive
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _answer(self):
+        n = self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        status = 503 if self.path == "/flaky" and n == 1 or self.path == "/down" else 200
+        body = json.dumps({"path": self.path, "n": n}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _answer
+
+    def log_message(self, *a):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.connections, srv.hits = 0, {}
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield srv, f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_connections_are_kept_alive_and_reused(server):
+    srv, base = server
+    cli = OllamaClient(base)
+    for i in range(10):
+        assert cli.get("/api/version").json()["n"] == i + 1
+    cli.post("/api/generate", json={"model": "m"}).json()
+    st = cli.stats()
+    assert srv.connections == 1
+    assert st["requests"] == 11 and st["errors"] == 0
+    assert st["connections_opened"] == 1 and st["connections_reused"] == 10
+    assert st["paths"]["/api/version"]["n"] == 10
+
+
+def test_gets_retry_a_503_but_posts_do_not(server):
+    srv, base = server
+    cli = OllamaClient(base, backoff=0)
+    assert cli.get("/flaky").status_code == 200
+    assert srv.hits["/flaky"] == 2
+    assert cli.post("/down").status_code == 503
+    assert srv.hits["/down"] == 1                     # a POST may have started a generation
+
+
+def test_connect_errors_are_counted(server):
+    srv, base = server
+    srv.shutdown()
+    srv.server_close()
+    cli = OllamaClient(base, retries=0, timeout=(0.5, 0.5))
+    with pytest.raises(Exception):
+        cli.get("/api/version")
+    assert cli.stats()["errors"] == 1
+
+
+def test_client_for_shares_one_client_per_base(monkeypatch):
+    monkeypatch.setattr(client_ollama, "_clients", {})
+    a = client_for("http://127.0.0.1:9/")
+    assert client_for("http://127.0.0.1:9") is a
+    assert client_for("http://127.0.0.1:10") is not a
+    assert set(client_ollama.client_stats()) == {"http://127.0.0.1:9", "http://127.0.0.1:10"}
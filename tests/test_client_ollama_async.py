@@ -0,0 +1,76 @@
+import asyncio
+import client_ollama_async
+from client_ollama_async import AsyncOllamaClient
+
+
+def _track_writers(monkeypatch):
+    """Keep every StreamWriter the client opens (strong refs: a leak cannot be rescued by GC)."""
+    writers = []
+    real = asyncio.open_connection
+
+    async def open_connection(*a, **kw):
+        reader, writer = await real(*a, **kw)
+        writers.append(writer)
+        return reader, writer
+
+    monkeypatch.setattr(client_ollama_async.asyncio, "open_connection", open_connection)
+    return writers
+
+
+async def _silent_server(closed):
+    """Reads the request head and never answers (Ollama before prompt eval is done)."""
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        await reader.read()                           # EOF once the client disconnects
+        closed.set()
+        writer.close()
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def test_cancel_before_headers_closes_socket(monkeypatch):
+    writers = _track_writers(monkeypatch)
+
+    async def run():
+        closed = asyncio.Event()
+        server = await _silent_server(closed)
+        cli = AsyncOllamaClient(f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+
+        async def consume():
+            async for _ in cli.stream_text("m", [{"role": "user", "content": "hi"}]):
+                pass
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.2)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.wait_for(closed.wait(), 2)
+        assert cli.stats["inflight"] == 0
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(run())
+    assert writers and all(w.is_closing() for w in writers)
+
+
+def test_read_timeout_before_headers_closes_socket(monkeypatch):
+    writers = _track_writers(monkeypatch)
+
+    async def run():
+        closed = asyncio.Event()
+        server = await _silent_server(closed)
+        cli = AsyncOllamaClient(f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}", read_timeout=0.2)
+        try:
+            await cli.tags()
+        except asyncio.TimeoutError:
+            pass
+        else:
+            raise AssertionError("expected a read timeout")
+        await asyncio.wait_for(closed.wait(), 2)
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(run())
+    assert writers and all(w.is_closing() for w in writers)
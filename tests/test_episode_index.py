@@ -0,0 +1,80 @@
+import json
+import random
+import pytest
+from episode_index import EpisodeIndex, query_terms
+
+WORDS = (["the", "and", "you", "jenny", "garden", "gardening", "plan", "planning", "workout",
+          "tomato", "tomatoes", "memory", "remember", "vow", "milestone", "leg", "day", "warm"] +
+         [f"w{i}x" for i in range(300)])
+
+
+def _corpus(n, seed=7):
+    rng = random.Random(seed)
+    weights = [50, 30, 25, 12, 8, 4, 6, 3, 5, 4, 2, 3, 3, 1, 1, 2, 2, 2] + [0.2] * 300
+    recs = []
+    for i in range(n):
+        words = rng.choices(WORDS, weights, k=rng.randint(1, 14))
+        recs.append({"ts": 1_700_000_000 + i, "text": " ".join(words).capitalize(),
+                     "tags": rng.choice([["turn", "user"], ["turn", "assistant"], ["remember"]]),
+                     "importance": rng.choice([1, 2, 2, 3, 4, 5])})
+    return recs
+
+
+def _full_scan(recs, query, k, require_tags=None):
+    """The retrieve() scoring before the index: str.count per term over every record, stable sort."""
+    q = query_terms(query)
+    chosen = []
+    for i, rec in enumerate(recs):
+        if require_tags and not set(require_tags) & set(rec.get("tags", [])):
+            continue
+        score = sum(rec["text"].lower().count(t) for t in q) + 0.15 * rec.get("importance", 3)
+        if score > 0:
+            chosen.append((score, i))
+    chosen.sort(key=lambda x: x[0], reverse=True)
+    return chosen[:k]
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    monkeypatch.setattr(EpisodeIndex, "SAVE_INTERVAL", 0)
+    monkeypatch.setattr(EpisodeIndex, "IMPACT_MIN", 40)       # most query terms take the bucket path
+    recs = _corpus(3000)
+    src = tmp_path / "episodes.jsonl"
+    src.write_text("".join(json.dumps(r) + "\n" for r in recs), encoding="utf-8")
+    return recs, EpisodeIndex(src, tmp_path / "episodes.idx.json")
+
+
+QUERIES = ["the", "and the you", "garden", "gardening plan", "tomato tomatoes", "the the jenny",
+           "remember the vow", "leg day warm up", "w17x the", "w1", "arden", "lan", "nothing here",
+           "Jenny, what's the PLAN for leg day?"]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_full_scan(corpus, query):
+    recs, idx = corpus
+    for k in (1, 4, 10):
+        assert idx.search(query, k=k) == _full_scan(recs, query, k)
+        assert idx.search(query, k=k, require_tags=["remember"]) == \
+            _full_scan(recs, query, k, require_tags=["remember"])
+
+
+def test_search_prunes_common_terms_and_stays_exact_after_appends(corpus):
+    recs, idx = corpus
+    for query in QUERIES:
+        idx.search(query, k=4)
+    assert idx.pruned and idx.walked            # both long-list paths were taken
+    more = _corpus(500, seed=11)
+    with open(idx.source, "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(r) + "\n" for r in more))
+    for query in QUERIES:
+        assert idx.search(query, k=4) == _full_scan(recs + more, query, 4)
+
+
+def test_bm25_pruning_keeps_the_exhaustive_ranking(corpus, tmp_path):
+    recs, idx = corpus
+    full = EpisodeIndex(idx.source, tmp_path / "full.idx.json")
+    full.IMPACT_MIN = 1 << 30
+    for query in QUERIES:
+        got, want = idx.search(query, k=6, scoring="bm25"), full.search(query, k=6, scoring="bm25")
+        assert [d for _, d in got] == [d for _, d in want]
+        assert [s for s, _ in got] == pytest.approx([s for s, _ in want])
@@ -0,0 +1,111 @@
+import json
+import pytest
+import episode_log
+
+JAN, FEB, MAR = 1_704_153_600, 1_706_832_000, 1_709_337_600      # 2024-01-02 / 02-02 / 03-02 UTC
+
+
+def _write(path, recs):
+    with open(path, "a", encoding="utf-8") as f:
+        for r in recs:
+            f.write(json.dumps(r) + "\n")
+
+
+def _turn(ts, text):
+    return {"ts": ts, "text": f"user: {text}", "tags": ["turn", "user"], "importance": 2}
+
+
+def _live(mem_paths):
+    return mem_paths / "episodes.jsonl"
+
+
+def _texts(recs):
+    return [r["text"] for r in recs]
+
+
+def test_dedupe_folds_copies_but_never_turns():
+    recs = [_turn(10, "buy milk"),
+            {"ts": 11, "text": "buy milk", "tags": ["remember"], "importance": 5},
+            _turn(12, "buy milk"),
+            {"ts": 13, "text": "note", "tags": ["milestone"]},
+            {"ts": 14, "text": "note", "tags": ["x"], "importance": 4}]
+    out = episode_log.dedupe(recs)
+    assert _texts(out) == ["user: buy milk", "user: buy milk", "note"]
+    assert out[0]["importance"] == 5 and out[0]["tags"] == ["turn", "user", "remember"]
+    assert out[1]["importance"] == 2                     # the copy folds into the turn before it
+    assert out[2]["tags"] == ["milestone", "x"] and out[2]["seen"] == 2 and out[2]["ts_last"] == 14
+
+
+def test_compact_rotates_into_buckets_and_keeps_newest(mem_paths):
+    live = _live(mem_paths)
+    _write(live, [_turn(JAN, "a"), {"ts": JAN + 1, "text": "a", "tags": ["remember"]},
+                  _turn(FEB, "b"), _turn(MAR, "c"), _turn(MAR + 1, "d")])
+    st = episode_log.compact(live, keep=2, force=True)
+    assert st["moved"] == 3 and st["merged"] == 1 and st["live"] == 2 and st["segments"] == 2
+    man = episode_log.read_manifest()
+    assert [s["bucket"] for s in man["segments"]] == ["2024-01", "2024-02"]
+    assert [s["count"] for s in man["segments"]] == [1, 1]
+    assert _texts(json.loads(ln) for ln in live.read_text().splitlines()) == ["user: c", "user: d"]
+    assert _texts(episode_log.records_between(live=live)) == ["user: a", "user: b", "user: c", "user: d"]
+    assert not episode_log.CUT_FILE.exists()
+
+
+def test_compact_rewrites_only_touched_buckets(mem_paths):
+    live = _live(mem_paths)
+    _write(live, [_turn(JAN, "a"), _turn(FEB, "b")])
+    episode_log.compact(live, keep=0, force=True)
+    before = {s["bucket"]: s["file"] for s in episode_log.read_manifest()["segments"]}
+
+    _write(live, [{"ts": FEB + 5, "text": "b", "tags": ["remember"], "importance": 5}, _turn(MAR, "c")])
+    st = episode_log.compact(live, keep=1, force=True)
+    assert st["rewritten"] == 1 and st["merged"] == 1
+    after = {s["bucket"]: s["file"] for s in episode_log.read_manifest()["segments"]}
+    assert after["2024-01"] == before["2024-01"]          # untouched: same file, not re-read
+    assert after["2024-02"] != before["2024-02"]
+    feb = episode_log.read_segment(episode_log.read_manifest()["segments"][1])
+    assert _texts(feb) == ["user: b"] and feb[0]["importance"] == 5
+
+
+def test_index_rebuilds_after_compaction(store, mem_paths):
+    live = _live(mem_paths)
+    _write(live, [_turn(JAN + i, f"garden {i}") for i in range(6)] + [_turn(MAR, "jazz")])
+    garden = [f"user: garden {i}" for i in range(6)]
+    assert sorted(_texts(store.index.records([d for _, d in store.index.search("garden", 6)]))) == garden
+    episode_log.compact(live, keep=1, force=True)
+    assert sorted(_texts(store.index.records([d for _, d in store.index.search("garden", 6)]))) == garden
+    assert len(store.index.offsets) == 7 and len(store.index.segs) == 1     # rebuilt: segment + live
+    assert store.retrieve("jazz", max_items=2).splitlines()[0] == "- user: jazz"
+
+
+def test_crash_after_manifest_is_replayed_on_startup(mem_paths, monkeypatch):
+    live = _live(mem_paths)
+    _write(live, [_turn(JAN, "a"), _turn(FEB, "b"), _turn(MAR, "c")])
+
+    def crash(*a):
+        raise OSError("power cut")
+    with monkeypatch.context() as m:
+        m.setattr(episode_log, "_cut_live", crash)
+        with pytest.raises(OSError):
+            episode_log.compact(live, keep=1, force=True)
+    assert episode_log.CUT_FILE.exists()
+    _write(live, [_turn(MAR + 9, "d")])                   # appended after the crash
+
+    episode_log.recover(live)
+    assert not episode_log.CUT_FILE.exists()
+    assert _texts(episode_log.records_between(live=live)) == ["user: a", "user: b", "user: c", "user: d"]
+
+
+def test_marker_without_manifest_is_discarded(mem_paths, monkeypatch):
+    live = _live(mem_paths)
+    _write(live, [_turn(JAN, "a"), _turn(FEB, "b")])
+
+    def crash(*a, **kw):
+        raise OSError("power cut")
+    with monkeypatch.context() as m:
+        m.setattr(episode_log.FILES, "write_json", crash)
+        with pytest.raises(OSError):
+            episode_log.compact(live, keep=0, force=True)
+    episode_log.recover(live)
+    assert not episode_log.CUT_FILE.exists()
+    assert len(live.read_text().splitlines()) == 2       # live file untouched, nothing lost
+    assert _texts(episode_log.records_between(live=live)) == ["user: a", "user: b"]
@@ -0,0 +1,98 @@
+import json
+import pathlib
+import importlib.util
+import pytest
+from flask import Flask
+from scheduler import SCHED, Busy
+from session_store import SessionManager, SQLiteSessionStore
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+_mod = None
+
+
+def _gui():
+    """gui_app.safe.py as a module (the file name is not importable); routes only, no app."""
+    global _mod
+    if _mod is None:
+        spec = importlib.util.spec_from_file_location("jenny_gui_under_test", ROOT / "gui_app.safe.py")
+        _mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_mod)
+    return _mod
+
+
+@pytest.fixture
+def gui(tmp_path, monkeypatch):
+    mod = _gui()
+    monkeypatch.setattr(mod, "cached_reply", lambda text, state: None)
+    app = Flask(__name__)
+    app.config["SESSIONS"] = SessionManager(SQLiteSessionStore(tmp_path / "sessions.db"), write_through=True)
+    app.register_blueprint(mod.BP)
+    return mod, app.test_client()
+
+
+H = {"X-Session-Id": "s" * 32}
+
+
+def _events(body):
+    out = []
+    for block in body.decode("utf-8").split("\n\n"):
+        if block.strip():
+            ev, data = block.split("\n", 1)
+            out.append((ev[len("event: "):], json.loads(data[len("data: "):])))
+    return out
+
+
+def test_stream_relays_deltas_then_done(gui, monkeypatch):
+    mod, client = gui
+    seen = {}
+
+    def fake_stream(text, state, slot, cache, key=None):
+        seen.update(slot=slot, key=key)
+        yield "Hel"
+        yield "lo!"                                             # slot left to the response
+    monkeypatch.setattr(mod, "ask_stream", fake_stream)
+    r = client.post("/api/chat/stream", json={"text": "hi there"}, headers=H)
+    assert r.status_code == 200 and r.mimetype == "text/event-stream"
+    assert r.headers["Cache-Control"] == "no-cache"
+    body = r.data
+    r.close()                                                   # what the WSGI server does
+    assert _events(body) == [("delta", {"delta": "Hel"}), ("delta", {"delta": "lo!"}),
+                               ("done", {"reply": "Hello!"})]
+    assert seen["slot"] is not None and seen["key"] == H["X-Session-Id"]
+    assert SCHED.stats()["inflight"] == 0                       # slot released with the response
+
+    r = client.post("/api/chat/stream", json={"text": "Hello!"}, headers=H)   # echo of the reply
+    assert _events(r.data) == [("done", {"reply": ""})]
+
+
+def test_stream_reports_errors_in_band(gui, monkeypatch):
+    mod, client = gui
+
+    def failing(text, state, slot, cache, key=None):
+        with slot:
+            yield "partial"
+            raise RuntimeError("upstream closed")
+    monkeypatch.setattr(mod, "ask_stream", failing)
+    ev = _events(client.post("/api/chat/stream", json={"text": "go"}, headers=H).data)
+    assert ev == [("delta", {"delta": "partial"}), ("error", {"error": "upstream closed"}),
+                  ("done", {"reply": "partial"})]
+    assert SCHED.stats()["inflight"] == 0
+
+
+def test_stream_sheds_load_before_headers(gui, monkeypatch):
+    mod, client = gui
+
+    def busy(key):
+        raise Busy("queue full", retry_after=3)
+    monkeypatch.setattr(mod.SCHED, "acquire", busy)
+    r = client.post("/api/chat/stream", json={"text": "anyone?"}, headers=H)
+    assert r.status_code == 503 and r.headers["Retry-After"] == "3"
+    assert r.get_json()["busy"] is True
+    monkeypatch.undo()
+    monkeypatch.setattr(mod, "cached_reply", lambda text, state: None)
+    monkeypatch.setattr(mod, "ask_stream", lambda *a, **kw: iter(["ok"]))
+    r = client.post("/api/chat/stream", json={"text": "anyone?"}, headers=H)
+    body = r.data
+    r.close()
+    assert _events(body)[-1] == ("done", {"reply": "ok"})      # the in-flight fence was cleared
+    assert SCHED.stats()["inflight"] == 0
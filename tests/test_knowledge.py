@@ -0,0 +1,102 @@
+import os
+import json
+import zipfile
+import pytest
+import knowledge
+from knowledge import KnowledgeStore
+
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch):
+    src, kdir = tmp_path / "files", tmp_path / "knowledge"
+    src.mkdir()
+    monkeypatch.setattr(knowledge, "KB_DIR", kdir)
+    monkeypatch.setattr(knowledge, "VECTORS", False)
+    monkeypatch.setattr(knowledge, "ENABLED", True)
+    monkeypatch.setattr(knowledge, "MIN_SCORE", 0.0)
+    return KnowledgeStore(kdir / "knowledge.db", kdir / "index.json", src), src
+
+
+def _docx(path, *paras):
+    w = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    body = "".join(f"<w:p><w:r><w:t>{p}</w:t></w:r></w:p>" for p in paras)
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("word/document.xml", f'<w:document xmlns:w="{w}"><w:body>{body}</w:body></w:document>')
+
+
+def test_ingest_is_incremental(kb):
+    store, src = kb
+    (src / "legs.md").write_text("Leg day: squats, lunges and a long warm up.\n")
+    (src / "meals.txt").write_text("Breakfast oats with berries.\n")
+    _docx(src / "supps.docx", "Creatine five grams daily.", "Magnesium at night.")
+    (src / "notes.xyz").write_text("not indexed")
+    st = store.ingest(workers=1)
+    assert (st["scanned"], st["indexed"], st["failed"]) == (3, 3, 0)
+    assert [i["path"] for i in json.loads(store.manifest.read_text())] == ["./legs.md", "./meals.txt", "./supps.docx"]
+    v1 = store.version()
+
+    st = store.ingest(workers=1)                            # nothing changed: no reads, no manifest write
+    assert st["unchanged"] == 3 and st["indexed"] == 0 and store.version() == v1
+
+    p = src / "meals.txt"
+    os.utime(p, ns=(p.stat().st_atime_ns, p.stat().st_mtime_ns + 10**9))
+    assert store.ingest(workers=1)["unchanged"] == 3        # touched, same bytes: sha256 says unchanged
+
+    p.write_text("Dinner salmon with rice.\n")
+    (src / "legs.md").unlink()
+    st = store.ingest(workers=1)
+    assert st["indexed"] == 1 and st["removed"] == 1 and st["unchanged"] == 1
+    assert store.stats()["files"] == 2 and store.version() != v1
+
+
+def test_search_and_block(kb):
+    store, src = kb
+    (src / "legs.md").write_text("Leg day: squats, lunges and a long warm up.\n")
+    (src / "meals.txt").write_text("Breakfast oats with berries.\n")
+    _docx(src / "supps.docx", "Creatine five grams daily.")
+    store.ingest(workers=1)
+    hits = store.search("what is my leg day warm up?")
+    assert hits and hits[0]["path"] == "legs.md" and hits[0]["seq"] == 0
+    assert store.search("creatine")[0]["path"] == "supps.docx"
+    assert store.search("hello jenny") == []                 # stop words only
+    block = store.block("squats")
+    assert block.startswith("### KNOWLEDGE\n[legs.md #1]\n") and "oats" not in block
+
+
+def test_chunks_overlap_and_respect_the_size():
+    text = "\n".join(f"line {i} " + "word " * 20 for i in range(40))
+    chunks = knowledge.chunk_text(text, size=300, overlap=60)
+    assert len(chunks) > 5 and all(len(c) <= 300 + 60 for c in chunks)
+    for a, b in zip(chunks, chunks[1:]):
+        assert b.startswith(knowledge._tail(a, 60) + "\n")   # each chunk repeats the previous tail
+
+
+def _para(topic, n):
+    return "\n".join(f"{topic} paragraph {i}: " + f"{topic} filler text here " * 6 for i in range(n))
+
+
+@pytest.mark.parametrize("budget", [80, 200, 400])
+def test_pack_chunks_stays_within_the_budget(budget):
+    sources = [("notes.txt", _para("garden", 12)), ("page: recipes", _para("soup", 12))]
+    text, rep = knowledge.pack_chunks(sources, "soup recipes", budget, size=200)
+    assert rep["used"] <= budget
+    assert knowledge.count_tokens(text) <= budget
+    assert rep["tokens"] == sum(s["tokens"] for s in rep["sources"])
+    assert rep["dropped_tokens"] == rep["tokens"] - sum(s["kept_tokens"] for s in rep["sources"])
+    assert rep["kept"] == sum(s["kept"] for s in rep["sources"]) and rep["dropped_tokens"] > 0
+    garden, soup = rep["sources"]
+    assert soup["kept"] > 0 and (garden["kept"] == 0 or soup["kept"] == soup["chunks"])   # query-relevant first
+
+
+def test_pack_chunks_keeps_document_order_and_marks_gaps():
+    body = "\n".join(f"part {i} " + ("soup " if i in (1, 4) else "") + "x " * 60 for i in range(6))
+    text, rep = knowledge.pack_chunks([("doc", body)], "soup", 90, size=150)
+    assert rep["sources"][0]["kept"] == 2
+    assert text.startswith("### doc (parts 2, 5 of 6)\n")
+    assert text.index("part 1 ") < text.index("[…]") < text.index("part 4 ")
+
+
+def test_pack_chunks_keeps_everything_that_fits():
+    text, rep = knowledge.pack_chunks([("a", "short note"), ("b", "")], "note", 1000)
+    assert text == "### a\nshort note" and rep["dropped_tokens"] == 0
+    assert rep["sources"][1] == {"label": "b", "chunks": 0, "kept": 0, "tokens": 0, "kept_tokens": 0}
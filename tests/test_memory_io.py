@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+import pytest
+from memory_io import EpisodeWriter, FileCache, try_lock
+
+
+def test_writer_backpressure_does_not_deadlock(tmp_path):
+    """Many producers overfilling a small queue, each holding an outer lock in on_queued."""
+    path = tmp_path / "episodes.jsonl"
+    w = EpisodeWriter(str(path), interval=0.001, max_pending=4)
+    store_lock = threading.RLock()
+    ring = []
+
+    def queued(start):
+        with store_lock:
+            ring.append(start)
+
+    def producer(i):
+        for j in range(200):
+            w.append(f'{{"t": "{i}-{j}"}}\n'.encode(), {"t": f"{i}-{j}"}, on_queued=queued)
+
+    threads = [threading.Thread(target=producer, args=(i,), daemon=True) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=30)
+    assert not any(t.is_alive() for t in threads), "writer deadlocked"
+    w.close()
+    assert len(path.read_bytes().splitlines()) == 1600
+    assert len(ring) == 1600
+
+
+def test_writer_full_queue_with_failing_disk_raises(tmp_path):
+    w = EpisodeWriter(str(tmp_path / "missing" / "episodes.jsonl"), interval=0.001,
+                      max_pending=2, block_timeout=0.5)
+    try:
+        w.append(b"{}\n", {})
+        w.append(b"{}\n", {})
+        with pytest.raises(OSError):
+            w.append(b"{}\n", {})
+        assert 0 < w.stats["errors"] < 15          # retries back off instead of spinning
+    finally:
+        w.close()
+
+
+def test_writer_recovers_after_failures(tmp_path):
+    path = tmp_path / "late" / "episodes.jsonl"
+    w = EpisodeWriter(str(path), interval=0.001)
+    try:
+        w.append(b'{"a": 1}\n', {"a": 1})
+        time.sleep(0.05)
+        assert w.stats["errors"] > 0
+        path.parent.mkdir()
+        deadline = time.monotonic() + 5
+        while w.stats["records"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert path.read_bytes() == b'{"a": 1}\n'
+        assert w._failures == 0
+    finally:
+        w.close()
+
+
+def test_try_lock_elects_one_holder(tmp_path):
+    first = try_lock(tmp_path / "background")
+    assert first is not None
+    try:
+        assert try_lock(tmp_path / "background") is None
+    finally:
+        first.close()
+    again = try_lock(tmp_path / "background")
+    assert again is not None
+    again.close()
+
+
+def _expected_tail(data, n):
+    return [ln.strip() for ln in data.split(b"\n") if ln.strip()][-n:] if n > 0 else []
+
+
+TAIL_CASES = [
+    b"",
+    b"one",
+    b"one\ntwo\nthree\n",
+    b"one\ntwo\nthree",                                  # no trailing newline
+    b"\n\none\n\n\ntwo\n\n\n",                           # blank lines everywhere
+    b"\r\n".join(b"crlf %d" % i for i in range(40)) + b"\r\n",
+    b"\n".join(b"x" * (i * 37 % 90 + 1) for i in range(200)) + b"\n",
+    b"short\n" + b"y" * 5000 + b"\nlast\n",             # a line longer than several chunks
+]
+
+
+@pytest.mark.parametrize("data", TAIL_CASES)
+@pytest.mark.parametrize("path_kind", ["mmap", "seek"])
+def test_tail_lines_matches_a_full_read(tmp_path, monkeypatch, data, path_kind):
+    import memory_io
+    if path_kind == "seek":
+        def no_mmap(*a, **kw):
+            raise ValueError("mmap unavailable")
+        monkeypatch.setattr(memory_io.mmap, "mmap", no_mmap)
+        monkeypatch.setattr(memory_io, "TAIL_CHUNK", 64)  # many chunk boundaries
+    p = tmp_path / "episodes.jsonl"
+    p.write_bytes(data)
+    for n in (0, 1, 2, 3, 7, 50, 500):
+        assert memory_io.tail_lines(p, n) == _expected_tail(data, n), n
+
+
+def test_tail_lines_missing_file(tmp_path):
+    import memory_io
+    assert memory_io.tail_lines(tmp_path / "nope.jsonl", 5) == []
+
+
+def _edit(p, text, bump):
+    """Rewrite p behind the cache's back; bump mtime so same-size edits are visible too."""
+    st = p.stat()
+    p.write_text(text)
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + bump))
+
+
+def test_file_cache_picks_up_external_edits(tmp_path):
+    fc = FileCache()
+    p = tmp_path / "profile.json"
+    p.write_text('{"name": "a"}')
+    assert fc.read_json(p) == {"name": "a"}
+    assert fc.read_json(p) == {"name": "a"}
+    assert fc.stats == {"hits": 1, "misses": 1}
+
+    _edit(p, '{"name": "b"}', 10_000_000)               # same size, newer mtime
+    assert fc.read_json(p) == {"name": "b"}
+    _edit(p, '{"name": "bb"}', 20_000_000)
+    assert fc.read_text(p) == '{"name": "bb"}'
+    assert fc.stats["misses"] == 3
+
+
+def test_file_cache_json_copies_and_write_through(tmp_path):
+    fc = FileCache()
+    p = tmp_path / "profile.json"
+    fc.write_json(p, {"facts": ["x"]})
+    got = fc.read_json(p)
+    got["facts"].append("mutated")                      # callers get a private copy
+    assert fc.read_json(p) == {"facts": ["x"]}
+    assert fc.stats["misses"] == 0                      # served from the write, no re-read
+    assert fc.read_json(tmp_path / "missing.json", default={"d": 1}) == {"d": 1}
+    with pytest.raises(FileNotFoundError):
+        fc.read_text(tmp_path / "missing.txt")
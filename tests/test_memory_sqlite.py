@@ -0,0 +1,39 @@
+import json
+import sqlite3
+import threading
+import memory_sqlite
+
+
+def test_concurrent_migrate_imports_once(mem_paths):
+    episodes = mem_paths / "episodes.jsonl"
+    profile = mem_paths / "profile.json"
+    profile.write_text('{"tone": "warm"}', encoding="utf-8")
+    with open(episodes, "w", encoding="utf-8") as f:
+        for i in range(500):
+            f.write(json.dumps({"ts": 1_700_000_000 + i, "text": f"episode {i}", "tags": ["turn"]}) + "\n")
+    db_path = mem_paths / "memory.db"
+    start = threading.Barrier(6)
+    counts = []
+
+    def worker():
+        start.wait()
+        counts.append(memory_sqlite.migrate(db_path, episodes, profile))
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(counts) == [0] * 5 + [500]
+    db = sqlite3.connect(db_path)
+    assert db.execute("SELECT COUNT(*) FROM episodes").fetchone()[0] == 500
+    db.close()
+
+
+def test_sqlite_store_skips_jsonl_setup(mem_paths):
+    memory_sqlite.migrate(mem_paths / "memory.db", mem_paths / "episodes.jsonl", mem_paths / "profile.json")
+    store = memory_sqlite.SQLiteMemoryStore(db_path=mem_paths / "memory.db")
+    assert store.index is None and store.semantic is None
+    store.add_episode("user: hello there", tags=["turn", "user"])
+    assert "hello there" in store.recent_block(n=1)
+    assert "hello there" in store.retrieve("hello")
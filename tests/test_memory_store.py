@@ -0,0 +1,79 @@
+import json
+import episode_log
+import vector_index
+from vector_index import SemanticRecall, VectorStore
+
+
+def _letters(texts):
+    """Offline embedder: letter histogram (similar words -> similar vectors)."""
+    out = []
+    for t in texts:
+        v = [0.0] * 26
+        for ch in t.lower():
+            if "a" <= ch <= "z":
+                v[ord(ch) - 97] += 1
+        out.append(v)
+    return out
+
+
+def _write(path, recs):
+    with open(path, "a", encoding="utf-8") as f:
+        for r in recs:
+            f.write(json.dumps(r) + "\n")
+
+
+def test_retrieve_after_compaction_ignores_stale_vector_rows(store, mem_paths, monkeypatch):
+    monkeypatch.setattr(vector_index, "_embedder", _letters)
+    store.semantic = SemanticRecall(store, VectorStore(mem_paths / "v.f32", mem_paths / "v.json"))
+    old = 1_600_000_000
+    recs = []
+    for i in range(10):
+        recs.append({"ts": old + i, "text": f"user: garden note {i} tomatoes", "tags": ["turn", "user"],
+                     "importance": 2})
+        recs.append({"ts": old + i, "text": f"garden note {i} tomatoes", "tags": ["remember"],
+                     "importance": 4})                 # folds into its turn on compaction
+    for i in range(4):
+        recs.append({"ts": old + 20 + i, "text": f"user: jazz quiz {i}", "tags": ["turn", "user"],
+                     "importance": 2})
+    _write(mem_paths / "episodes.jsonl", recs)
+    assert store.semantic.catch_up() == 24
+
+    episode_log.compact(mem_paths / "episodes.jsonl", keep=2, force=True)
+    assert store.semantic.vs.count == 24               # rows still follow the old numbering
+
+    got = store.retrieve("jazz quiz", max_items=4).splitlines()
+    assert sorted(got) == [f"- user: jazz quiz {i}" for i in range(4)]
+    assert len(store.index.offsets) == 14
+
+    store.semantic.catch_up()                          # re-embedded under the new numbering
+    assert store.semantic.vs.count == 14
+    assert sorted(store.retrieve("jazz quiz", max_items=4).splitlines()) == got
+
+
+def test_related_block_rebuilds_when_vectors_catch_up(store, mem_paths, monkeypatch):
+    monkeypatch.setattr(vector_index, "_embedder", _letters)
+    store.semantic = SemanticRecall(store, VectorStore(mem_paths / "v.f32", mem_paths / "v.json"))
+    _write(mem_paths / "episodes.jsonl", [{"ts": 1, "text": "user: jazz quiz", "tags": ["turn"], "importance": 1}]
+           + [{"ts": 2 + i, "text": f"user: garden note {i}", "tags": ["turn"], "importance": 5} for i in range(6)])
+    deps = ("episodes", "vectors")
+    first = store.blocks.get("related", deps, store.related_block, "zuiq zajz")
+    assert store.blocks.get("related", deps, store.related_block, "zuiq zajz") == first
+    misses = store.blocks.stats()["misses"]
+
+    store.semantic.catch_up()                          # episodes file unchanged, new vector rows
+    again = store.blocks.get("related", deps, store.related_block, "zuiq zajz")
+    assert store.blocks.stats()["misses"] == misses + 1
+    assert "jazz quiz" not in first and "jazz quiz" in again
+
+
+def test_get_profile_sees_an_edit_made_by_hand(store, mem_paths):
+    import os, memory_store
+    p = memory_store.PROFILE_JSON
+    store.set_profile(name="Magdy")
+    assert store.get_profile()["name"] == "Magdy"
+    prof = json.loads(p.read_text(encoding="utf-8"))
+    prof["name"] = "Magda"                              # same size: only the mtime moves
+    st = p.stat()
+    p.write_text(json.dumps(prof), encoding="utf-8")
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+    assert store.get_profile()["name"] == "Magda"
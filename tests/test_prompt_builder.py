@@ -0,0 +1,89 @@
+import json
+import pytest
+import memory_store
+import prompt_builder
+
+
+class _KB:
+    """Knowledge store stand-in: one chunk per query, versioned by hand."""
+    def __init__(self):
+        self.ver, self.calls = 1, 0
+
+    def version(self):
+        return self.ver
+
+    def block(self, query):
+        self.calls += 1
+        return f"### KNOWLEDGE\n- about {query} (v{self.ver})\n"
+
+
+@pytest.fixture
+def pb(store, mem_paths, monkeypatch):
+    kb = _KB()
+    monkeypatch.setattr(prompt_builder, "MEM", store)
+    monkeypatch.setattr(prompt_builder, "KB", kb)
+    monkeypatch.setattr(memory_store, "KB", kb)
+    store.set_profile(identity="Jenny", bond="partner")
+    for i in range(3):
+        store.add_episode(f"user: garden note {i}", tags=["turn"], importance=3)
+    return store, kb
+
+
+def test_stable_part_is_byte_identical_across_turns(pb):
+    store, kb = pb
+    s1, v1 = prompt_builder.build_prompt_parts(related_query="garden")
+    store.add_episode("user: jazz tonight", tags=["turn"])
+    s2, v2 = prompt_builder.build_prompt_parts(related_query="jazz")
+    assert s1 == s2                                     # turn-to-turn data stays out of the prefix
+    assert s1.startswith("### ROLE") and "### STYLE" in s1
+    assert "RECENT EPISODES" not in s1 and "RELATED EPISODES" not in s1 and "KNOWLEDGE" not in s1
+    assert "jazz tonight" in v2 and "jazz tonight" not in v1
+    assert v2.index("RECENT EPISODES") < v2.index("RELATED EPISODES") < v2.index("KNOWLEDGE")
+    assert prompt_builder.build_system_prompt(related_query="jazz") == f"{s2}\n\n{v2}"
+
+
+def test_blocks_are_memoized_on_their_data_versions(pb):
+    store, kb = pb
+    store.blocks.clear()
+    prompt_builder.build_prompt_parts(related_query="garden")
+    first = store.blocks.stats()["blocks"]
+    assert all(b == {"hits": 0, "misses": 1} for b in first.values())
+
+    prompt_builder.build_prompt_parts(related_query="garden")
+    blocks = store.blocks.stats()["blocks"]
+    assert all(b["misses"] == 1 and b["hits"] == 1 for b in blocks.values())
+    assert kb.calls == 1
+
+    store.add_episode("user: new turn", tags=["turn"])  # only episode-based blocks rebuild
+    prompt_builder.build_prompt_parts(related_query="garden")
+    blocks = store.blocks.stats()["blocks"]
+    assert blocks["recent"]["misses"] == 2 and blocks["related"]["misses"] == 2
+    assert blocks["core"]["misses"] == 1 and blocks["knowledge"]["misses"] == 1
+
+    kb.ver += 1                                         # knowledge re-indexed
+    store.set_profile(bond="partner, co-pilot")         # profile edited
+    _, v = prompt_builder.build_prompt_parts(related_query="garden")
+    blocks = store.blocks.stats()["blocks"]
+    assert blocks["knowledge"]["misses"] == 2 and "(v2)" in v
+    assert blocks["core"]["misses"] == 2 and blocks["facts"]["misses"] == 2
+
+
+def test_a_new_query_misses_only_the_query_blocks(pb):
+    store, kb = pb
+    store.blocks.clear()
+    prompt_builder.build_prompt_parts(related_query="garden")
+    before = store.blocks.stats()["blocks"]
+    prompt_builder.build_prompt_parts(related_query="weather")
+    after = store.blocks.stats()["blocks"]
+    changed = {n for n in after if after[n]["misses"] != before[n]["misses"]}
+    assert changed == {"related", "knowledge"}
+    assert store.blocks.stats()["entries"] == len(before) + 2
+
+
+def test_profile_edit_reaches_the_stable_prefix(pb, mem_paths):
+    store, _ = pb
+    s1, _ = prompt_builder.build_prompt_parts()
+    prof = json.loads(memory_store.PROFILE_JSON.read_text(encoding="utf-8"))
+    store.set_profile(identity=prof["identity"] + " Prime")
+    s2, _ = prompt_builder.build_prompt_parts()
+    assert s1 != s2 and "Jenny Prime" in s2
@@ -0,0 +1,92 @@
+import time
+import pytest
+import residency
+from residency import ResidencyManager, keep_alive_seconds
+
+GB = 1024 ** 3
+MODELS = ["jenny:latest", "jenny-lite:latest", "jenny-fast:latest", "jenny-big:latest"]
+SIZES = {"jenny:latest": 5 * GB, "jenny-lite:latest": 2 * GB, "jenny-fast:latest": 1 * GB,
+         "jenny-big:latest": 9 * GB}
+
+
+class _Resp:
+    def __init__(self, body):
+        self.body, self.content = body, b"{}"
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+class _Ollama:
+    """tags / ps / generate stand-in; records pre-loads and unloads."""
+    def __init__(self, loaded=()):
+        self.loaded, self.posts = set(loaded), []
+
+    def tags(self, timeout=None):
+        return _Resp({"models": [{"name": m, "size": s} for m, s in SIZES.items()]})
+
+    def get(self, path, timeout=None):
+        return _Resp({"models": [{"name": m} for m in self.loaded]})
+
+    def post(self, path, json=None, timeout=None):
+        self.posts.append((json["model"], json["keep_alive"]))
+        (self.loaded.discard if json["keep_alive"] == 0 else self.loaded.add)(json["model"])
+        return _Resp({"load_duration": 1.5e9})
+
+
+def _mgr(budget_gb, client=None):
+    res = ResidencyManager(client or _Ollama(), "jenny", MODELS, budget_gb * GB)
+    res._sizes()
+    return res
+
+
+def _used(res, now, *models_ago):
+    for m, ago in models_ago:
+        res.touch(m)
+        res._info[f"{m}:latest"]["last_used"] = now - ago
+
+
+def test_plan_fills_the_budget_most_recent_first():
+    res, now = _mgr(8), time.time()
+    _used(res, now, ("jenny-lite", 300), ("jenny-fast", 60), ("jenny-big", 10))
+    keep = res.plan(now)
+    assert keep == ["jenny:latest", "jenny-fast:latest", "jenny-lite:latest"]   # big never fits
+    assert sum(SIZES[m] for m in keep) <= 8 * GB
+
+    small = _mgr(6.5)
+    _used(small, now, ("jenny-lite", 300), ("jenny-fast", 60))
+    assert small.plan(now) == ["jenny:latest", "jenny-fast:latest"]     # 5 + 1; lite would exceed
+
+
+def test_plan_skips_idle_and_unused_models_and_needs_a_budget(monkeypatch):
+    monkeypatch.setattr(residency, "IDLE", 3600)
+    res, now = _mgr(100), time.time()
+    _used(res, now, ("jenny-lite", 7200), ("jenny-fast", 60))
+    assert res.plan(now) == ["jenny:latest", "jenny-fast:latest"]
+    no_budget = _mgr(0)
+    _used(no_budget, now, ("jenny-fast", 60))
+    assert no_budget.plan(now) == ["jenny:latest"]                           # only the GUI model
+
+
+def test_check_preloads_the_plan_and_unloads_the_rest():
+    ollama = _Ollama(loaded=["jenny-big:latest", "jenny-fast:latest"])
+    res, now = _mgr(8, ollama), time.time()
+    _used(res, now, ("jenny-lite", 30))
+    assert res.check() == ["jenny:latest", "jenny-lite:latest"]
+    loads = [m for m, ka in ollama.posts if ka != 0]
+    assert loads == ["jenny:latest", "jenny-lite:latest"]
+    assert {m for m, ka in ollama.posts if ka == 0} == {"jenny-big:latest", "jenny-fast:latest"}
+    st = res.stats()["models"]
+    assert st["jenny:latest"]["resident"] and st["jenny:latest"]["last_load_ms"] == 1500.0
+    ollama.posts.clear()
+    res.check()                                                              # all warm: nothing to do
+    assert ollama.posts == []
+
+
+@pytest.mark.parametrize("value, seconds", [("30m", 1800), ("1h30m", 5400), ("300", 300),
+                                            ("-1", None), ("-1m", None), ("soon", 300)])
+def test_keep_alive_seconds(value, seconds):
+    assert keep_alive_seconds(value) == seconds
@@ -0,0 +1,58 @@
+import threading
+from response_cache import ResponseCache
+
+GREEDY = {"temperature": 0}
+
+
+def _cache(tmp_path, **kw):
+    return ResponseCache(path=tmp_path / "rc.json", **kw)
+
+
+def test_exact_hit_ignores_case_space_and_trailing_punctuation(tmp_path):
+    rc = _cache(tmp_path, near=0)
+    rc.put("Who are you?", "jenny", GREEDY, "I am Jenny.", "conv-a")
+    assert rc.get("who  are you", "jenny", GREEDY, "conv-a") == "I am Jenny."
+    assert rc.get("who are you", "jenny-lite", GREEDY, "conv-a") is None       # other model
+    assert rc.get("who are you", "jenny", {"temperature": 0, "num_ctx": 8}, "conv-a") is None
+    st = rc.stats()
+    assert (st["hits"], st["misses"], st["stores"]) == (1, 2, 1)
+
+
+def test_near_hit_stays_inside_its_scope(tmp_path):
+    rc = _cache(tmp_path, near=0.6)
+    rc.put("what is your favourite colour", "jenny", GREEDY, "Violet.", "conv-a")
+    assert rc.get("what is your favorite colour", "jenny", GREEDY, "conv-a") == "Violet."
+    assert rc.stats()["near_hits"] == 1
+    assert rc.get("what is your favorite colour", "jenny", GREEDY, "conv-b") is None
+    assert rc.get("what is your favourite colour", "jenny", GREEDY, "conv-b") is None
+    assert rc.get("tell me a joke", "jenny", GREEDY, "conv-a") is None
+
+
+def test_sampling_temperature_bypasses_the_cache(tmp_path):
+    rc = _cache(tmp_path)
+    for opts in ({"temperature": 0.7}, {}, {"temperature": "hot"}):
+        rc.put("hi", "jenny", opts, "hello!", "conv-a")
+        assert rc.get("hi", "jenny", opts, "conv-a") is None
+    assert rc.stats()["entries"] == 0 and rc.stats()["bypass"] == 3
+    rc.put("x" * 500, "jenny", GREEDY, "long", "conv-a")          # over JENNY_RCACHE_MAX_PROMPT
+    assert rc.stats()["entries"] == 0
+
+
+def test_snapshot_reload_and_stats_under_threads(tmp_path):
+    rc = _cache(tmp_path)
+    rc.put("hi", "jenny", GREEDY, "hello!", "conv-a")
+    rc.save()
+    again = _cache(tmp_path)
+    assert again.get("hi", "jenny", GREEDY, "conv-a") == "hello!"
+
+    def spin():
+        for _ in range(500):
+            again.get("hi", "jenny", GREEDY, "conv-a")
+            again.get("hi", "jenny", {"temperature": 1}, "conv-a")
+    ts = [threading.Thread(target=spin) for _ in range(4)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    st = again.stats()
+    assert st["hits"] == 2001 and st["bypass"] == 2000
@@ -0,0 +1,66 @@
+import time
+import pytest
+import serve
+from session_store import SessionManager, SQLiteSessionStore
+
+
+class _App:
+    def __init__(self):
+        self.runs = []
+
+    def run(self, **kw):
+        self.runs.append(kw)
+
+
+@pytest.fixture
+def env(monkeypatch):
+    for name in ("JENNY_MEMORY_BACKEND", "JENNY_SESSION_WRITE_THROUGH"):
+        monkeypatch.delenv(name, raising=False)
+    return monkeypatch
+
+
+def _servers(monkeypatch, *installed):
+    found = lambda name: object() if name in installed else None
+    monkeypatch.setattr(serve.importlib.util, "find_spec", found)
+
+
+def test_multi_worker_gunicorn_forces_shared_backends(env, monkeypatch):
+    _servers(monkeypatch, "gunicorn")
+    argv = []
+    monkeypatch.setattr(serve.os, "name", "posix")
+    monkeypatch.setattr(serve.os, "execvp", lambda prog, args: argv.extend(args))
+    serve.main(["--workers", "3", "--threads", "4", "--port", "9999"])
+    assert serve.os.environ["JENNY_MEMORY_BACKEND"] == "sqlite"
+    assert serve.os.environ["JENNY_SESSION_WRITE_THROUGH"] == "1"
+    assert argv[0] == "gunicorn" and argv[-1] == "serve:app"
+    assert argv[argv.index("-w") + 1] == "3" and argv[argv.index("--threads") + 1] == "4"
+    assert argv[argv.index("-k") + 1] == "gthread" and argv[argv.index("-b") + 1] == "127.0.0.1:9999"
+
+
+def test_single_worker_falls_back_to_flask(env, monkeypatch):
+    _servers(monkeypatch)
+    app = _App()
+    monkeypatch.setattr(serve, "load_app", lambda name: app)
+    serve.main(["--app", "probe"])
+    assert "JENNY_MEMORY_BACKEND" not in serve.os.environ
+    assert app.runs == [{"host": "127.0.0.1", "port": 7861, "debug": False, "threaded": True}]
+
+
+def test_workers_share_sessions_through_sqlite(tmp_path):
+    w1 = SessionManager(SQLiteSessionStore(tmp_path / "sessions.db"), write_through=True)
+    w2 = SessionManager(SQLiteSessionStore(tmp_path / "sessions.db"), write_through=True)
+    sid = "a" * 32
+    s = w1.get(sid)
+    s["convo"].append("user", "hi from worker 1")
+    w1.put(sid, s)
+
+    s2 = w2.get(sid)                                   # next request lands on the other worker
+    assert s2["convo"].messages()[-1]["content"] == "hi from worker 1"
+    assert s2["cid"] == s["cid"]                       # same conversation scope everywhere
+    time.sleep(0.01)
+    s2["convo"].append("assistant", "hello from worker 2")
+    w2.put(sid, s2)
+
+    back = w1.get(sid)                                 # stale copy in worker 1 is reloaded
+    assert [m["content"] for m in back["convo"].messages()] == ["hi from worker 1", "hello from worker 2"]
+    assert w1.stats()["loads"] == 2
@@ -0,0 +1,76 @@
+import time
+import pytest
+from session_store import SessionManager, SQLiteSessionStore
+
+
+@pytest.fixture
+def db(tmp_path):
+    return SQLiteSessionStore(tmp_path / "sessions.db")
+
+
+def _sid(i):
+    return f"{i:032x}"
+
+
+def _say(mgr, sid, text):
+    s = mgr.get(sid)
+    s["convo"].append("user", text)
+    mgr.put(sid, s)
+    return s
+
+
+def _texts(state):
+    return [m["content"] for m in state["convo"].messages()]
+
+
+def test_lru_drops_the_oldest_and_writes_it_back(db):
+    mgr = SessionManager(db, max_sessions=2, max_bytes=1 << 30, idle=3600, write_through=False)
+    for i in range(3):
+        _say(mgr, _sid(i), f"note {i}")
+    st = mgr.stats()
+    assert st["live"] == 2 and st["evicted"] == 1 and st["saved"] == 1
+    assert _sid(0) not in mgr._live and db.count() == 1      # only the dropped one was written
+    assert _texts(mgr.get(_sid(0))) == ["note 0"]            # reloaded from the store
+    assert _sid(1) not in mgr._live                          # ...which pushed out the next LRU
+
+
+def test_a_hit_refreshes_recency(db):
+    mgr = SessionManager(db, max_sessions=2, max_bytes=1 << 30, idle=3600, write_through=False)
+    _say(mgr, _sid(0), "a")
+    _say(mgr, _sid(1), "b")
+    mgr.get(_sid(0))
+    _say(mgr, _sid(2), "c")
+    assert list(mgr._live) == [_sid(0), _sid(2)]
+
+
+def test_byte_cap_evicts_but_keeps_the_current_session(db):
+    mgr = SessionManager(db, max_sessions=100, max_bytes=3200, idle=3600, write_through=False)
+    _say(mgr, _sid(0), "x" * 1000)
+    _say(mgr, _sid(1), "y" * 1000)
+    assert mgr.stats()["live"] == 2
+    _say(mgr, _sid(2), "z" * 1000)
+    st = mgr.stats()
+    assert st["live"] == 2 and st["live_bytes"] <= 3200 and _sid(0) not in mgr._live
+    _say(mgr, _sid(3), "w" * 10000)                          # alone over the cap: still kept
+    assert list(mgr._live) == [_sid(3)]
+    assert _texts(db.load(_sid(2))) == ["z" * 1000]
+
+
+def test_idle_sessions_are_saved_and_dropped(db):
+    mgr = SessionManager(db, max_sessions=100, max_bytes=1 << 30, idle=3600, write_through=False)
+    _say(mgr, _sid(0), "old")
+    mgr._live[_sid(0)][1] = time.time() - 7200
+    _say(mgr, _sid(1), "new")
+    assert list(mgr._live) == [_sid(1)]
+    assert mgr.stats()["evicted"] == 1
+    assert _texts(db.load(_sid(0))) == ["old"]
+
+
+def test_clean_sessions_are_dropped_without_a_write(db):
+    mgr = SessionManager(db, max_sessions=1, max_bytes=1 << 30, idle=3600, write_through=False)
+    _say(mgr, _sid(0), "a")
+    mgr.flush()
+    assert mgr.stats()["saved"] == 1
+    mgr.get(_sid(1))
+    st = mgr.stats()
+    assert st["evicted"] == 1 and st["saved"] == 1
@@ -0,0 +1,75 @@
+import json
+import memory_store
+import summarizer
+
+
+class _Resp:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"response": self.text}
+
+
+class _Client:
+    def __init__(self):
+        self.prompts = []
+
+    def post(self, path, json=None, timeout=None):
+        self.prompts.append(json["prompt"])
+        return _Resp(f"- batch {len(self.prompts)}")
+
+
+def _setup(store, mem_paths, monkeypatch, recs):
+    with open(mem_paths / "episodes.jsonl", "a", encoding="utf-8") as f:
+        for r in recs:
+            f.write(json.dumps(r) + "\n")
+    client = _Client()
+    monkeypatch.setattr(summarizer, "MEM", store)
+    monkeypatch.setattr(summarizer, "SUMMARIES_JSONL", memory_store.SUMMARIES_JSONL)
+    monkeypatch.setattr(summarizer, "LOCK_FILE", mem_paths / "summaries")
+    monkeypatch.setattr(summarizer, "client_for", lambda base: client)
+    return client
+
+
+def _turns(ts_list):
+    return [{"ts": ts, "text": f"user: turn {i}", "tags": ["turn", "user"]} for i, ts in enumerate(ts_list)]
+
+
+def test_more_than_a_batch_sharing_one_ts_does_not_stall(store, mem_paths, monkeypatch):
+    _setup(store, mem_paths, monkeypatch, _turns([100] * 10 + [200] * 3))
+    done = 0
+    while summarizer.summarize_batch(batch=4, keep=0) is not None:
+        done += 1
+    assert done == 3                                   # 4 + 4 + (2 at ts 100, 2 at ts 200)
+    recs = store.summaries(8)
+    assert [(r["ts_to"], r["ts_to_n"]) for r in recs] == [(100, 4), (100, 8), (200, 2)]
+    assert [r["n"] for r in recs] == [4, 4, 4]        # turn 12 waits for a full batch
+
+
+def test_prompts_cover_each_turn_once(store, mem_paths, monkeypatch):
+    client = _setup(store, mem_paths, monkeypatch, _turns([100] * 6 + [101] * 3))
+    while summarizer.summarize_batch(batch=3, keep=0) is not None:
+        pass
+    seen = [ln for p in client.prompts for ln in p.splitlines() if ln.startswith("user: turn")]
+    assert seen == [f"user: turn {i}" for i in range(9)]
+
+
+def test_older_summary_records_resume_after_their_ts(store, mem_paths, monkeypatch):
+    _setup(store, mem_paths, monkeypatch, _turns([100, 100, 200, 200, 300]))
+    memory_store.SUMMARIES_JSONL.write_text(json.dumps({"ts": 1, "ts_to": 100, "n": 2, "text": "x"}) + "\n")
+    rec = summarizer.summarize_batch(batch=2, keep=0)
+    assert (rec["ts_from"], rec["ts_to"], rec["ts_to_n"]) == (200, 200, 2)
+
+
+def test_run_once_skips_while_another_process_holds_the_lock(store, mem_paths, monkeypatch):
+    _setup(store, mem_paths, monkeypatch, _turns([100] * 4))
+    held = summarizer.try_lock(mem_paths / "summaries")
+    try:
+        assert summarizer.run_once() == 0
+    finally:
+        held.close()
+    assert store.summaries(8) == []
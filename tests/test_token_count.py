@@ -0,0 +1,85 @@
+import sys
+import json
+import struct
+import pytest
+import token_count
+
+MERGES = ["h e", "l l", "he ll", "hell o"]               # "hello" -> 1 piece
+
+
+@pytest.fixture
+def fresh(tmp_path, monkeypatch):
+    """Undiscovered counter over an empty models/ folder (JENNY_TOKENIZER unset)."""
+    models = tmp_path / "models"
+    models.mkdir()
+    monkeypatch.setattr(token_count, "MODELS_DIR", models)
+    monkeypatch.delenv("JENNY_TOKENIZER", raising=False)
+    monkeypatch.setattr(token_count, "_counter", None)
+    monkeypatch.setattr(token_count, "_resolved", False)
+    monkeypatch.setitem(sys.modules, "tokenizers", None)     # the pure-Python BPE path
+    token_count._cached.cache_clear()
+    yield models
+    token_count._cached.cache_clear()
+
+
+def _tokenizer_json(path, merges=MERGES):
+    path.write_text(json.dumps({"model": {"type": "BPE", "merges": merges}}), encoding="utf-8")
+    return path
+
+
+def _gguf(path, merges=MERGES, model="gpt2"):
+    s = lambda t: struct.pack("<Q", len(t.encode())) + t.encode()
+    kv = [s("general.name") + struct.pack("<I", 8) + s("tiny"),
+          s("tokenizer.ggml.scores") + struct.pack("<IIQ", 9, 6, 2) + struct.pack("<ff", 0, 0),
+          s("tokenizer.ggml.model") + struct.pack("<I", 8) + s(model),
+          s("tokenizer.ggml.merges") + struct.pack("<IIQ", 9, 8, len(merges)) + b"".join(map(s, merges))]
+    path.write_bytes(b"GGUF" + struct.pack("<IQQ", 3, 0, len(kv)) + b"".join(kv))
+    return path
+
+
+def test_heuristic_when_nothing_is_on_disk(fresh):
+    assert token_count.counter_name() == "heuristic"
+    assert token_count.count_tokens("hello world!") == 3
+    assert token_count.count_tokens("") == 1
+
+
+def test_env_tokenizer_wins(fresh, tmp_path, monkeypatch):
+    _tokenizer_json(fresh / "tokenizer.json", merges=[])
+    monkeypatch.setenv("JENNY_TOKENIZER", str(_tokenizer_json(tmp_path / "env.json")))
+    assert token_count.counter_name() == "bpe:env.json"
+    assert token_count.count_tokens("hello world") == 1 + 6         # "hello" + " world" bytes
+
+
+def test_models_tokenizer_json_then_modelfile_gguf(fresh):
+    (fresh / "Modelfile").write_text("FROM ./tiny.gguf\nPARAMETER temperature 0.7\n")
+    _gguf(fresh / "tiny.gguf")
+    assert token_count.counter_name() == "gguf:tiny.gguf"
+    assert token_count.count_tokens("hello") == 1
+
+    token_count.set_counter(None)
+    token_count._resolved = False
+    _tokenizer_json(fresh / "tokenizer.json", merges=["h e"])
+    assert token_count.counter_name() == "bpe:tokenizer.json"
+    assert token_count.count_tokens("hello") == 4
+
+
+def test_unusable_candidates_fall_through(fresh, monkeypatch, tmp_path):
+    bad = tmp_path / "bad.json"
+    bad.write_text(json.dumps({"model": {"type": "Unigram"}}))
+    monkeypatch.setenv("JENNY_TOKENIZER", str(bad))
+    (fresh / "tokenizer.json").write_text("{not json")
+    (fresh / "Modelfile").write_text("FROM ./spm.gguf\n")
+    _gguf(fresh / "spm.gguf", model="llama")             # sentencepiece vocab: not supported
+    assert token_count.counter_name() == "heuristic"
+    assert token_count.count_tokens("x" * 40) == 10
+
+
+def test_a_failing_counter_falls_back_per_string(fresh):
+    def picky(s):
+        if "boom" in s:
+            raise RuntimeError("cannot tokenize")
+        return 2
+    token_count.set_counter(picky)
+    assert token_count.count_tokens("fine") == 2
+    assert token_count.count_tokens("boom" * 10) == 10
+    assert token_count.cache_info()["currsize"] == 2
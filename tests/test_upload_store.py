@@ -0,0 +1,56 @@
+import io
+import os
+import time
+import hashlib
+import pytest
+from upload_store import UploadStore, TooLarge
+
+
+@pytest.fixture
+def up(tmp_path):
+    return UploadStore(tmp_path / "uploads", max_bytes=1 << 20, ttl=3600)
+
+
+def _age(path, seconds):
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+def test_same_content_is_stored_once(up):
+    data = b"leg day: squats\n" * 10000                    # several 64 KB pieces
+    a = up.save(io.BytesIO(data), "plan.txt")
+    b = up.save(io.BytesIO(data), "../copy of plan.txt")
+    assert a["sha256"] == b["sha256"] == hashlib.sha256(data).hexdigest()
+    assert b["deduped"] and b["name"] == "copy of plan.txt" and "deduped" not in a
+    assert a["size"] == len(data) and a["chars"] == len(data) and a["error"] is None
+    assert sorted(p.name[64:] for p in up.path.iterdir()) == [".json", ".raw.txt", ".txt"]
+    assert up.text(a["sha256"]) == data.decode()
+    assert up.stats()["stored"] == 1 and up.stats()["deduped"] == 1 and up.stats()["extracted"] == 1
+
+
+def test_unsupported_and_oversized_files(up):
+    meta = up.save(io.BytesIO(b"\x00\x01"), "blob.bin")
+    assert meta["error"] == "unsupported file type .bin" and up.text(meta["sha256"]) == ""
+    with pytest.raises(TooLarge):
+        up.save(io.BytesIO(b"x" * ((1 << 20) + 1)), "huge.txt")
+    assert not list(up.path.glob("*.part")) and up.stats()["rejected"] == 1
+    assert up.info("not-a-sha") is None and up.text("0" * 64) is None
+
+
+def test_sweep_drops_untouched_entries(up):
+    old = up.save(io.BytesIO(b"old notes"), "old.txt")["sha256"]
+    used = up.save(io.BytesIO(b"still used"), "used.txt")["sha256"]
+    for sha in (old, used):
+        _age(up.path / f"{sha}.json", 7200)
+    stale = up.path / "abandoned.part"
+    stale.write_bytes(b"partial")
+    _age(stale, 7200)
+    assert up.info(used) is not None                      # a read keeps it past the TTL
+
+    up.save(io.BytesIO(b"new"), "new.txt")                # sweeps at most hourly
+    assert up.info(old) is not None
+    _age(up.path / f"{old}.json", 7200)
+    up._last_sweep = 0.0
+    new = up.save(io.BytesIO(b"newer"), "newer.txt")["sha256"]
+    assert not list(up.path.glob(f"{old}.*")) and not stale.exists()
+    assert up.text(used) == "still used" and up.info(new) is not None
@@ -0,0 +1,81 @@
+import os
+from url_cache import URLCache, TextExtractor, strip_html, read_text
+
+
+def _ent(i, n):
+    return {"url": f"https://example.com/{i}", "ok": True, "text": "x" * n, "checked": 0}
+
+
+def test_running_total_evicts_oldest_down_to_the_low_mark(tmp_path):
+    c = URLCache(tmp_path, max_bytes=4000, workers=1)
+    for i in range(5):
+        c._store(f"k{i}", _ent(i, 600))
+        os.utime(tmp_path / f"k{i}.json", (1000 + i, 1000 + i))     # store order = age order
+    assert c.stats()["bytes"] == sum(p.stat().st_size for p in tmp_path.glob("*.json"))
+    c._store("k1", _ent(1, 650))                                    # rewrite: replaces its size
+    assert c.stats()["bytes"] == sum(p.stat().st_size for p in tmp_path.glob("*.json"))
+
+    c._store("k5", _ent(5, 900))
+    left = sorted(p.stem for p in tmp_path.glob("*.json"))
+    assert "k0" not in left and "k5" in left
+    assert c.stats()["bytes"] <= 4000 * 0.9
+    assert c.stats()["bytes"] == sum(p.stat().st_size for p in tmp_path.glob("*.json"))
+
+
+def test_eviction_counts_files_written_by_other_workers(tmp_path):
+    c = URLCache(tmp_path, max_bytes=3000, workers=1)
+    c._store("mine", _ent(0, 500))
+    other = URLCache(tmp_path, max_bytes=3000, workers=1)
+    for i in range(4):
+        other._store(f"theirs{i}", _ent(i, 500))
+    c._store("mine2", _ent(9, 500))                                 # running total: under the cap
+    assert len(list(tmp_path.glob("*.json"))) == 6
+    c.RESCAN = 0                                                    # next periodic rescan
+    c._store("mine3", _ent(9, 500))
+    assert sum(p.stat().st_size for p in tmp_path.glob("*.json")) <= 3000
+
+
+class _Resp:
+    """Streamed response stand-in: yields `chunks` and counts how many were read."""
+    def __init__(self, chunks, ctype="text/html; charset=utf-8"):
+        self.headers, self.encoding = {"content-type": ctype}, "utf-8"
+        self.chunks, self.read, self.closed = chunks, 0, False
+
+    def iter_content(self, size):
+        for c in self.chunks:
+            self.read += 1
+            yield c
+
+    def close(self):
+        self.closed = True
+
+
+def test_extractor_keeps_text_blocks_and_skips_scripts():
+    html = ("<html><head><style>p{}</style><script>var x = 1;</script></head><body>"
+            "<nav>menu</nav><h1>Title</h1><p>Hello   <b>big</b>\n world</p><ul><li>one</li><li>two</li></ul>"
+            "</body></html>")
+    assert strip_html(html) == "Title\nHello big world\none\ntwo"
+
+
+def test_extractor_stops_at_the_cap():
+    p = TextExtractor(max_chars=50)
+    p.feed("<p>" + "a" * 30 + "</p>")
+    assert not p.full
+    p.feed("<p>" + "b" * 30 + "</p><p>" + "c" * 30 + "</p>")
+    assert p.full and p.size == 50
+    assert "c" not in p.text() and len(p.text()) <= 50
+
+
+def test_read_text_stops_reading_once_full():
+    page = [b"<p>" + b"word " * 100 + b"</p>"] * 50
+    resp = _Resp(page)
+    text = read_text(resp, max_chars=1000)
+    assert len(text) <= 1000 and resp.read == 2 and resp.closed    # ~500 chars per chunk
+
+    plain = _Resp([b"x" * 400] * 10, ctype="text/plain")
+    assert read_text(plain, max_chars=1000) == "x" * 1000 and plain.read == 3
+
+
+def test_read_text_stops_at_the_byte_cap_without_text():
+    resp = _Resp([b"<script>" + b"1;" * 500] + [b"2;" * 500] * 20)
+    assert read_text(resp, max_chars=1000, max_bytes=5000) == "" and resp.read == 5
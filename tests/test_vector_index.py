@@ -0,0 +1,41 @@
+import threading
+import pytest
+import vector_index
+from vector_index import SemanticRecall, VectorStore
+
+
+def _lengths(texts):
+    return [[float(len(t)), 1.0] for t in texts]
+
+
+def test_query_cache_under_threads(store, mem_paths, monkeypatch):
+    monkeypatch.setattr(vector_index, "_embedder", _lengths)
+    monkeypatch.setattr(vector_index, "QUERY_CACHE", 8)
+    sr = SemanticRecall(store, VectorStore(mem_paths / "v.f32", mem_paths / "v.json"))
+    errors = []
+
+    def spin(t):
+        try:
+            for i in range(300):
+                qs = [f"q{(i + j + t) % 20}" for j in range(12)]     # more than the cache holds
+                assert sr._query_vectors(qs) == _lengths(qs)
+        except Exception as e:
+            errors.append(e)
+    ts = [threading.Thread(target=spin, args=(t,)) for t in range(4)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    assert not errors
+    assert len(sr._qcache) == 8
+
+
+def test_ivf_assign_appends_rows_to_their_lists(tmp_path):
+    np = pytest.importorskip("numpy")
+    vs = VectorStore(tmp_path / "v.f32", tmp_path / "v.json")
+    vs.reset("m", "h")
+    vs.append([[1.0, 0.0], [0.0, 1.0]])
+    cent = np.asarray([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    vs._ivf = (cent, [np.asarray([0], dtype=np.int64), np.asarray([1], dtype=np.int64)], 2)
+    vs.append([[0.9, 0.1], [0.1, 0.9], [1.0, 0.2]])
+    assert vs._ivf[1][0].tolist() == [0, 2, 4] and vs._ivf[1][1].tolist() == [1, 3]
@@ -0,0 +1,208 @@
+# [F023] token_count.py v1.0 (2026-10-18)
+__FILE_ID__ = "F023"
+__VERSION__ = "1.0"
+
+# Token counting for prompt budgets.
+# Uses the model's real vocabulary when one is on disk, else the old len(s)//4 guess.
+#
+# Lookup order (first hit wins, loaded once, lazily):
+#   1. JENNY_TOKENIZER=/path/to/tokenizer.json | /path/to/model.gguf
+#   2. models/tokenizer.json (next to the Modelfile)
+#   3. the GGUF named by `from ./x.gguf` in models/Modelfile (embedded vocab + merges)
+#   4. heuristic: max(1, len(s)//4)
+# With the `tokenizers` package installed, tokenizer.json is handled by it; otherwise a
+# small pure-Python byte-level BPE (Qwen/GPT-2 style) counts the pieces.
+
+# --- imports ---
+import os, re, json, struct, pathlib, threading
+from functools import lru_cache
+
+ROOT = pathlib.Path(__file__).resolve().parent
+MODELS_DIR = ROOT / "models"
+CACHE_SIZE = int(os.getenv("JENNY_TOKEN_CACHE", "4096"))
+
+def heuristic_count(s):
+    return max(1, len(s) // 4)
+
+# --- byte-level BPE (tokenizer.json / GGUF "gpt2" vocab) ---
+# Qwen2 pre-tokenizer with \p{L} ≈ [^\W\d_] and \p{N} ≈ \d (stdlib re has no \p{..})
+_PRETOKEN = re.compile(
+    r"(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\w]?[^\W\d_]+|\d| ?[^\s\w]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"
+)
+
+def _bytes_to_unicode():
+    bs = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    cs = bs[:]
+    n = 0
+    for b in range(256):
+        if b not in bs:
+            bs.append(b); cs.append(256 + n); n += 1
+    return {b: chr(c) for b, c in zip(bs, cs)}
+
+_BYTE_ENC = _bytes_to_unicode()
+
+class BPECounter:
+    def __init__(self, merges, name="bpe"):
+        self.name = name
+        self.ranks = {}
+        for i, m in enumerate(merges):
+            pair = tuple(m) if isinstance(m, (list, tuple)) else tuple(m.split(" ", 1))
+            if len(pair) == 2:
+                self.ranks.setdefault(pair, i)
+        self._words = {}
+
+    def _bpe_len(self, word):
+        n = self._words.get(word)
+        if n is not None:
+            return n
+        parts = list(word)
+        while len(parts) > 1:
+            best, best_rank = None, None
+            for i in range(len(parts) - 1):
+                r = self.ranks.get((parts[i], parts[i + 1]))
+                if r is not None and (best_rank is None or r < best_rank):
+                    best, best_rank = i, r
+            if best is None:
+                break
+            parts[best:best + 2] = [parts[best] + parts[best + 1]]
+        if len(self._words) < 50000:
+            self._words[word] = len(parts)
+        return len(parts)
+
+    def __call__(self, text):
+        return sum(self._bpe_len("".join(_BYTE_ENC[b] for b in piece.encode("utf-8")))
+                   for piece in _PRETOKEN.findall(text))
+
+# --- loaders ---
+def _load_tokenizer_json(path):
+    try:
+        from tokenizers import Tokenizer          # optional, exact
+        tok = Tokenizer.from_file(str(path))
+        fn = lambda s: len(tok.encode(s, add_special_tokens=False).ids)
+        fn.name = f"tokenizers:{path.name}"
+        return fn
+    except ImportError:
+        pass
+    data = json.loads(pathlib.Path(path).read_text(encoding="utf-8"))
+    model = data.get("model") or {}
+    if model.get("type") != "BPE":
+        raise ValueError(f"unsupported tokenizer model {model.get('type')}")
+    return BPECounter(model.get("merges") or [], name=f"bpe:{path.name}")
+
+_GGUF_SCALARS = {0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i", 6: "<f", 7: "<?",
+                 10: "<Q", 11: "<q", 12: "<d"}
+
+def _gguf_metadata(path, want=("tokenizer.ggml.model", "tokenizer.ggml.merges")):
+    """Read only the KV header of a GGUF file (tensors are never touched)."""
+    out = {}
+    with open(path, "rb") as f:
+        rd = lambda fmt: struct.unpack(fmt, f.read(struct.calcsize(fmt)))[0]
+        rs = lambda: f.read(rd("<Q")).decode("utf-8", "replace")
+        if f.read(4) != b"GGUF":
+            raise ValueError("not a GGUF file")
+        version = rd("<I")
+        if version < 2:
+            raise ValueError(f"GGUF v{version} not supported")
+        rd("<Q")                               # tensor count
+        kv_count = rd("<Q")
+
+        def value(vtype, keep):
+            if vtype == 8:
+                return rs()
+            if vtype == 9:
+                itype, n = rd("<I"), rd("<Q")
+                if not keep and itype in _GGUF_SCALARS:
+                    f.seek(n * struct.calcsize(_GGUF_SCALARS[itype]), 1)
+                    return None
+                items = [value(itype, keep) for _ in range(n)]
+                return items if keep else None
+            return rd(_GGUF_SCALARS[vtype])
+
+        for _ in range(kv_count):
+            key = rs()
+            keep = key in want
+            v = value(rd("<I"), keep)
+            if keep:
+                out[key] = v
+                if len(out) == len(want):
+                    break
+    return out
+
+def _load_gguf(path):
+    meta = _gguf_metadata(path)
+    if meta.get("tokenizer.ggml.model") != "gpt2":
+        raise ValueError(f"GGUF tokenizer {meta.get('tokenizer.ggml.model')} not supported")
+    return BPECounter(meta.get("tokenizer.ggml.merges") or [], name=f"gguf:{pathlib.Path(path).name}")
+
+def _modelfile_gguf():
+    try:
+        from memory_io import FILES
+        text = FILES.read_text(MODELS_DIR / "Modelfile")
+    except Exception:
+        return None
+    m = re.search(r"(?im)^from\s+(\S+\.gguf)\s*$", text)
+    return (MODELS_DIR / m.group(1)).resolve() if m else None
+
+def _discover():
+    cands = []
+    env = os.getenv("JENNY_TOKENIZER")
+    if env:
+        cands.append(pathlib.Path(env))
+    cands.append(MODELS_DIR / "tokenizer.json")
+    gg = _modelfile_gguf()
+    if gg:
+        cands.append(gg)
+    for p in cands:
+        if not p.exists():
+            continue
+        try:
+            fn = _load_gguf(p) if p.suffix == ".gguf" else _load_tokenizer_json(p)
+            print(f"[tokens] using {getattr(fn, 'name', p.name)}")
+            return fn
+        except Exception as e:
+            print(f"[tokens] {p.name} unusable ({e}); trying next")
+    return None
+
+# --- public API ---
+_lock = threading.Lock()
+_counter = None          # None = heuristic
+_resolved = False
+
+def set_counter(fn):
+    """Plug in any fn(str) -> int (None = heuristic). Clears the per-string cache."""
+    global _counter, _resolved
+    with _lock:
+        _counter, _resolved = fn, True
+    _cached.cache_clear()
+
+def counter_name():
+    _resolve()
+    return getattr(_counter, "name", "heuristic") if _counter else "heuristic"
+
+def _resolve():
+    global _counter, _resolved
+    if _resolved:
+        return
+    with _lock:
+        if not _resolved:
+            _counter = _discover()
+            _resolved = True
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached(s):
+    fn = _counter
+    if fn is None:
+        return heuristic_count(s)
+    try:
+        return max(1, fn(s))
+    except Exception:
+        return heuristic_count(s)
+
+def count_tokens(s):
+    """Token count of s with the best available tokenizer (LRU-cached per string)."""
+    s = s or ""
+    _resolve()
+    return _cached(s)
+
+def cache_info():
+    return _cached.cache_info()._asdict()
@@ -0,0 +1,151 @@
+# [F034] upload_store.py v1.0 (2026-10-18)
+__FILE_ID__ = "F034"
+__VERSION__ = "1.0"
+
+# Content-addressed store for chat attachments (memory/uploads/).
+# The page posts each file once as multipart to /api/upload; the body is copied in 64 KB
+# pieces while it is hashed, so nothing is held in memory whole:
+#   <sha256>.raw.<ext>  the bytes (one copy per unique content, whatever the file name)
+#   <sha256>.txt        text extracted once (knowledge.extract_text: txt/md/json/csv/pdf/docx)
+#   <sha256>.json       {sha256, name, size, chars, error, created}
+# Chat requests then carry {"sha256", "name"} only. The page hashes a file before sending
+# and asks GET /api/upload/<sha256> first, so a file already here is never sent again.
+# Entries untouched for JENNY_UPLOAD_TTL seconds are removed.
+
+# --- imports ---
+import os, re, json, time, hashlib, pathlib, tempfile, threading
+from memory_io import atomic_write_text
+from knowledge import extract_text, SUPPORTED
+
+ROOT = pathlib.Path(__file__).resolve().parent
+UPLOAD_DIR = ROOT / "memory" / "uploads"
+
+UPLOAD_MB  = float(os.getenv("JENNY_UPLOAD_MB", "20"))          # per file
+MAX_UPLOAD = int(UPLOAD_MB * 1024 * 1024)
+TTL        = float(os.getenv("JENNY_UPLOAD_TTL", str(7 * 24 * 3600)))
+PIECE = 64 * 1024
+
+_SHA = re.compile(r"^[0-9a-f]{64}$")
+_EXT = re.compile(r"^\.[a-z0-9]{1,8}$")
+
+def valid_sha(s):
+    return bool(s) and bool(_SHA.match(s))
+
+
+class TooLarge(ValueError):
+    pass
+
+
+class UploadStore:
+    """save(stream, name) -> meta; text(sha) -> extracted text | None; info(sha) -> meta | None."""
+
+    def __init__(self, path=UPLOAD_DIR, max_bytes=MAX_UPLOAD, ttl=TTL):
+        self.path = pathlib.Path(path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._stats = {"stored": 0, "deduped": 0, "extracted": 0, "rejected": 0}
+
+    def _meta_file(self, sha):
+        return self.path / f"{sha}.json"
+
+    def info(self, sha):
+        if not valid_sha(sha):
+            return None
+        try:
+            meta = json.loads(self._meta_file(sha).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(self._meta_file(sha))                 # in use → keep past the TTL sweep
+        return meta
+
+    def text(self, sha):
+        if self.info(sha) is None:
+            return None
+        try:
+            return (self.path / f"{sha}.txt").read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return ""
+
+    def save(self, stream, name):
+        """Copy stream into the store (sha256 while copying); extracts text for new content only."""
+        name = os.path.basename(name or "upload.txt")[:120]
+        ext = os.path.splitext(name)[1].lower()
+        self.path.mkdir(parents=True, exist_ok=True)
+        h, size = hashlib.sha256(), 0
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for piece in iter(lambda: stream.read(PIECE), b""):
+                    size += len(piece)
+                    if size > self.max_bytes:
+                        self._stats["rejected"] += 1
+                        raise TooLarge(f"file larger than {UPLOAD_MB:g} MB")
+                    h.update(piece)
+                    out.write(piece)
+            sha = h.hexdigest()
+            with self._lock:
+                meta = self.info(sha)
+                if meta is not None:
+                    self._stats["deduped"] += 1
+                    return dict(meta, name=name, deduped=True)
+                raw = self.path / f"{sha}.raw{ext if _EXT.match(ext) else ''}"
+                os.replace(tmp, raw)
+                tmp = None
+                meta = self._extract(sha, raw, name, size)
+                self._stats["stored"] += 1
+        finally:
+            if tmp is not None:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+        self._sweep()
+        return meta
+
+    def _extract(self, sha, raw, name, size):
+        text, error = "", None
+        if raw.suffix in SUPPORTED:
+            try:
+                text = extract_text(raw)
+                self._stats["extracted"] += 1
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+        else:
+            error = f"unsupported file type {raw.suffix}"
+        atomic_write_text(self.path / f"{sha}.txt", text)
+        meta = {"sha256": sha, "name": name, "size": size, "chars": len(text), "error": error,
+                "created": int(time.time())}
+        atomic_write_text(self._meta_file(sha), json.dumps(meta, ensure_ascii=False))
+        return meta
+
+    def _sweep(self):
+        """Drop entries whose metadata was not touched for ttl seconds (at most hourly)."""
+        now = time.time()
+        if now - self._last_sweep < 3600:
+            return
+        self._last_sweep = now
+        for m in self.path.glob("*.json"):
+            try:
+                if now - m.stat().st_mtime < self.ttl:
+                    continue
+            except OSError:
+                continue
+            for p in self.path.glob(f"{m.stem}.*"):
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+        for p in self.path.glob("*.part"):              # interrupted uploads
+            try:
+                if now - p.stat().st_mtime > 3600:
+                    p.unlink()
+            except OSError:
+                pass
+
+    def stats(self):
+        return {**self._stats, "max_mb": UPLOAD_MB}
+
+
+UPLOADS = UploadStore()
@@ -0,0 +1,335 @@
+# [F033] url_cache.py v1.1 (2026-10-18)
+__FILE_ID__ = "F033"
+__VERSION__ = "1.1"
+
+# On-disk cache of fetched URL text for "include URL content".
+# One JSON file per URL in memory/url_cache/ holds the extracted text plus ETag /
+# Last-Modified. Within JENNY_URL_FRESH seconds an entry is served as is; after that it is
+# revalidated with a conditional GET (304 = keep the text, no download, no re-extraction).
+# prefetch(url) starts the fetch in the background (the GUI calls /api/prefetch as soon as
+# the URL field changes), so get_text() at chat time usually finds the text ready; a fetch
+# already in flight is waited for instead of being repeated.
+# Bodies are streamed (iter_content) through an html.parser state machine that drops
+# script/style/nav/... content and stops reading the socket once JENNY_URL_MAX_CHARS of text
+# are in hand, so memory follows the cap, not the page size.
+# The folder is capped at JENNY_URL_CACHE_MB with a running byte total; the folder is only
+# rescanned once a minute (other workers write there too) and when the total passes the cap,
+# then the oldest files are dropped down to 90% of it.
+#
+#   python url_cache.py https://example.com      # fetch (or revalidate) and print stats
+
+# --- imports ---
+import os, re, sys, json, time, codecs, hashlib, pathlib, threading
+from html.parser import HTMLParser
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from memory_io import atomic_write_text
+
+ROOT = pathlib.Path(__file__).resolve().parent
+CACHE_DIR = ROOT / "memory" / "url_cache"
+
+FRESH     = float(os.getenv("JENNY_URL_FRESH", "300"))        # seconds served without revalidation
+NEG_TTL   = 60.0                                              # failures / non-text answers
+TIMEOUT   = float(os.getenv("JENNY_URL_TIMEOUT", "6"))
+MAX_BYTES = int(float(os.getenv("JENNY_URL_CACHE_MB", "16")) * 1024 * 1024)
+MAX_TEXT  = int(os.getenv("JENNY_URL_MAX_CHARS", "30000"))    # text kept per page; reading stops there
+MAX_DOWNLOAD = 8 * 1024 * 1024                                # bytes read at most (pages with little text)
+READ_CHUNK = 16 * 1024
+USER_AGENT = "JennyLocal/1.0"
+
+# --- streaming HTML -> text ---
+SKIP_TAGS = frozenset(("script", "style", "nav", "noscript", "template", "svg", "iframe"))
+BLOCK_TAGS = frozenset(("p", "div", "br", "li", "ul", "ol", "tr", "table", "section", "article", "header",
+                        "footer", "main", "aside", "blockquote", "pre", "h1", "h2", "h3", "h4", "h5", "h6",
+                        "title", "dd", "dt", "hr", "form"))
+_SPACES = re.compile(r"\s+")
+
+class TextExtractor(HTMLParser):
+    """
+    Incremental HTML -> text: feed() decoded pieces as they arrive; text outside SKIP_TAGS is
+    kept with whitespace collapsed and a line break per block element. `full` turns true once
+    max_chars are collected (the caller stops reading); nothing past the cap is stored.
+    """
+
+    def __init__(self, max_chars=MAX_TEXT):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts, self.size = [], 0
+        self.skip = 0                     # depth inside skipped elements
+        self.full = False
+        self._nl = True                   # last emitted char was a line break (or nothing yet)
+
+    def _emit(self, s):
+        room = self.max_chars - self.size
+        if room <= 0:
+            self.full = True
+            return
+        s = s[:room]
+        self.parts.append(s)
+        self.size += len(s)
+        self._nl = s.endswith("\n")
+        if self.size >= self.max_chars:
+            self.full = True
+
+    def _break(self):
+        if not self._nl:
+            self._emit("\n")
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip += 1
+        elif tag in BLOCK_TAGS and not self.skip:
+            self._break()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS and not self.skip:
+            self._break()
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip = max(0, self.skip - 1)
+        elif tag in BLOCK_TAGS and not self.skip:
+            self._break()
+
+    def handle_data(self, data):
+        if self.skip or self.full:
+            return
+        t = _SPACES.sub(" ", data)
+        if self._nl:
+            t = t.lstrip()
+        if t.strip():
+            self._emit(t)
+
+    def text(self):
+        return "\n".join(ln.strip() for ln in "".join(self.parts).splitlines() if ln.strip())
+
+def strip_html(t: str, max_chars=MAX_TEXT) -> str:
+    """Whole-document helper (same extractor as the streaming path)."""
+    p = TextExtractor(max_chars)
+    p.feed(t)
+    p.close()
+    return p.text()
+
+def read_text(resp, max_chars=MAX_TEXT, max_bytes=MAX_DOWNLOAD):
+    """Text of a streamed requests response, reading only until max_chars of text are in hand."""
+    ct = resp.headers.get("content-type", "").lower()
+    enc = resp.encoding if "charset" in ct and resp.encoding else "utf-8"
+    dec = codecs.getincrementaldecoder(enc)(errors="replace")
+    html_mode = "html" in ct
+    parser = TextExtractor(max_chars) if html_mode else None
+    parts, size, seen = [], 0, 0
+    try:
+        for chunk in resp.iter_content(READ_CHUNK):
+            seen += len(chunk)
+            s = dec.decode(chunk)
+            if html_mode:
+                parser.feed(s)
+                if parser.full:
+                    break
+            else:
+                parts.append(s[:max_chars - size]); size += len(parts[-1])
+                if size >= max_chars:
+                    break
+            if seen >= max_bytes:
+                break
+    finally:
+        resp.close()                          # stop reading from the socket
+    if html_mode:
+        parser.close()
+        return parser.text()
+    return "".join(parts)
+
+def _key(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+class URLCache:
+    """get_text(url) -> extracted text ('' when not text / unreachable); prefetch(url) in the background."""
+    RESCAN = 60.0                          # seconds between folder scans (running total in between)
+
+    def __init__(self, path=CACHE_DIR, fresh=FRESH, max_bytes=MAX_BYTES, workers=2):
+        self.path = pathlib.Path(path)
+        self.fresh = fresh
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._mem = {}                     # key -> entry (loaded lazily from disk)
+        self._inflight = {}                # key -> Event of the running fetch
+        self._sizes = None                 # key -> bytes on disk, oldest first (scanned on first store)
+        self._bytes = 0
+        self._scanned = 0.0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jenny-prefetch")
+        self._http = requests.Session()
+        self._http.headers["User-Agent"] = USER_AGENT
+        self._stats = {"hits": 0, "revalidated": 0, "fetched": 0, "errors": 0, "prefetches": 0, "waited": 0}
+
+    # --- entries ---
+    def _file(self, key):
+        return self.path / f"{key}.json"
+
+    def _entry(self, key):
+        """Cached entry for key (call with _lock held)."""
+        ent = self._mem.get(key)
+        if ent is None:
+            try:
+                ent = json.loads(self._file(key).read_text(encoding="utf-8"))
+            except (FileNotFoundError, ValueError):
+                return None
+            self._mem[key] = ent
+        return ent
+
+    def _store(self, key, ent):
+        data = json.dumps(ent, ensure_ascii=False)
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(self._file(key), data)
+        except Exception as e:
+            print(f"[urlcache] save failed: {e}")
+            data = None
+        with self._lock:
+            self._mem[key] = ent
+            if data is None:
+                return
+            if self._sizes is None or time.time() - self._scanned > self.RESCAN:
+                self._scan()                      # includes the file just written
+            else:
+                size = len(data.encode("utf-8"))
+                self._bytes += size - self._sizes.pop(key, 0)
+                self._sizes[key] = size
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        """Sizes of the cache files, oldest first (call with _lock held)."""
+        files = []
+        for p in self.path.glob("*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, p.stem, st.st_size))
+        self._sizes = OrderedDict((k, size) for _, k, size in sorted(files))
+        self._bytes = sum(self._sizes.values())
+        self._scanned = time.time()
+
+    def _evict(self):
+        """Drop the oldest files down to 90% of max_bytes (call with _lock held)."""
+        self._scan()                              # the total also counts other workers' files
+        while self._sizes and self._bytes > self.max_bytes * 0.9:
+            key, size = self._sizes.popitem(last=False)
+            try:
+                self._file(key).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            self._bytes -= size
+            self._mem.pop(key, None)
+
+    def _usable(self, ent, now):
+        ttl = self.fresh if ent.get("ok") else NEG_TTL
+        return now - ent.get("checked", 0) < ttl
+
+    # --- fetch ---
+    def _fetch(self, url, key):
+        """Conditional GET against the cached validators; returns the (new) entry."""
+        with self._lock:
+            old = self._entry(key)
+        headers = {}
+        if old and old.get("ok"):
+            if old.get("etag"):
+                headers["If-None-Match"] = old["etag"]
+            if old.get("last_modified"):
+                headers["If-Modified-Since"] = old["last_modified"]
+        now = time.time()
+        try:
+            r = self._http.get(url, timeout=TIMEOUT, headers=headers, stream=True)
+            if r.status_code == 304 and old:
+                r.close()
+                ent = dict(old, checked=now)
+                self._count("revalidated")
+                self._store(key, ent)
+                return ent
+            if r.status_code >= 400:
+                r.close()
+            r.raise_for_status()
+            ct = r.headers.get("content-type", "")
+            ok = any(s in ct for s in ("text", "html", "json"))
+            text = read_text(r) if ok else ""
+            if not ok:
+                r.close()
+            ent = {"url": url, "ok": ok, "status": r.status_code, "content_type": ct, "text": text,
+                   "etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"),
+                   "fetched": now, "checked": now}
+            self._count("fetched")
+        except Exception as e:
+            self._count("errors")
+            if old and old.get("ok"):
+                return old                        # keep serving the last good copy
+            ent = {"url": url, "ok": False, "error": str(e), "text": "", "fetched": now, "checked": now}
+        self._store(key, ent)
+        return ent
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _run(self, url, key, ev):
+        try:
+            return self._fetch(url, key)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            ev.set()
+
+    def _start(self, url, key):
+        """Event of the fetch for key, starting one if none is running (call with _lock held)."""
+        ev = self._inflight.get(key)
+        if ev is None:
+            ev = self._inflight[key] = threading.Event()
+            self._pool.submit(self._run, url, key, ev)
+        return ev
+
+    def prefetch(self, url):
+        """Warm the cache in the background; returns 'cached' or 'fetching'."""
+        key = _key(url)
+        with self._lock:
+            ent = self._entry(key)
+            if ent is not None and self._usable(ent, time.time()):
+                return "cached"
+            if key not in self._inflight:
+                self._stats["prefetches"] += 1
+                self._start(url, key)
+        return "fetching"
+
+    def get_text(self, url, max_chars=15000, timeout=TIMEOUT + 1):
+        """Text of url (fresh copy, revalidated, or fetched now; joins a running prefetch)."""
+        key = _key(url)
+        with self._lock:
+            ent = self._entry(key)
+            if ent is not None and self._usable(ent, time.time()):
+                self._stats["hits"] += 1
+                return (ent.get("text") or "")[:max_chars]
+            if key in self._inflight:
+                self._stats["waited"] += 1
+            ev = self._start(url, key)
+        ev.wait(timeout)
+        with self._lock:
+            ent = self._entry(key)
+        return ((ent or {}).get("text") or "")[:max_chars]
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entries": len(self._mem), "inflight": len(self._inflight),
+                    "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+URLS = URLCache()
+
+
+if __name__ == "__main__":
+    for u in sys.argv[1:]:
+        t0 = time.time()
+        txt = URLS.get_text(u)
+        print(f"[urlcache] {u}: {len(txt)} chars in {(time.time() - t0) * 1000:.0f} ms")
+    print(URLS.stats())
@@ -0,0 +1,323 @@
+# [F029] vector_index.py v1.0 (2026-10-18)
+__FILE_ID__ = "F029"
+__VERSION__ = "1.0"
+
+# Semantic recall over memory/episodes.jsonl (optional: JENNY_SEMANTIC=1).
+# Episodes are embedded through Ollama's local embedding endpoint and stored as
+# normalized float32 rows (row i = EpisodeIndex doc i):
+#   memory/episodes.vec.f32   raw rows, append-only (NumPy memmap when NumPy is installed)
+#   memory/episodes.vec.json  dim / count / model / source signature
+# Queries are cosine top-k (one matrix product per batch of queries). Past JENNY_VEC_IVF_MIN
+# rows an IVF index (k-means centroids, JENNY_VEC_NPROBE lists probed) limits the scan.
+# New episodes are embedded in the background, in batches; `python vector_index.py backfill`
+# embeds the whole history up front. Without NumPy everything still works, brute force.
+#
+# Tests/offline: set_embedder(fn) with fn(list[str]) -> list[list[float]].
+
+# --- imports ---
+import os, sys, json, math, time, array, random, pathlib, threading
+from collections import OrderedDict
+from memory_io import atomic_write_text
+
+try:
+    import numpy as np
+except ImportError:          # optional; pure-Python brute force below
+    np = None
+
+ROOT = pathlib.Path(__file__).resolve().parent
+VEC_FILE  = ROOT / "memory" / "episodes.vec.f32"
+META_FILE = ROOT / "memory" / "episodes.vec.json"
+
+SEMANTIC    = os.getenv("JENNY_SEMANTIC", "0") == "1"
+EMBED_MODEL = os.getenv("JENNY_EMBED_MODEL", "nomic-embed-text")
+BATCH       = int(os.getenv("JENNY_EMBED_BATCH", "32"))
+IVF_MIN     = int(os.getenv("JENNY_VEC_IVF_MIN", "5000"))
+NPROBE      = int(os.getenv("JENNY_VEC_NPROBE", "8"))
+QUERY_CACHE = 256
+
+# --- embedding backend ---
+_embedder = None
+
+def set_embedder(fn):
+    """Replace the Ollama call with fn(texts) -> vectors (None = Ollama again)."""
+    global _embedder
+    _embedder = fn
+
+def embed_texts(texts, model=EMBED_MODEL, base=None):
+    """Vectors for texts: /api/embed (batched), else /api/embeddings one by one."""
+    if _embedder is not None:
+        return _embedder(list(texts))
+    from client_ollama import client_for
+    cli = client_for(base)
+    r = cli.post("/api/embed", json={"model": model, "input": list(texts)}, timeout=120)
+    if r.status_code != 404:
+        r.raise_for_status()
+        return r.json()["embeddings"]
+    out = []
+    for t in texts:
+        rr = cli.post("/api/embeddings", json={"model": model, "prompt": t}, timeout=120)
+        rr.raise_for_status()
+        out.append(rr.json()["embedding"])
+    return out
+
+def _unit(v):
+    n = math.sqrt(sum(x * x for x in v)) or 1.0
+    return [x / n for x in v]
+
+
+class VectorStore:
+    """Append-only float32 matrix on disk + cosine top-k (IVF once it is large)."""
+
+    def __init__(self, vec_path=VEC_FILE, meta_path=META_FILE):
+        self.vec_path = pathlib.Path(vec_path)
+        self.meta_path = pathlib.Path(meta_path)
+        self._lock = threading.RLock()
+        self.meta = {"version": 1, "dim": 0, "count": 0, "model": "", "head": ""}
+        self._mat = None            # np.memmap / array('f') view of count rows
+        self._ivf = None            # (centroids, [row arrays], rows covered at build)
+        self._load()
+
+    @property
+    def count(self):
+        return self.meta["count"]
+
+    def _load(self):
+        try:
+            meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+            size = self.vec_path.stat().st_size
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"[vectors] unreadable metadata, starting over: {e}")
+            return
+        dim = meta.get("dim") or 0
+        if meta.get("version") == 1 and dim:
+            meta["count"] = min(meta.get("count", 0), size // (4 * dim))   # torn tail → drop
+            self.meta = meta
+
+    def _save_meta(self):
+        atomic_write_text(self.meta_path, json.dumps(self.meta))
+
+    def reset(self, model, head):
+        with self._lock:
+            self.meta = {"version": 1, "dim": 0, "count": 0, "model": model, "head": head}
+            self._mat, self._ivf = None, None
+            self.vec_path.parent.mkdir(exist_ok=True)
+            self.vec_path.write_bytes(b"")
+            self._save_meta()
+
+    def append(self, vectors):
+        if not vectors:
+            return
+        with self._lock:
+            dim = self.meta["dim"] or len(vectors[0])
+            rows = array.array("f")
+            for v in vectors:
+                if len(v) != dim:
+                    raise ValueError(f"embedding dim {len(v)} != {dim}")
+                rows.extend(_unit(v))
+            with self.vec_path.open("r+b" if self.vec_path.exists() else "wb") as f:
+                f.seek(self.meta["count"] * dim * 4)
+                rows.tofile(f)
+                f.truncate()
+            first = self.meta["count"]
+            self.meta["dim"] = dim
+            self.meta["count"] += len(vectors)
+            self._save_meta()
+            self._mat = None
+            if self._ivf is not None and np is not None:
+                self._ivf_assign(first, np.frombuffer(rows, dtype=np.float32).reshape(-1, dim))
+
+    def matrix(self):
+        with self._lock:
+            if self._mat is None and self.count:
+                dim = self.meta["dim"]
+                if np is not None:
+                    self._mat = np.memmap(self.vec_path, dtype=np.float32, mode="r",
+                                          shape=(self.count, dim))
+                else:
+                    a = array.array("f")
+                    with self.vec_path.open("rb") as f:
+                        a.fromfile(f, self.count * dim)
+                    self._mat = a
+            return self._mat
+
+    # --- IVF (NumPy only) ---
+    def _build_ivf(self, M, iters=8):
+        n = M.shape[0]
+        nlist = max(8, int(math.sqrt(n)))
+        rng = random.Random(0)
+        sample = M[sorted(rng.sample(range(n), min(n, nlist * 64)))]
+        cent = sample[sorted(rng.sample(range(len(sample)), nlist))].copy()
+        for _ in range(iters):                          # spherical k-means
+            assign = np.argmax(sample @ cent.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    v = members.sum(axis=0)
+                    cent[c] = v / (np.linalg.norm(v) or 1.0)
+        lists = [[] for _ in range(nlist)]
+        for start in range(0, n, 8192):
+            for i, c in enumerate(np.argmax(M[start:start + 8192] @ cent.T, axis=1)):
+                lists[c].append(start + i)
+        self._ivf = (cent, [np.asarray(l, dtype=np.int64) for l in lists], n)
+
+    def _ivf_assign(self, first, rows):
+        cent, lists, built = self._ivf
+        assign = np.argmax(rows @ cent.T, axis=1)
+        ids = np.arange(first, first + len(rows), dtype=np.int64)
+        for c in np.unique(assign):                     # one concatenate per touched list
+            lists[c] = np.concatenate([lists[c], ids[assign == c]])
+
+    def search(self, queries, k=4):
+        """[[ (cosine, row), ... ] per query], best first."""
+        with self._lock:
+            M = self.matrix()
+            if M is None or not queries:
+                return [[] for _ in queries]
+            if np is None:
+                return [self._search_py(M, _unit(q), k) for q in queries]
+            Q = np.asarray([_unit(q) for q in queries], dtype=np.float32)
+            if self.count >= IVF_MIN:
+                if self._ivf is None or self._ivf[2] * 2 < self.count:
+                    self._build_ivf(M)
+                return [self._search_ivf(M, q, k) for q in Q]
+            S = Q @ M.T                                 # (queries, rows) in one product
+            out = []
+            for s in S:
+                top = np.argpartition(-s, min(k, len(s)) - 1)[:k] if len(s) > k else np.arange(len(s))
+                top = top[np.argsort(-s[top])]
+                out.append([(float(s[i]), int(i)) for i in top])
+            return out
+
+    def _search_ivf(self, M, q, k):
+        cent, lists, _ = self._ivf
+        probe = np.argsort(-(cent @ q))[:NPROBE]
+        rows = np.concatenate([lists[c] for c in probe]) if len(probe) else np.arange(0)
+        if not len(rows):
+            return []
+        s = M[rows] @ q
+        top = np.argsort(-s)[:k]
+        return [(float(s[i]), int(rows[i])) for i in top]
+
+    def _search_py(self, M, q, k):
+        dim = self.meta["dim"]
+        scored = []
+        for r in range(self.count):
+            base = r * dim
+            scored.append((sum(q[j] * M[base + j] for j in range(dim)), r))
+        scored.sort(key=lambda x: -x[0])
+        return scored[:k]
+
+    def stats(self):
+        with self._lock:
+            return {"rows": self.count, "dim": self.meta["dim"], "model": self.meta["model"],
+                    "ivf_lists": len(self._ivf[1]) if self._ivf else 0, "numpy": np is not None}
+
+
+class SemanticRecall:
+    """
+    Keeps VectorStore rows in step with store.index (one row per indexed episode) and
+    answers query -> [(cosine, doc id)]. add_episode() only calls notify(); a background
+    thread embeds whatever is new, BATCH texts per request.
+    """
+    DEBOUNCE = 0.5               # let write-behind flush and a few turns accumulate
+
+    def __init__(self, store, vectors=None, model=EMBED_MODEL):
+        self.store = store
+        self.vs = vectors or VectorStore()
+        self.model = model
+        self._sync = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._qcache = OrderedDict()     # query text -> vector (LRU), guarded by _qlock
+        self._qlock = threading.Lock()
+        self._stats = {"embedded": 0, "batches": 0, "errors": 0, "queries": 0}
+
+    def notify(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="jenny-embed", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        backoff = 0
+        while True:
+            self._wake.wait(timeout=30)
+            self._wake.clear()
+            time.sleep(self.DEBOUNCE + backoff)
+            try:
+                self.catch_up()
+                backoff = 0
+            except Exception as e:
+                self._stats["errors"] += 1
+                backoff = min(60, (backoff or 1) * 2)
+                print(f"[vectors] embedding failed (retry in {backoff}s): {e}")
+
+    def catch_up(self, batch=BATCH, limit=None):
+        """Embed indexed episodes that have no row yet; returns how many were added."""
+        idx = self.store.index
+        with self._sync:
+            idx.sync()
+            with idx._lock:
+                head, n = idx.signature, len(idx.offsets)
+            if self.vs.meta["head"] != head or self.vs.meta["model"] != self.model or self.vs.count > n:
+                self.vs.reset(self.model, head)          # new model, compaction or rewritten log
+            done = 0
+            while self.vs.count < n and (limit is None or done < limit):
+                docs = list(range(self.vs.count, min(n, self.vs.count + batch)))
+                texts = [(r.get("text") or " ")[:4000] for r in idx.records(docs)]
+                self.vs.append(embed_texts(texts, self.model))
+                done += len(docs)
+                self._stats["embedded"] += len(docs)
+                self._stats["batches"] += 1
+            return done
+
+    def _query_vectors(self, queries):
+        with self._qlock:
+            got = {q: self._qcache[q] for q in queries if q in self._qcache}
+            for q in got:
+                self._qcache.move_to_end(q)
+        todo = [q for q in dict.fromkeys(queries) if q not in got]
+        if todo:                                        # embedded outside the lock
+            vecs = embed_texts(todo, self.model)
+            got.update(zip(todo, vecs))
+            with self._qlock:
+                self._qcache.update(zip(todo, vecs))
+                while len(self._qcache) > QUERY_CACHE:
+                    self._qcache.popitem(last=False)
+        return [got[q] for q in queries]
+
+    def search_many(self, queries, k=4):
+        if not queries or not self.vs.count:
+            return [[] for _ in queries]
+        self._stats["queries"] += len(queries)
+        return self.vs.search(self._query_vectors(queries), k)
+
+    def search(self, query, k=4):
+        return self.search_many([query], k)[0]
+
+    def stats(self):
+        return {**self._stats, **self.vs.stats()}
+
+
+def blend(keyword_docs, vector_docs, k, vector_weight=1.0, rrf_k=60):
+    """Reciprocal-rank fusion of two best-first doc id lists."""
+    score = {}
+    for rank, d in enumerate(keyword_docs):
+        score[d] = score.get(d, 0) + 1.0 / (rrf_k + rank)
+    for rank, d in enumerate(vector_docs):
+        score[d] = score.get(d, 0) + vector_weight / (rrf_k + rank)
+    order = {d: i for i, d in enumerate(keyword_docs)}
+    return sorted(score, key=lambda d: (-score[d], order.get(d, len(order))))[:k]
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["backfill"]:
+        from memory_store import MEM
+        sem = getattr(MEM, "semantic", None) or SemanticRecall(MEM)
+        t0 = time.time()
+        n = sem.catch_up()
+        print(f"[vectors] embedded {n} episodes in {time.time() - t0:.1f}s -> {sem.stats()}")
+    else:
+        print("usage: python vector_index.py backfill")